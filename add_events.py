@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 
 from app.config.config import load_config
 from app.database.models.registration import Event
+from app.infrastructure.cache.event_catalog import bump_catalog_version
+from app.infrastructure.redis.redis_manager import RedisManager
 
 
 async def add_events():
@@ -102,6 +104,7 @@ async def add_events():
             
             await session.commit()
             print(f"✅ Добавлено {len(events_data)} мероприятий!")
+            await notify_catalog_changed(config)
             
             # Показываем добавленные мероприятия
             print("\n📅 Добавленные мероприятия:")
@@ -116,5 +119,17 @@ async def add_events():
         await engine.dispose()
 
 
+async def notify_catalog_changed(config):
+    """Увеличить версию каталога в Redis, чтобы запущенные боты перечитали мероприятия."""
+    redis_manager = RedisManager(config.redis)
+    try:
+        version = await bump_catalog_version(await redis_manager.get_redis())
+        print(f"🔄 Версия каталога мероприятий: {version}")
+    except Exception as e:
+        print(f"⚠️  Не удалось обновить версию каталога в Redis (боты увидят изменения после рестарта): {e}")
+    finally:
+        await redis_manager.close()
+
+
 if __name__ == "__main__":
     asyncio.run(add_events())
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""Сборка бота, диспетчера и зависимостей (общая для main.py и воркеров)."""
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
+from aiogram_dialog import setup_dialogs
+from aiohttp import web
+from redis.asyncio import Redis
+
+from app.config.config import Config, DatabaseConfig, RedisConfig
+from app.database.database import Database
+from app.database.repositories.event_repository import EventRepository, RegistrationRepository
+from app.infrastructure.cache.event_catalog import EventCatalogCache
+from app.infrastructure.cache.seat_counters import SeatCounters
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.outbox import SheetsOutboxDispatcher
+from app.infrastructure.google_sheets.reconciler import SheetsReconciler
+from app.infrastructure.google_sheets.sheets_manager import GENERAL_SHEET, PASSPORT_SHEET, GoogleSheetsManager
+from app.infrastructure.metrics.instruments import BotApiMetricsMiddleware, InstrumentedRedis, register_stats_gauge
+from app.infrastructure.metrics.server import start_metrics_server
+from app.middleware import AdmissionMiddleware, DependencyMiddleware, LockMiddleware
+from app.services.lock_service import LockStateWatcher
+from app.handlers import router as main_router
+from app.dialogs.registry import register_dialogs
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class BotApplication:
+    """Собранное приложение бота со всеми ресурсами, которые нужно закрыть."""
+    bot: Bot
+    dp: Dispatcher
+    redis_client: Redis
+    database: Database
+    sheets_manager: Optional[AsyncSheetsManager]
+    lock_watcher: LockStateWatcher
+    admission: AdmissionMiddleware
+    outbox_dispatcher: Optional[SheetsOutboxDispatcher] = None
+    reconciler: Optional[SheetsReconciler] = None
+    seat_counters: Optional[SeatCounters] = None
+    metrics_runner: Optional[web.AppRunner] = None
+
+    async def close(self) -> None:
+        """Закрыть соединения."""
+        logger.info("🔄 Закрытие соединений...")
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await self.lock_watcher.stop()
+        if self.seat_counters is not None:
+            await self.seat_counters.stop()
+        if self.reconciler is not None:
+            await self.reconciler.stop()
+        if self.outbox_dispatcher is not None:
+            await self.outbox_dispatcher.stop()
+        if self.sheets_manager is not None:
+            await self.sheets_manager.stop()
+        await self.bot.session.close()
+        await self.database.close()
+        await self.redis_client.aclose()
+        logger.info("✅ Соединения закрыты")
+
+
+def create_redis_client(config: RedisConfig, max_connections: Optional[int] = None) -> Redis:
+    """Создать Redis клиента (decode_responses=True обязателен для FSM и сервисов)."""
+    if config.password:
+        redis_url = f"redis://:{config.password}@{config.host}:{config.port}/0"
+    else:
+        redis_url = f"redis://{config.host}:{config.port}/0"
+
+    # InstrumentedRedis считает команды для метрик
+    return InstrumentedRedis.from_url(redis_url, decode_responses=True, max_connections=max_connections)
+
+
+def create_bot(config: Config) -> Bot:
+    """Создать экземпляр бота."""
+    bot = Bot(
+        token=config.bot.token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    bot.session.middleware(BotApiMetricsMiddleware())
+    return bot
+
+
+async def warm_up_sheets(database: Database, sheets_manager: AsyncSheetsManager) -> None:
+    """Открыть все листы и проверить заголовки заранее, чтобы запись стоила один запрос."""
+    async with database.get_session() as session:
+        events = await EventRepository(session).get_all_events()
+    sheet_names = [GENERAL_SHEET, PASSPORT_SHEET] + [event.sheet_name for event in events]
+    await sheets_manager.call("warm_up", sheet_names)
+
+
+async def load_seat_counts(database: Database):
+    """Число участников каждого мероприятия по данным БД (для счетчиков мест)."""
+    async with database.get_session() as session:
+        return await RegistrationRepository(session).get_seat_counts()
+
+
+async def create_application(
+    config: Config,
+    database_config: Optional[DatabaseConfig] = None,
+    redis_max_connections: Optional[int] = None,
+    background_tasks: bool = True,
+) -> BotApplication:
+    """
+    Собрать бота с диспетчером, middleware и диалогами.
+    database_config и redis_max_connections позволяют воркерам задать свои размеры пулов.
+    background_tasks=False - без фоновой работы, общей для всех процессов: прогрева
+    листов, диспетчера outbox, сверки листов и сверки счетчиков мест (в шардированном
+    режиме ее выполняет только воркер шарда 0).
+    """
+    # Создаем Redis клиента для FSM
+    redis_client = create_redis_client(config.redis, redis_max_connections)
+
+    # Проверяем подключение к Redis
+    try:
+        await redis_client.ping()
+        logger.info(f"✅ Подключение к Redis установлено: {config.redis.host}:{config.redis.port}")
+    except Exception as e:
+        logger.error(f"❌ Ошибка подключения к Redis: {e}")
+        await redis_client.aclose()
+        raise
+
+    # Создаем хранилище для FSM
+    storage = RedisStorage(
+        redis=redis_client,
+        key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+    )
+
+    # Создаем бота и диспетчер
+    bot = create_bot(config)
+    dp = Dispatcher(storage=storage)
+    logger.info("✅ Бот и диспетчер созданы")
+
+    # Инициализируем базу данных
+    database = Database(database_config or config.database)
+    logger.info("✅ База данных инициализирована")
+
+    # Инициализируем Google Sheets (обработчики пишут только в outbox, таблица нужна фоновым задачам)
+    sheets_manager = None
+    outbox_dispatcher = None
+    reconciler = None
+    if background_tasks:
+        try:
+            sheets_manager = AsyncSheetsManager(GoogleSheetsManager(config.google_sheets))
+            logger.info("✅ Google Sheets инициализированы")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка инициализации Google Sheets: {e}")
+    else:
+        logger.info("ℹ️ Фоновые задачи (Google Sheets, сверка счетчиков мест) выполняет другой процесс")
+
+    # Операции с таблицей копятся в sheets_outbox и доставляются фоновым диспетчером
+    if sheets_manager is not None:
+        try:
+            await warm_up_sheets(database, sheets_manager)
+            logger.info("✅ Листы Google Sheets прогреты")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прогреть листы Google Sheets: {e}")
+
+        outbox_dispatcher = SheetsOutboxDispatcher(
+            database,
+            sheets_manager,
+            poll_interval=config.google_sheets.outbox_poll_interval,
+            batch_size=config.google_sheets.outbox_batch_size,
+            append_batch_size=config.google_sheets.append_batch_size,
+            append_flush_interval=config.google_sheets.append_flush_interval,
+            max_attempts=config.google_sheets.outbox_max_attempts,
+            row_hash_ttl=config.google_sheets.row_hash_ttl,
+        )
+        await outbox_dispatcher.start()
+        logger.info("✅ Диспетчер outbox Google Sheets запущен")
+
+        if config.google_sheets.reconcile_interval > 0:
+            reconciler = SheetsReconciler(database, sheets_manager, config.google_sheets.reconcile_interval)
+            await reconciler.start()
+            logger.info(f"✅ Сверка листов с БД раз в {config.google_sheets.reconcile_interval}с")
+
+    # Межзапросный кэш профилей пользователей
+    profile_cache = UserProfileCache(
+        ttl_seconds=config.user_cache.ttl_seconds,
+        redis_client=redis_client if config.user_cache.backend == "redis" else None,
+    )
+    logger.info(f"✅ Кэш профилей пользователей: {config.user_cache.backend}, TTL {config.user_cache.ttl_seconds}с")
+
+    # Каталог мероприятий в памяти процесса; add_events.py сбрасывает его через версию в Redis
+    event_catalog = EventCatalogCache(redis_client, config.event_cache.catalog_check_interval)
+
+    # Счетчики мест в Redis: заполняются из БД при старте и периодически сверяются с ней
+    # (без loader счетчики только читаются и получают дельты после коммитов)
+    seat_counters = SeatCounters(
+        redis_client,
+        loader=(lambda: load_seat_counts(database)) if background_tasks else None,
+        reconcile_interval=config.event_cache.seat_reconcile_interval,
+    )
+    if background_tasks:
+        try:
+            await seat_counters.start()
+            logger.info("✅ Счетчики мест заполнены из БД")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось заполнить счетчики мест (места будут считаться в БД): {e}")
+
+    # Настраиваем middleware для передачи зависимостей (сервисы создаются лениво)
+    services_middleware = DependencyMiddleware(
+        database, sheets_manager, redis_client, profile_cache, outbox_dispatcher, event_catalog, seat_counters
+    )
+
+    # Сначала middleware для сервисов (inner middleware)
+    dp.message.middleware(services_middleware)
+    dp.callback_query.middleware(services_middleware)
+
+    # Регистрируем обработчики
+    dp.include_router(main_router)
+    logger.info("✅ Основные обработчики зарегистрированы")
+
+    # Регистрируем диалоги
+    register_dialogs(dp)
+    logger.info("✅ Диалоги зарегистрированы")
+
+    # Настраиваем aiogram-dialog
+    setup_dialogs(dp)
+    logger.info("✅ aiogram-dialog настроен")
+
+    # ВАЖНО: Регистрируем middleware блокировки ПОСЛЕ setup_dialogs
+    # чтобы он имел приоритет над middleware aiogram-dialog
+    lock_watcher = LockStateWatcher(redis_client)
+    await lock_watcher.start()
+    lock_middleware = LockMiddleware(redis_client, config.bot.admin_ids, lock_watcher)
+    dp.update.outer_middleware(lock_middleware)  # Для всех типов событий
+    logger.info("✅ LockMiddleware зарегистрирован после setup_dialogs")
+
+    # Контроль нагрузки: после проверки блокировки, но до сессий и диалогов
+    admission = AdmissionMiddleware(
+        max_concurrency=config.admission.max_concurrency,
+        max_queue=config.admission.max_queue,
+        queue_timeout=config.admission.queue_timeout,
+        max_per_user=config.admission.max_per_user,
+    )
+    dp.update.outer_middleware(admission)
+    logger.info("✅ AdmissionMiddleware зарегистрирован")
+
+    # Метрики компонентов, которые считают себя сами
+    register_stats_gauge("bot_db_pool", "Состояние пула соединений с БД", database.get_pool_stats)
+    register_stats_gauge("bot_admission", "Контроль нагрузки: очередь и отброшенные апдейты", admission.stats)
+    register_stats_gauge("bot_user_profile_cache", "Кэш профилей пользователей", profile_cache.stats)
+    register_stats_gauge("bot_event_catalog", "Каталог мероприятий в памяти процесса", event_catalog.stats)
+    register_stats_gauge("bot_seat_counters", "Счетчики мест в Redis", seat_counters.stats)
+    if outbox_dispatcher is not None:
+        register_stats_gauge("bot_sheets_outbox", "Очередь синхронизации с Google Sheets", outbox_dispatcher.stats)
+    if sheets_manager is not None:
+        register_stats_gauge("bot_sheets_quota", "Квоты Sheets API: очередь, ожидание, повторы", sheets_manager.manager.scheduler.stats)
+    if reconciler is not None:
+        register_stats_gauge("bot_sheets_reconcile", "Сверка Google Sheets с БД", reconciler.stats)
+    register_stats_gauge("bot_lock_mode", "Режим блокировки бота", lambda: {"locked": int(lock_watcher.is_locked)})
+
+    metrics_runner = None
+    if config.metrics.enabled:
+        metrics_runner = await start_metrics_server(config.metrics)
+
+    return BotApplication(
+        bot=bot,
+        dp=dp,
+        redis_client=redis_client,
+        database=database,
+        sheets_manager=sheets_manager,
+        lock_watcher=lock_watcher,
+        admission=admission,
+        outbox_dispatcher=outbox_dispatcher,
+        reconciler=reconciler,
+        seat_counters=seat_counters,
+        metrics_runner=metrics_runner,
+    )
@@ -1,9 +1,11 @@
 """Настройки конфигурации бота."""
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
-from environs import Env
+from environs import Env, EnvError
+
+from app.utils.logger import parse_logger_levels
 
 
 @dataclass
@@ -14,16 +16,41 @@ class DatabaseConfig:
     user: str
     password: str
     database: str
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0                  # Сколько ждать свободного соединения, с
+    pool_recycle: int = 1800                    # Пересоздавать соединения старше N секунд (-1 - никогда)
+    pool_pre_ping: bool = True                  # Проверять соединение перед выдачей из пула
+    driver: str = "psycopg"                     # psycopg | asyncpg
+    prepare_threshold: Optional[int] = 5        # psycopg: после скольких выполнений готовить запрос (None - никогда)
+    statement_timeout_ms: Optional[int] = None  # Серверный statement_timeout, мс
 
     @property
     def url(self) -> str:
-        """Возвращает URL для подключения к базе данных."""
+        """Возвращает URL для подключения к базе данных (синхронный, для миграций)."""
         return f"postgresql+psycopg://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
     
     @property
     def async_url(self) -> str:
-        """Возвращает асинхронный URL для подключения к базе данных."""
-        return f"postgresql+psycopg://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+        """Возвращает асинхронный URL для подключения к базе данных с выбранным драйвером."""
+        return f"postgresql+{self.driver}://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+
+    @property
+    def connect_args(self) -> dict:
+        """Параметры подключения, специфичные для драйвера."""
+        if self.driver == "asyncpg":
+            args: dict = {}
+            if self.prepare_threshold is None:
+                # Без кэша подготовленных запросов (например, за pgbouncer в режиме transaction)
+                args["statement_cache_size"] = 0
+            if self.statement_timeout_ms:
+                args["server_settings"] = {"statement_timeout": str(self.statement_timeout_ms)}
+            return args
+
+        args = {"prepare_threshold": self.prepare_threshold}
+        if self.statement_timeout_ms:
+            args["options"] = f"-c statement_timeout={self.statement_timeout_ms}"
+        return args
 
 
 @dataclass
@@ -39,6 +66,84 @@ class GoogleSheetsConfig:
     """Конфигурация Google Sheets."""
     credentials_path: str
     spreadsheet_url: str
+    worksheet_cache_ttl: int = 3600     # Сколько держать открытый лист без повторной проверки заголовков, с
+    outbox_poll_interval: float = 1.0   # Как часто диспетчер проверяет sheets_outbox, с
+    outbox_batch_size: int = 200        # Операций за один проход
+    append_batch_size: int = 50         # Строк в одном values.append на лист
+    append_flush_interval: float = 2.0  # Максимальное ожидание неполной пачки добавлений, с
+    outbox_max_attempts: int = 20       # После стольких неудач операция откладывается с last_error
+    row_hash_ttl: int = 86400           # Сколько доверять хэшу строки при пропуске записи без изменений, с (0 - не пропускать)
+    reconcile_interval: int = 0         # Период полной сверки листов с БД, с (0 - только вручную)
+    read_quota_per_minute: int = 60     # Квота Sheets API на чтение, запросов в минуту
+    write_quota_per_minute: int = 60    # Квота Sheets API на запись, запросов в минуту
+    retry_max_attempts: int = 5         # Попыток запроса при 408/429/5xx
+    retry_base_delay: float = 1.0       # Начальная пауза экспоненциального повтора, с
+    retry_max_delay: float = 64.0       # Максимальная пауза между повторами, с
+    backend: str = "gspread"            # gspread | memory | csv (локальные - для нагрузочных тестов и стенда)
+    local_dir: str = "sheets_local"     # Каталог CSV-файлов бэкенда csv
+    local_latency_ms: float = 0.0       # Искусственная задержка каждого запроса локального бэкенда, мс
+    local_failure_rate: float = 0.0     # Доля запросов локального бэкенда, завершающихся ошибкой API
+
+
+@dataclass
+class UserCacheConfig:
+    """Конфигурация межзапросного кэша профилей пользователей."""
+    ttl_seconds: int = 300
+    backend: str = "memory"  # memory | redis
+
+
+@dataclass
+class EventCacheConfig:
+    """Конфигурация кэшей мероприятий: каталог и счетчики мест."""
+    catalog_check_interval: float = 1.0  # Как часто сверять версию каталога мероприятий в Redis, секунд
+    seat_reconcile_interval: float = 60.0  # Как часто переписывать счетчики мест числами из БД, секунд (0 - только при старте)
+
+
+@dataclass
+class WebhookConfig:
+    """Конфигурация приема апдейтов через webhook."""
+    base_url: str = ""              # Публичный адрес, например https://bot.example.com
+    path: str = "/webhook"
+    host: str = "0.0.0.0"
+    port: int = 8080
+    secret_token: Optional[str] = None
+    max_in_flight: int = 100         # Сколько апдейтов обрабатывается одновременно
+    max_pending: int = 1000          # Сколько принятых апдейтов может ждать обработки (дальше - 503, Telegram повторит)
+
+    @property
+    def url(self) -> str:
+        """Полный адрес webhook для setWebhook."""
+        return f"{self.base_url.rstrip('/')}{self.path}"
+
+
+@dataclass
+class MetricsConfig:
+    """Конфигурация HTTP-эндпоинта метрик (формат Prometheus)."""
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    port: int = 9100                # В многопроцессном режиме воркер шарда N слушает port + N + 1
+    path: str = "/metrics"
+
+
+@dataclass
+class AdmissionConfig:
+    """Конфигурация контроля нагрузки (AdmissionMiddleware)."""
+    max_concurrency: int = 50   # Сколько апдейтов обрабатывается одновременно
+    max_queue: int = 200        # Сколько апдейтов может ждать свободного слота
+    queue_timeout: float = 10.0  # Сколько секунд апдейт может ждать, прежде чем будет отброшен
+    max_per_user: int = 3       # Сколько апдейтов одного пользователя может быть в работе и в очереди
+
+
+@dataclass
+class ShardingConfig:
+    """Конфигурация многопроцессного режима с шардированием по user_id."""
+    workers: int = 1                      # 1 - обычный однопроцессный режим
+    stream_prefix: str = "bot:updates"
+    stream_maxlen: int = 100000
+    worker_max_in_flight: int = 50
+    worker_db_pool_size: int = 5
+    worker_db_max_overflow: int = 5
+    worker_redis_max_connections: int = 20
 
 
 @dataclass
@@ -47,6 +152,8 @@ class BotConfig:
     token: str
     log_level: str
     admin_ids: list[int]
+    log_levels: dict[str, str] = field(default_factory=dict)  # Уровни отдельных логгеров
+    mode: str = "polling"  # polling | webhook
 
 
 @dataclass
@@ -56,25 +163,47 @@ class Config:
     database: DatabaseConfig
     redis: RedisConfig
     google_sheets: GoogleSheetsConfig
+    user_cache: UserCacheConfig
+    event_cache: EventCacheConfig
+    webhook: WebhookConfig
+    sharding: ShardingConfig
+    admission: AdmissionConfig
+    metrics: MetricsConfig
 
 
 def load_config() -> Config:
     """Загружает конфигурацию из переменных окружения."""
     env = Env()
     env.read_env()
+    sheets_backend = env.str("GOOGLE_SHEETS_BACKEND", "gspread")
+    bot_mode = env.str("BOT_MODE", "polling")
+    webhook_secret = env.str("WEBHOOK_SECRET", "")
+    if bot_mode == "webhook" and not webhook_secret:
+        # Без секрета webhook принял бы апдейты от кого угодно, знающего адрес
+        raise EnvError('Environment variable "WEBHOOK_SECRET" must be set when BOT_MODE=webhook')
 
     return Config(
         bot=BotConfig(
             token=env.str("BOT_TOKEN"),
             log_level=env.str("LOG_LEVEL", "INFO"),
-            admin_ids=[int(id_str.strip()) for id_str in env.str("BOT_ADMIN_IDS", "257026813").split(",")]
+            admin_ids=[int(id_str.strip()) for id_str in env.str("BOT_ADMIN_IDS", "257026813").split(",")],
+            log_levels=parse_logger_levels(env.str("LOG_LEVELS", "")),
+            mode=bot_mode
         ),
         database=DatabaseConfig(
             host=env.str("DB_HOST"),
             port=env.int("DB_PORT"),
             user=env.str("DB_USER"),
             password=env.str("DB_PASS"),
-            database=env.str("DB_NAME")
+            database=env.str("DB_NAME"),
+            pool_size=env.int("DB_POOL_SIZE", 5),
+            max_overflow=env.int("DB_MAX_OVERFLOW", 10),
+            pool_timeout=env.float("DB_POOL_TIMEOUT", 30.0),
+            pool_recycle=env.int("DB_POOL_RECYCLE", 1800),
+            pool_pre_ping=env.bool("DB_POOL_PRE_PING", True),
+            driver=env.str("DB_DRIVER", "psycopg"),
+            prepare_threshold=env.int("DB_PREPARE_THRESHOLD", 5) if env.str("DB_PREPARE_THRESHOLD", "") != "none" else None,
+            statement_timeout_ms=env.int("DB_STATEMENT_TIMEOUT_MS", 0) or None
         ),
         redis=RedisConfig(
             host=env.str("REDIS_HOST"),
@@ -82,7 +211,63 @@ def load_config() -> Config:
             password=env.str("REDIS_PASSWORD", None) if env.str("REDIS_PASSWORD", "") else None
         ),
         google_sheets=GoogleSheetsConfig(
-            credentials_path=env.str("GOOGLE_CREDENTIALS_PATH"),
-            spreadsheet_url=env.str("GOOGLE_SPREADSHEET_URL")
+            # Для локальных бэкендов доступ к Google не нужен
+            credentials_path=env.str("GOOGLE_CREDENTIALS_PATH") if sheets_backend == "gspread" else env.str("GOOGLE_CREDENTIALS_PATH", ""),
+            spreadsheet_url=env.str("GOOGLE_SPREADSHEET_URL") if sheets_backend == "gspread" else env.str("GOOGLE_SPREADSHEET_URL", ""),
+            worksheet_cache_ttl=env.int("SHEETS_WORKSHEET_CACHE_TTL", 3600),
+            outbox_poll_interval=env.float("SHEETS_OUTBOX_POLL_INTERVAL", 1.0),
+            outbox_batch_size=env.int("SHEETS_OUTBOX_BATCH_SIZE", 200),
+            append_batch_size=env.int("SHEETS_APPEND_BATCH_SIZE", 50),
+            append_flush_interval=env.float("SHEETS_APPEND_FLUSH_INTERVAL", 2.0),
+            outbox_max_attempts=env.int("SHEETS_OUTBOX_MAX_ATTEMPTS", 20),
+            row_hash_ttl=env.int("SHEETS_ROW_HASH_TTL", 86400),
+            reconcile_interval=env.int("SHEETS_RECONCILE_INTERVAL", 0),
+            read_quota_per_minute=env.int("SHEETS_READ_QUOTA_PER_MINUTE", 60),
+            write_quota_per_minute=env.int("SHEETS_WRITE_QUOTA_PER_MINUTE", 60),
+            retry_max_attempts=env.int("SHEETS_RETRY_MAX_ATTEMPTS", 5),
+            retry_base_delay=env.float("SHEETS_RETRY_BASE_DELAY", 1.0),
+            retry_max_delay=env.float("SHEETS_RETRY_MAX_DELAY", 64.0),
+            backend=sheets_backend,
+            local_dir=env.str("SHEETS_LOCAL_DIR", "sheets_local"),
+            local_latency_ms=env.float("SHEETS_LOCAL_LATENCY_MS", 0.0),
+            local_failure_rate=env.float("SHEETS_LOCAL_FAILURE_RATE", 0.0)
+        ),
+        user_cache=UserCacheConfig(
+            ttl_seconds=env.int("USER_CACHE_TTL", 300),
+            backend=env.str("USER_CACHE_BACKEND", "memory")
+        ),
+        event_cache=EventCacheConfig(
+            catalog_check_interval=env.float("EVENT_CATALOG_CHECK_INTERVAL", 1.0),
+            seat_reconcile_interval=env.float("SEAT_COUNTER_RECONCILE_INTERVAL", 60.0)
+        ),
+        webhook=WebhookConfig(
+            base_url=env.str("WEBHOOK_BASE_URL", ""),
+            path=env.str("WEBHOOK_PATH", "/webhook"),
+            host=env.str("WEBHOOK_HOST", "0.0.0.0"),
+            port=env.int("WEBHOOK_PORT", 8080),
+            secret_token=webhook_secret or None,
+            max_in_flight=env.int("WEBHOOK_MAX_IN_FLIGHT", 100),
+            max_pending=env.int("WEBHOOK_MAX_PENDING", 1000)
+        ),
+        sharding=ShardingConfig(
+            workers=env.int("BOT_WORKERS", 1),
+            stream_prefix=env.str("SHARD_STREAM_PREFIX", "bot:updates"),
+            stream_maxlen=env.int("SHARD_STREAM_MAXLEN", 100000),
+            worker_max_in_flight=env.int("WORKER_MAX_IN_FLIGHT", 50),
+            worker_db_pool_size=env.int("WORKER_DB_POOL_SIZE", 5),
+            worker_db_max_overflow=env.int("WORKER_DB_MAX_OVERFLOW", 5),
+            worker_redis_max_connections=env.int("WORKER_REDIS_MAX_CONNECTIONS", 20)
+        ),
+        admission=AdmissionConfig(
+            max_concurrency=env.int("ADMISSION_MAX_CONCURRENCY", 50),
+            max_queue=env.int("ADMISSION_MAX_QUEUE", 200),
+            queue_timeout=env.float("ADMISSION_QUEUE_TIMEOUT", 10.0),
+            max_per_user=env.int("ADMISSION_MAX_PER_USER", 3),
+        ),
+        metrics=MetricsConfig(
+            enabled=env.bool("METRICS_ENABLED", False),
+            host=env.str("METRICS_HOST", "0.0.0.0"),
+            port=env.int("METRICS_PORT", 9100),
+            path=env.str("METRICS_PATH", "/metrics")
         )
     )
\ No newline at end of file
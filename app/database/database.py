@@ -1,29 +1,90 @@
 """Подключение к базе данных."""
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Dict
 from contextlib import asynccontextmanager
 
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config.config import DatabaseConfig
+from app.infrastructure.metrics.instruments import instrument_engine
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает ожидание свободного соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+
+    def recreate(self):
+        # При пересоздании (dispose/invalidate) статистика переносится в новый пул
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.wait_time_total = self.wait_time_total
+        pool.wait_time_max = self.wait_time_max
+        pool.timeouts = self.timeouts
+        return pool
+
+    def _create_connection(self):
+        # Время открытия нового соединения - не ожидание в очереди: _do_get его вычитает
+        started = time.perf_counter()
+        record = super()._create_connection()
+        record._connect_span = (started, time.perf_counter())
+        return record
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            self._observe_wait(time.perf_counter() - started)
+            raise
+        waited = time.perf_counter() - started
+        connect_started, connect_finished = getattr(record, "_connect_span", (0.0, 0.0))
+        if connect_started >= started:
+            waited -= connect_finished - connect_started
+        self._observe_wait(waited)
+        return record
+
+    def _observe_wait(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_time_total += waited
+        if waited > self.wait_time_max:
+            self.wait_time_max = waited
 
 
 class Database:
     """Класс для управления подключением к базе данных."""
-    
+
     def __init__(self, config: DatabaseConfig):
-        # Используем psycopg для асинхронной работы
+        # Драйвер (psycopg/asyncpg) и параметры пула задаются в DatabaseConfig
+        self.config = config
         self.engine = create_async_engine(
-            config.url,
+            config.async_url,
             echo=False,
-            future=True
+            future=True,
+            poolclass=InstrumentedQueuePool,
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+            pool_timeout=config.pool_timeout,
+            pool_recycle=config.pool_recycle,
+            pool_pre_ping=config.pool_pre_ping,
+            connect_args=config.connect_args
         )
-        
+        instrument_engine(self.engine)
+
         self.session_factory = async_sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
-    
+
     @asynccontextmanager
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         """Получить сессию базы данных как async context manager."""
@@ -36,7 +97,30 @@ class Database:
                 raise
             finally:
                 await session.close()
-    
+
+    def get_pool_stats(self) -> Dict[str, float]:
+        """
+        Текущее состояние пула соединений (для подбора размеров под max_connections).
+        Только числа: словарь целиком уходит в gauge bot_db_pool; драйвер - в config.driver.
+        """
+        pool = self.engine.pool
+        stats = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": self.config.max_overflow,
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_time_total=round(pool.wait_time_total, 6),
+                wait_time_max=round(pool.wait_time_max, 6),
+                wait_time_avg=round(pool.wait_time_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+            )
+        return stats
+
     async def close(self):
         """Закрыть соединение с базой данных."""
-        await self.engine.dispose()
\ No newline at end of file
+        await self.engine.dispose()
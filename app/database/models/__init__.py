@@ -3,6 +3,7 @@ from .base import Base
 from .user import User
 from .registration import Event, EventRegistration
 from .passport import PassportData
+from .outbox import SheetsOutbox, SheetsRowHash
 
 # Экспортируем все модели
-__all__ = ["Base", "User", "Event", "EventRegistration", "PassportData"]
\ No newline at end of file
+__all__ = ["Base", "User", "Event", "EventRegistration", "PassportData", "SheetsOutbox", "SheetsRowHash"]
\ No newline at end of file
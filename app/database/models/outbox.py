@@ -0,0 +1,51 @@
+"""Модели синхронизации с Google Sheets: исходящая очередь (transactional outbox) и хэши строк."""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import JSON, BigInteger, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class SheetsOutbox(Base):
+    """
+    Операция с Google Sheets, записанная в той же транзакции, что и изменение данных.
+    Фоновый диспетчер выполняет записи по порядку id в рамках листа.
+    """
+
+    __tablename__ = "sheets_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    operation: Mapped[str] = mapped_column(String(50), nullable=False)  # Метод GoogleSheetsManager
+    sheet_name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    idempotency_key: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"<SheetsOutbox(id={self.id}, operation={self.operation!r}, "
+            f"sheet={self.sheet_name!r}, attempts={self.attempts})>"
+        )
+
+
+class SheetsRowHash(Base):
+    """
+    Хэш содержимого строки пользователя на листе (без колонки даты) на момент
+    последней записи. Запись с тем же хэшем не отправляется в API.
+    """
+
+    __tablename__ = "sheets_row_hashes"
+
+    sheet_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(32), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SheetsRowHash(sheet={self.sheet_name!r}, telegram_id={self.telegram_id})>"
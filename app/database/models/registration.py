@@ -29,6 +29,8 @@ class Event(Base):
     event_type: Mapped[str] = mapped_column(String(50), nullable=False)
     is_exclusive: Mapped[bool] = mapped_column(default=False)  # Взаимоисключающие мероприятия
     max_participants: Mapped[int] = mapped_column(nullable=True)  # Максимальное количество участников
+    # Занятые места; меняется только вместе с регистрациями (RegistrationRepository)
+    seats_taken: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
     sheet_name: Mapped[str] = mapped_column(String(100), nullable=False)  # Название листа в Google Sheets
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     
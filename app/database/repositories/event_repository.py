@@ -1,12 +1,15 @@
 """Репозиторий для работы с мероприятиями и регистрациями."""
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from sqlalchemy import select, and_, func
+from sqlalchemy import delete, insert, or_, select, and_, func, literal, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models.registration import Event, EventRegistration
 from app.database.models.user import User
+from app.infrastructure.cache.seat_counters import record_seat_delta
 
 
 class EventRepository:
@@ -50,8 +53,8 @@ class RegistrationRepository:
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
     
-    async def is_user_registered(self, user_id: int, event_id: int) -> bool:
-        """Проверить, зарегистрирован ли пользователь на мероприятие."""
+    async def get_registration(self, user_id: int, event_id: int) -> Optional[EventRegistration]:
+        """Получить регистрацию пользователя на мероприятие."""
         stmt = select(EventRegistration).where(
             and_(
                 EventRegistration.user_id == user_id,
@@ -59,20 +62,53 @@ class RegistrationRepository:
             )
         )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none() is not None
+        return result.scalar_one_or_none()
     
-    async def register_user(self, user_id: int, event_id: int) -> EventRegistration:
-        """Зарегистрировать пользователя на мероприятие."""
-        registration = EventRegistration(
-            user_id=user_id,
-            event_id=event_id
+    async def stream_event_participants(
+        self, event_id: int, chunk_size: int = 500
+    ) -> AsyncIterator[Tuple[User, datetime]]:
+        """Участники мероприятия в порядке регистрации, чтение порциями через серверный курсор."""
+        stmt = (
+            select(User, EventRegistration.registered_at)
+            .join(EventRegistration, EventRegistration.user_id == User.id)
+            .where(EventRegistration.event_id == event_id)
+            .order_by(EventRegistration.id)
+            .execution_options(yield_per=chunk_size)
         )
-        self.session.add(registration)
-        await self.session.flush()
-        return registration
+        result = await self.session.stream(stmt)
+        async for user, registered_at in result:
+            yield user, registered_at
     
-    async def unregister_user(self, user_id: int, event_id: int) -> bool:
-        """Отменить регистрацию пользователя на мероприятие."""
+    async def get_counts_by_event(self, user_id: Optional[int] = None) -> Dict[int, Tuple[int, bool]]:
+        """
+        Одним GROUP BY: event_id -> (число участников, зарегистрирован ли user_id).
+        Мероприятий без регистраций в результате нет.
+        """
+        registered = (
+            func.count(EventRegistration.id).filter(EventRegistration.user_id == user_id) > 0
+            if user_id is not None
+            else literal(False)
+        )
+        stmt = (
+            select(EventRegistration.event_id, func.count(EventRegistration.id), registered)
+            .group_by(EventRegistration.event_id)
+        )
+        result = await self.session.execute(stmt)
+        return {event_id: (count, bool(is_registered)) for event_id, count, is_registered in result.all()}
+    
+    async def get_seat_counts(self) -> Dict[int, int]:
+        """Занятые места каждого мероприятия (events.seats_taken)."""
+        result = await self.session.execute(select(Event.id, Event.seats_taken))
+        return {event_id: seats_taken for event_id, seats_taken in result.all()}
+    
+    async def get_user_event_ids(self, user_id: int) -> List[int]:
+        """ID мероприятий, на которые записан пользователь."""
+        stmt = select(EventRegistration.event_id).where(EventRegistration.user_id == user_id)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+    
+    async def is_user_registered(self, user_id: int, event_id: int) -> bool:
+        """Проверить, зарегистрирован ли пользователь на мероприятие."""
         stmt = select(EventRegistration).where(
             and_(
                 EventRegistration.user_id == user_id,
@@ -80,13 +116,143 @@ class RegistrationRepository:
             )
         )
         result = await self.session.execute(stmt)
-        registration = result.scalar_one_or_none()
+        return result.scalar_one_or_none() is not None
+    
+    async def register_user(self, user_id: int, event_id: int) -> Optional[int]:
+        """
+        Зарегистрировать пользователя на мероприятие, заняв место одним запросом.
+
+        Место занимается условным UPDATE events.seats_taken: строка мероприятия
+        остается заблокированной до конца транзакции, поэтому параллельные
+        регистрации на него выстраиваются в очередь и не превышают лимит.
+        Возвращает ID регистрации или None, если мест нет (или пользователь
+        уже зарегистрирован).
+        """
+        seat = (
+            update(Event)
+            .where(
+                Event.id == event_id,
+                or_(Event.max_participants.is_(None), Event.seats_taken < Event.max_participants),
+                ~select(EventRegistration.id)
+                .where(EventRegistration.user_id == user_id, EventRegistration.event_id == event_id)
+                .exists(),
+            )
+            .values(seats_taken=Event.seats_taken + 1)
+            .returning(Event.id)
+            .cte("seat")
+        )
+        stmt = (
+            insert(EventRegistration)
+            .from_select(["user_id", "event_id"], select(literal(user_id), seat.c.id))
+            .returning(EventRegistration.id)
+        )
+        result = await self.session.execute(stmt)
+        registration_id = result.scalar_one_or_none()
+        if registration_id is not None:
+            record_seat_delta(self.session.info, event_id, 1)
+        return registration_id
+    
+    async def unregister_user(self, user_id: int, event_id: int) -> bool:
+        """Отменить регистрацию пользователя на мероприятие и освободить место одним запросом."""
+        removed = (
+            delete(EventRegistration)
+            .where(EventRegistration.user_id == user_id, EventRegistration.event_id == event_id)
+            .returning(EventRegistration.event_id)
+            .cte("removed")
+        )
+        stmt = (
+            update(Event)
+            .where(Event.id == removed.c.event_id)
+            .values(seats_taken=func.greatest(Event.seats_taken - 1, 0))
+            .returning(Event.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(stmt)
+        if result.scalar_one_or_none() is None:
+            return False
+        record_seat_delta(self.session.info, event_id, -1)
+        return True
+    
+    async def register_user_many(self, user_id: int, event_ids: List[int]) -> Dict[int, int]:
+        """
+        Зарегистрировать пользователя на несколько мероприятий одним запросом.
+
+        Места занимаются так же, как в register_user, а регистрации вставляются
+        через INSERT ... ON CONFLICT DO NOTHING. Возвращает event_id -> ID
+        регистрации для мероприятий, где место получено.
+        """
+        if not event_ids:
+            return {}
+        seats = (
+            update(Event)
+            .where(
+                Event.id.in_(event_ids),
+                or_(Event.max_participants.is_(None), Event.seats_taken < Event.max_participants),
+                ~select(EventRegistration.id)
+                .where(EventRegistration.user_id == user_id, EventRegistration.event_id == Event.id)
+                .exists(),
+            )
+            .values(seats_taken=Event.seats_taken + 1)
+            .returning(Event.id)
+            .cte("seats")
+        )
+        added = (
+            pg_insert(EventRegistration)
+            .from_select(["user_id", "event_id"], select(literal(user_id), seats.c.id))
+            .on_conflict_do_nothing(index_elements=[EventRegistration.user_id, EventRegistration.event_id])
+            .returning(EventRegistration.id, EventRegistration.event_id)
+            .cte("added")
+        )
+        stmt = select(seats.c.id, added.c.id).outerjoin(added, added.c.event_id == seats.c.id)
+        result = await self.session.execute(stmt)
         
-        if registration:
-            await self.session.delete(registration)
-            await self.session.flush()
-            return True
-        return False
+        registrations = {}
+        conflicts = []
+        for event_id, registration_id in result.all():
+            if registration_id is None:
+                # Параллельная регистрация того же пользователя успела раньше: место возвращаем
+                conflicts.append(event_id)
+            else:
+                registrations[event_id] = registration_id
+                record_seat_delta(self.session.info, event_id, 1)
+        if conflicts:
+            await self._release_seats(conflicts)
+        return registrations
+    
+    async def unregister_user_many(self, user_id: int, event_ids: List[int]) -> Dict[int, int]:
+        """
+        Отменить регистрации на несколько мероприятий одним DELETE, освободив места.
+        Возвращает event_id -> ID удаленной регистрации.
+        """
+        if not event_ids:
+            return {}
+        removed = (
+            delete(EventRegistration)
+            .where(EventRegistration.user_id == user_id, EventRegistration.event_id.in_(event_ids))
+            .returning(EventRegistration.id, EventRegistration.event_id)
+            .cte("removed")
+        )
+        stmt = (
+            update(Event)
+            .where(Event.id == removed.c.event_id)
+            .values(seats_taken=func.greatest(Event.seats_taken - 1, 0))
+            .returning(removed.c.event_id, removed.c.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(stmt)
+        registrations = dict(result.all())
+        for event_id in registrations:
+            record_seat_delta(self.session.info, event_id, -1)
+        return registrations
+    
+    async def _release_seats(self, event_ids: List[int]) -> None:
+        stmt = (
+            update(Event)
+            .where(Event.id.in_(event_ids))
+            .values(seats_taken=func.greatest(Event.seats_taken - 1, 0))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
     
     async def has_exclusive_registration(self, user_id: int) -> bool:
         """Проверить, есть ли у пользователя регистрация на взаимоисключающее мероприятие."""
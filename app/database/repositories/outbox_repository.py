@@ -0,0 +1,248 @@
+"""Репозиторий исходящей очереди синхронизации с Google Sheets."""
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models.outbox import SheetsOutbox, SheetsRowHash
+from app.infrastructure.cache.user_profile_cache import UserProfile
+from app.infrastructure.google_sheets.sheets_manager import GENERAL_SHEET, PASSPORT_SHEET
+
+# Ключ в session.info: в транзакции появились записи outbox (диспетчера можно разбудить после commit)
+OUTBOX_WRITTEN_KEY = "sheets_outbox_written"
+
+# Ключ advisory-блокировки Postgres: очередь разбирает один диспетчер на все процессы
+DISPATCHER_LOCK_KEY = 0x5348454554  # "SHEET"
+
+
+class SheetsOutboxRepository:
+    """Запись и выборка операций для Google Sheets."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add(
+        self,
+        operation: str,
+        sheet_name: str,
+        payload: Dict[str, Any],
+        idempotency_key: str,
+    ) -> None:
+        """Добавить операцию в очередь (повтор с тем же ключом игнорируется)."""
+        await self.add_many([(operation, sheet_name, payload, idempotency_key)])
+
+    async def add_many(self, operations: List[Tuple[str, str, Dict[str, Any], str]]) -> None:
+        """Добавить операции (operation, sheet_name, payload, idempotency_key) одним INSERT."""
+        if not operations:
+            return
+        stmt = (
+            insert(SheetsOutbox)
+            .values([
+                {
+                    "operation": operation,
+                    "sheet_name": sheet_name,
+                    "payload": payload,
+                    "idempotency_key": idempotency_key,
+                }
+                for operation, sheet_name, payload, idempotency_key in operations
+            ])
+            .on_conflict_do_nothing(index_elements=[SheetsOutbox.idempotency_key])
+        )
+        await self.session.execute(stmt)
+        self.session.info[OUTBOX_WRITTEN_KEY] = True
+
+    async def add_user_to_general_sheet(self, user: UserProfile) -> None:
+        await self.add(
+            "add_user_to_general_sheet",
+            GENERAL_SHEET,
+            {"user": asdict(user), "timestamp": _now()},
+            f"general:add:{user.telegram_id}",
+        )
+
+    async def add_user_to_event_sheet(
+        self,
+        user: UserProfile,
+        event_name: str,
+        sheet_name: str,
+        registration_id: int,
+    ) -> None:
+        await self.add(*_event_add_operation(user, event_name, sheet_name, registration_id))
+
+    async def remove_user_from_event_sheet(self, user: UserProfile, sheet_name: str, registration_id: int) -> None:
+        await self.add(*_event_remove_operation(user, sheet_name, registration_id))
+
+    async def sync_event_registrations(
+        self,
+        user: UserProfile,
+        added: Iterable[Tuple[str, str, int]],
+        removed: Iterable[Tuple[str, int]],
+    ) -> None:
+        """
+        Все изменения листов мероприятий одного пользователя одним INSERT:
+        added - (event_name, sheet_name, registration_id), removed - (sheet_name, registration_id).
+        """
+        operations = [_event_remove_operation(user, *item) for item in removed]
+        operations += [_event_add_operation(user, *item) for item in added]
+        await self.add_many(operations)
+
+    async def upsert_passport_entry(
+        self,
+        user: UserProfile,
+        full_name: str,
+        passport_number: str,
+        car_number: Optional[str],
+    ) -> None:
+        # Каждое сохранение - отдельная операция: upsert на листе идемпотентен сам по себе
+        await self.add(
+            "upsert_passport_entry",
+            PASSPORT_SHEET,
+            {
+                "user": asdict(user),
+                "full_name": full_name,
+                "passport_number": passport_number,
+                "car_number": car_number,
+                "timestamp": _now(),
+            },
+            f"passport:{user.telegram_id}:{uuid.uuid4().hex}",
+        )
+
+    async def try_lock_dispatcher(self) -> bool:
+        """
+        Захватить блокировку диспетчера до unlock_dispatcher, не дожидаясь ее
+        (блокировка сессии Postgres: переживает commit, см. outbox.dispatcher_lock).
+        """
+        result = await self.session.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": DISPATCHER_LOCK_KEY}
+        )
+        return bool(result.scalar())
+
+    async def unlock_dispatcher(self) -> None:
+        await self.session.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": DISPATCHER_LOCK_KEY})
+
+    async def get_pending_ids(self, sheet_name: str) -> List[int]:
+        """Id необработанных операций листа, видимых в текущей транзакции."""
+        stmt = (
+            select(SheetsOutbox.id)
+            .where(SheetsOutbox.sheet_name == sheet_name, SheetsOutbox.processed_at.is_(None))
+            .order_by(SheetsOutbox.id)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def mark_processed(self, ids: List[int]) -> None:
+        """Пометить операции обработанными без доставки (их результат уже на листе)."""
+        if not ids:
+            return
+        stmt = (
+            update(SheetsOutbox)
+            .where(SheetsOutbox.id.in_(ids))
+            .values(processed_at=func.now())
+        )
+        await self.session.execute(stmt)
+
+    async def get_pending(self, limit: int) -> List[Tuple[SheetsOutbox, bool, float]]:
+        """
+        Необработанные операции в порядке записи: запись, наступило ли время попытки
+        и возраст записи в секундах (по часам БД).
+        """
+        stmt = (
+            select(
+                SheetsOutbox,
+                (SheetsOutbox.next_attempt_at <= func.now()).label("due"),
+                func.extract("epoch", func.now() - SheetsOutbox.created_at).label("age"),
+            )
+            .where(SheetsOutbox.processed_at.is_(None))
+            .order_by(SheetsOutbox.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return [(entry, bool(due), float(age or 0.0)) for entry, due, age in result.all()]
+
+    async def get_backlog(self) -> Tuple[int, float]:
+        """Количество необработанных операций и возраст самой старой, в секундах."""
+        stmt = select(
+            func.count(SheetsOutbox.id),
+            func.extract("epoch", func.now() - func.min(SheetsOutbox.created_at)),
+        ).where(SheetsOutbox.processed_at.is_(None))
+        result = await self.session.execute(stmt)
+        count, oldest_age = result.one()
+        return count or 0, float(oldest_age or 0.0)
+
+
+class SheetsRowHashRepository:
+    """Хэши содержимого строк на листах: пропуск записей, которые ничего не меняют."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_fresh(self, sheet_name: str, telegram_ids: List[int], max_age_seconds: int) -> Dict[int, str]:
+        """Хэши строк, записанные не раньше max_age_seconds назад (более старым не доверяем)."""
+        if not telegram_ids or max_age_seconds <= 0:
+            return {}
+        stmt = select(SheetsRowHash.telegram_id, SheetsRowHash.content_hash).where(
+            SheetsRowHash.sheet_name == sheet_name,
+            SheetsRowHash.telegram_id.in_(telegram_ids),
+            SheetsRowHash.updated_at >= func.now() - timedelta(seconds=max_age_seconds),
+        )
+        result = await self.session.execute(stmt)
+        return {telegram_id: content_hash for telegram_id, content_hash in result.all()}
+
+    async def save(self, sheet_name: str, hashes: Dict[int, str], chunk_size: int = 1000) -> None:
+        items = list(hashes.items())
+        for start in range(0, len(items), chunk_size):
+            stmt = insert(SheetsRowHash).values(
+                [
+                    {"sheet_name": sheet_name, "telegram_id": telegram_id, "content_hash": content_hash}
+                    for telegram_id, content_hash in items[start:start + chunk_size]
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SheetsRowHash.sheet_name, SheetsRowHash.telegram_id],
+                set_={"content_hash": stmt.excluded.content_hash, "updated_at": func.now()},
+            )
+            await self.session.execute(stmt)
+
+    async def delete(self, sheet_name: str, telegram_ids: List[int]) -> None:
+        if not telegram_ids:
+            return
+        await self.session.execute(
+            delete(SheetsRowHash).where(
+                SheetsRowHash.sheet_name == sheet_name, SheetsRowHash.telegram_id.in_(telegram_ids)
+            )
+        )
+
+    async def replace_sheet(self, sheet_name: str, hashes: Dict[int, str]) -> None:
+        """Заменить все хэши листа (после полной сверки)."""
+        await self.session.execute(delete(SheetsRowHash).where(SheetsRowHash.sheet_name == sheet_name))
+        await self.save(sheet_name, hashes)
+
+
+def _event_add_operation(
+    user: UserProfile, event_name: str, sheet_name: str, registration_id: int
+) -> Tuple[str, str, Dict[str, Any], str]:
+    return (
+        "add_user_to_event_sheet",
+        sheet_name,
+        {"user": asdict(user), "event_name": event_name, "sheet_name": sheet_name, "timestamp": _now()},
+        f"event:{sheet_name}:add:{registration_id}",
+    )
+
+
+def _event_remove_operation(
+    user: UserProfile, sheet_name: str, registration_id: int
+) -> Tuple[str, str, Dict[str, Any], str]:
+    return (
+        "remove_user_from_event_sheet",
+        sheet_name,
+        {"user": asdict(user), "sheet_name": sheet_name},
+        f"event:{sheet_name}:remove:{registration_id}",
+    )
+
+
+def _now() -> str:
+    # Время операции фиксируется при записи в outbox, а не при доставке в таблицу
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -1,10 +1,11 @@
 """Репозиторий для работы с паспортными данными пользователей."""
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models.passport import PassportData
+from app.database.models.user import User
 
 
 class PassportRepository:
@@ -19,6 +20,18 @@ class PassportRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def stream_all_with_users(self, chunk_size: int = 500) -> AsyncIterator[Tuple[PassportData, User]]:
+        """Все паспортные данные с владельцами в порядке первого сохранения."""
+        stmt = (
+            select(PassportData, User)
+            .join(User, User.id == PassportData.user_id)
+            .order_by(PassportData.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream(stmt)
+        async for passport_data, user in result:
+            yield passport_data, user
+
     async def upsert_passport_data(
         self,
         user_id: int,
@@ -1,5 +1,5 @@
 """Репозиторий для работы с пользователями."""
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Optional, List
 
 import secrets
 from sqlalchemy import select, func
@@ -8,19 +8,45 @@ from sqlalchemy.orm import aliased
 
 from app.database.models.registration import EventRegistration
 from app.database.models.user import User
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+
+
+# Ключ карты идентичности в session.info: живет столько же, сколько сессия (один апдейт)
+IDENTITY_MAP_KEY = "users_by_telegram_id"
+# telegram_id, чьи профили нужно повторно инвалидировать после коммита
+PROFILE_INVALIDATIONS_KEY = "user_profile_invalidations"
 
 
 class UserRepository:
     """Репозиторий для работы с пользователями."""
     
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, profile_cache: Optional[UserProfileCache] = None):
         self.session = session
+        self.profile_cache = profile_cache
+    
+    @property
+    def _identity_map(self) -> Dict[int, Optional[User]]:
+        """Карта telegram_id -> User, общая для всех репозиториев одной сессии."""
+        return self.session.info.setdefault(IDENTITY_MAP_KEY, {})
     
     async def get_by_telegram_id(self, telegram_id: int) -> Optional[User]:
-        """Получить пользователя по telegram_id."""
+        """Получить пользователя по telegram_id (повторные вызовы в рамках сессии не ходят в БД)."""
+        identity_map = self._identity_map
+        if telegram_id in identity_map:
+            return identity_map[telegram_id]
+        
         stmt = select(User).where(User.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+        identity_map[telegram_id] = user
+        return user
+    
+    async def stream_all(self, chunk_size: int = 500) -> AsyncIterator[User]:
+        """Все пользователи в порядке регистрации, чтение порциями через серверный курсор."""
+        stmt = select(User).order_by(User.id).execution_options(yield_per=chunk_size)
+        result = await self.session.stream_scalars(stmt)
+        async for user in result:
+            yield user
     
     async def create(
         self,
@@ -44,6 +70,8 @@ class UserRepository:
         )
         self.session.add(user)
         await self.session.flush()
+        self._identity_map[telegram_id] = user
+        await self._invalidate_profile(user)
         return user
     
     async def update(
@@ -68,6 +96,7 @@ class UserRepository:
             user.username = username
         
         await self.session.flush()
+        await self._invalidate_profile(user)
         return user
 
     async def get_by_referral_code(self, referral_code: str) -> Optional[User]:
@@ -81,6 +110,7 @@ class UserRepository:
         if not user.referral_code:
             user.referral_code = await self._generate_unique_referral_code()
             await self.session.flush()
+            await self._invalidate_profile(user)
         return user
 
     async def count_referrals(self, user_id: int, target_event_ids: List[int]) -> int:
@@ -105,6 +135,7 @@ class UserRepository:
         """Назначить пригласившего пользователя."""
         user.referrer_id = referrer.id
         await self.session.flush()
+        await self._invalidate_profile(user)
         return user
 
     async def get_referral_leaderboard(self, target_event_ids: List[int]) -> List[tuple[int, str, str, int]]:
@@ -140,8 +171,18 @@ class UserRepository:
         """Обновить флаг уведомления о реферальной программе."""
         user.referral_notified = notified
         await self.session.flush()
+        await self._invalidate_profile(user)
         return user
 
+    async def _invalidate_profile(self, user: User) -> None:
+        """Сбросить межзапросный кэш профиля после записи."""
+        if self.profile_cache is None:
+            return
+        # Повторная инвалидация после коммита закрывает окно, в котором
+        # параллельный запрос мог закэшировать еще не зафиксированное состояние
+        self.session.info.setdefault(PROFILE_INVALIDATIONS_KEY, set()).add(user.telegram_id)
+        await self.profile_cache.invalidate(user.telegram_id)
+
     async def _generate_unique_referral_code(self) -> str:
         """Сгенерировать уникальный реферальный код."""
         while True:
@@ -11,7 +11,7 @@ async def get_user_info(dialog_manager: DialogManager, **kwargs) -> Dict[str, An
     user_service: UserService = dialog_manager.middleware_data["user_service"]
     telegram_id = dialog_manager.event.from_user.id
     
-    user = await user_service.get_user_by_telegram_id(telegram_id)
+    user = await user_service.get_user_profile(telegram_id)
     
     if user:
         return {
@@ -47,7 +47,7 @@ async def on_referral_click(callback, button: Button, dialog_manager: DialogMana
 async def on_passport_click(callback, button: Button, dialog_manager: DialogManager):
     """Обработчик перехода к заполнению паспортных данных."""
     user_service: UserService = dialog_manager.middleware_data["user_service"]
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+    user = await user_service.get_user_profile(callback.from_user.id)
 
     if not user:
         await callback.answer("Сначала пройдите регистрацию.", show_alert=True)
@@ -17,7 +17,7 @@ async def _fetch_user_and_passport(
     passport_service: PassportService = dialog_manager.middleware_data["passport_service"]
 
     telegram_id = dialog_manager.event.from_user.id
-    user = await user_service.get_user_by_telegram_id(telegram_id)
+    user = await user_service.get_user_profile(telegram_id)
 
     if not user:
         return None, None
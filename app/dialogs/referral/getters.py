@@ -16,7 +16,7 @@ async def get_referral_dashboard(dialog_manager: DialogManager, **kwargs) -> Dic
         bot = dialog_manager.event.bot
 
     telegram_id = dialog_manager.event.from_user.id
-    user = await user_service.get_user_by_telegram_id(telegram_id)
+    user = await user_service.get_user_profile(telegram_id)
 
     if not user:
         return {
@@ -13,7 +13,7 @@ async def on_share_link(callback, button: Button, dialog_manager: DialogManager)
     user_service: UserService = dialog_manager.middleware_data["user_service"]
     bot = dialog_manager.middleware_data.get("bot") or callback.bot
 
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+    user = await user_service.get_user_profile(callback.from_user.id)
     if not user:
         await callback.answer("Сначала завершите регистрацию", show_alert=True)
         return
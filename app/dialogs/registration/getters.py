@@ -54,20 +54,18 @@ async def get_optional_events_data(dialog_manager: DialogManager, **kwargs) -> D
     event_service: EventService = dialog_manager.middleware_data["event_service"]
     user_service: UserService = dialog_manager.middleware_data["user_service"]
     
-    # Получаем все мероприятия
-    all_events = await event_service.get_all_events()
-    
     # Получаем текущие регистрации пользователя для первичного заполнения
     telegram_id = dialog_manager.event.from_user.id
     user = await user_service.get_user_by_telegram_id(telegram_id)
     
+    # Мероприятия, число участников и регистрации пользователя - одним запросом
+    board = await event_service.get_event_board(user.id if user else None)
+    all_events = [item.event for item in board.items]
+    current_db_registrations = [str(item.event.id) for item in board.items if item.is_registered]
+    
     # Если состояние диалога пустое, заполняем текущими регистрациями
     if "selected_optional" not in dialog_manager.dialog_data:
-        current_selections = []
-        if user:
-            registrations = await event_service.get_user_registrations(user.id)
-            current_selections = [str(reg.event.id) for reg in registrations]
-        dialog_manager.dialog_data["selected_optional"] = current_selections
+        dialog_manager.dialog_data["selected_optional"] = current_db_registrations
     
     # Используем выбор из состояния диалога (не из БД!)
     current_selections = dialog_manager.dialog_data.get("selected_optional", [])
@@ -79,24 +77,18 @@ async def get_optional_events_data(dialog_manager: DialogManager, **kwargs) -> D
     available_events = []
     full_events_selected = []
     
-    for event in all_events:
-        # Получаем количество зарегистрированных
-        registered_count = await event_service.get_registered_count(event.id)
-        is_full = event.max_participants and registered_count >= event.max_participants
+    for item in board.items:
+        event = item.event
+        registered_count = item.registered_count
+        is_full = item.is_full
         is_selected = str(event.id) in current_selections
         
-        # Для заполненных мероприятий проверяем, выбран ли он сейчас в диалоге
         # Если пользователь уже был зарегистрирован, то он может отменить даже заполненное
-        current_db_registrations = []
-        if user:
-            db_registrations = await event_service.get_user_registrations(user.id)
-            current_db_registrations = [str(reg.event.id) for reg in db_registrations]
-        
-        was_registered_in_db = str(event.id) in current_db_registrations
+        was_registered_in_db = item.is_registered
         
         # Формируем информацию о мероприятии
         if event.max_participants:
-            available_spots = event.max_participants - registered_count
+            available_spots = item.available_spots
             spots_text = f"Осталось мест: {available_spots}" if available_spots > 0 else "🔒 Мест нет"
         else:
             spots_text = "Осталось мест: неограниченно"
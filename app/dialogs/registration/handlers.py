@@ -44,7 +44,9 @@ async def on_toggle_event_registration(
     
     try:
         event_id = int(item_id)
-        event = await event_service.get_event_by_id(event_id)
+        # Каталог берется из памяти процесса: переключение не обращается к БД
+        catalog = await event_service.get_catalog()
+        event = catalog.get(event_id)
         
         if not event:
             await callback.message.answer("❌ Мероприятие не найдено.")
@@ -62,9 +64,8 @@ async def on_toggle_event_registration(
             # Для взаимоисключающих мероприятий убираем другие взаимоисключающие
             if event.is_exclusive:
                 # Убираем другие взаимоисключающие мероприятия из выбора
-                all_events = await event_service.get_all_events()
-                for other_event in all_events:
-                    if other_event.is_exclusive and other_event.id != event_id:
+                for other_event in catalog.exclusive:
+                    if other_event.id != event_id:
                         other_id_str = str(other_event.id)
                         if other_id_str in current_selections:
                             current_selections.remove(other_id_str)
@@ -100,83 +101,47 @@ async def on_confirm_final_registration(callback, button: Button, dialog_manager
     # Получаем желаемый выбор из состояния диалога
     desired_selections = dialog_manager.dialog_data.get("selected_optional", [])
     
-    # Получаем текущие регистрации из БД
-    current_registrations = await event_service.get_user_registrations(user.id)
-    current_ids = [str(reg.event.id) for reg in current_registrations]
-    
-    # Определяем, что нужно добавить и что убрать
-    to_register = [event_id for event_id in desired_selections if event_id not in current_ids]
-    to_unregister = [event_id for event_id in current_ids if event_id not in desired_selections]
-    
-    success_count = 0
-    error_messages = []
-    
     try:
-        # Сначала проверяем лимиты для новых регистраций
-        events_to_register = []
-        for event_id_str in to_register:
-            event_id = int(event_id_str)
-            event = await event_service.get_event_by_id(event_id)
-            if not event:
-                error_messages.append(f"Мероприятие с ID {event_id} не найдено")
-                continue
-            events_to_register.append(event)
-            
-            # Проверяем лимиты
-            registered_count = await event_service.get_registered_count(event_id)
-            if event.max_participants and registered_count >= event.max_participants:
-                error_messages.append(f"🔒 Мероприятие '{event.name}' заполнено (лимит: {event.max_participants})")
+        # Весь выбор проверяется и сохраняется одним пакетом
+        result = await event_service.apply_selection(user, [int(event_id) for event_id in desired_selections])
         
-        # Если есть ошибки с лимитами, не продолжаем
-        if error_messages:
-            error_text = "❌ Не удалось сохранить изменения:\n" + "\n".join(error_messages)
+        # Если проверка не прошла, ничего не сохранено
+        if result.errors and not result.changed:
+            error_text = "❌ Не удалось сохранить изменения:\n" + "\n".join(result.errors)
             await callback.message.answer(error_text)
             await dialog_manager.switch_to(RegistrationSG.optional_events, show_mode=ShowMode.DELETE_AND_SEND)
             return
         
-        # Отменяем ненужные регистрации
-        for event_id_str in to_unregister:
-            event_id = int(event_id_str)
-            success, message = await event_service.unregister_user_from_event(user, event_id)
-            if success:
-                success_count += 1
-            else:
-                error_messages.append(f"Ошибка отмены: {message}")
+        success_count = result.changed
+        error_messages = list(result.errors)
         
-        # Добавляем новые регистрации
-        for event in events_to_register:
-            success, message = await event_service.register_user_for_event(user, event.id)
-            if success:
-                success_count += 1
-                # Отправляем приглашение в реферальную программу, если выполнены условия
-                if referral_service.should_notify_for_event(event) and not await referral_service.was_notified(user):
-                    await referral_service.ensure_user_has_referral_code(user)
-                    if user.referrer_id and not user.referral_joined_at:
-                        user.referral_joined_at = datetime.utcnow()
-                        session = dialog_manager.middleware_data.get("session")
-                        if session:
-                            await session.flush()
-                    link = await referral_service.get_invite_link(bot, user)
-                    await callback.message.answer(
-                        "🎉 <b>Реферальная программа запущена!</b>\n\n"
-                        "Теперь ты можешь приглашать друзей на форум. Передай им эту ссылку:\n"
-                        f"<code>{link}</code>\n\n"
-                        "Следи за приглашениями и статусом призов в разделе \"Реферальная программа\" главного меню.",
-                        reply_markup=InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [
-                                    InlineKeyboardButton(
-                                        text="Открыть реферальную программу",
-                                        callback_data="open_referral_dashboard",
-                                    )
-                                ]
-                            ]
-                        ),
-                        disable_web_page_preview=True,
-                    )
-                    await referral_service.mark_notified(user)
-            else:
-                error_messages.append(f"Ошибка регистрации: {message}")
+        # Отправляем приглашение в реферальную программу, если выполнены условия (один раз на весь выбор)
+        if any(referral_service.should_notify_for_event(event) for event in result.added) and not await referral_service.was_notified(user):
+            await referral_service.ensure_user_has_referral_code(user)
+            if user.referrer_id and not user.referral_joined_at:
+                user.referral_joined_at = datetime.utcnow()
+                session = dialog_manager.middleware_data.get("session")
+                if session:
+                    await session.flush()
+            link = await referral_service.get_invite_link(bot, user)
+            await callback.message.answer(
+                "🎉 <b>Реферальная программа запущена!</b>\n\n"
+                "Теперь ты можешь приглашать друзей на форум. Передай им эту ссылку:\n"
+                f"<code>{link}</code>\n\n"
+                "Следи за приглашениями и статусом призов в разделе \"Реферальная программа\" главного меню.",
+                reply_markup=InlineKeyboardMarkup(
+                    inline_keyboard=[
+                        [
+                            InlineKeyboardButton(
+                                text="Открыть реферальную программу",
+                                callback_data="open_referral_dashboard",
+                            )
+                        ]
+                    ]
+                ),
+                disable_web_page_preview=True,
+            )
+            await referral_service.mark_notified(user)
         
         # Формируем итоговое сообщение
         if success_count > 0:
@@ -5,6 +5,7 @@ from aiogram.types import CallbackQuery, Message
 from aiogram_dialog import DialogManager, StartMode
 import redis.asyncio as redis
 
+from app.database.database import Database
 from app.states import StartSG, MainMenuSG, ReferralSG
 from app.services.user_service import UserService
 from app.services.lock_service import LockService
@@ -115,4 +116,13 @@ async def lock_command(message: Message, redis_client: redis.Redis):
         await message.answer(
             "❌ <b>Ошибка</b>\n\n"
             "Произошла ошибка при выполнении команды."
-        )
\ No newline at end of file
+        )
+
+
+@router.message(Command("dbpool"), IsAdminFilter())
+async def dbpool_command(message: Message, database: Database):
+    """Обработчик команды /dbpool: состояние пула соединений с базой данных."""
+    stats = database.get_pool_stats()
+    lines = [f"driver: {database.config.driver}"]
+    lines += [f"{key}: {value}" for key, value in stats.items()]
+    await message.answer("🗄 <b>Пул соединений БД</b>\n\n" + "\n".join(lines))
@@ -0,0 +1 @@
+# Кэши
\ No newline at end of file
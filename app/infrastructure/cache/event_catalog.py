@@ -0,0 +1,154 @@
+"""Каталог мероприятий в памяти процесса с инвалидацией через версию в Redis."""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+
+from app.database.models.registration import Event
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Версия каталога: ее увеличивают скрипты, меняющие таблицу events (add_events.py)
+CATALOG_VERSION_KEY = "cache:event_catalog:version"
+
+# Порядок мероприятий в списках (по sheet_name), остальные - в конце
+EVENT_ORDER = {
+    "plenary_session": 1,      # Центральная пленарная сессия
+    "vtb_speech": 2,           # Выступление Андрея Костина
+    "career_workshop": 3,      # Кадры для будущего
+    "small_cities": 4,         # Возрождение малых городов
+    "smart_cities": 5,         # Нейроны мегаполисов
+}
+
+
+@dataclass(frozen=True)
+class CatalogEvent:
+    """Неизменяемый снимок мероприятия (атрибуты те же, что у модели Event)."""
+    id: int
+    name: str
+    description: Optional[str]
+    day: str
+    start_time: str
+    end_time: str
+    event_type: str
+    is_exclusive: bool
+    max_participants: Optional[int]
+    sheet_name: str
+
+    @classmethod
+    def from_event(cls, event: Event) -> "CatalogEvent":
+        return cls(
+            id=event.id,
+            name=event.name,
+            description=event.description,
+            day=event.day,
+            start_time=event.start_time,
+            end_time=event.end_time,
+            event_type=event.event_type,
+            is_exclusive=bool(event.is_exclusive),
+            max_participants=event.max_participants,
+            sheet_name=event.sheet_name,
+        )
+
+
+@dataclass(frozen=True)
+class EventCatalog:
+    """Снимок всех мероприятий в порядке показа с индексами по id, sheet_name и исключительности."""
+    events: Tuple[CatalogEvent, ...]
+    version: str = "0"
+    by_id: Dict[int, CatalogEvent] = field(init=False, repr=False, compare=False)
+    by_sheet_name: Dict[str, CatalogEvent] = field(init=False, repr=False, compare=False)
+    exclusive: Tuple[CatalogEvent, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Индексы строятся один раз на снимок; frozen не дает менять их снаружи
+        object.__setattr__(self, "by_id", {event.id: event for event in self.events})
+        object.__setattr__(self, "by_sheet_name", {event.sheet_name: event for event in self.events})
+        object.__setattr__(self, "exclusive", tuple(event for event in self.events if event.is_exclusive))
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event], version: str = "0") -> "EventCatalog":
+        """Собрать снимок, упорядочив мероприятия для показа (порядок загрузки из БД не важен)."""
+        # Мероприятия вне EVENT_ORDER идут после известных, по времени начала
+        ordered = sorted(events, key=lambda event: (EVENT_ORDER.get(event.sheet_name, 999), event.start_time))
+        return cls(tuple(CatalogEvent.from_event(event) for event in ordered), version)
+
+    def __iter__(self) -> Iterator[CatalogEvent]:
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def get(self, event_id: int) -> Optional[CatalogEvent]:
+        return self.by_id.get(event_id)
+
+
+class EventCatalogCache:
+    """
+    Держит снимок каталога в памяти процесса.
+
+    Актуальность проверяется по версии в Redis не чаще раза в check_interval
+    секунд; при смене версии каталог перечитывается из БД через loader.
+    Без Redis (или при его недоступности) снимок живет до рестарта процесса.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None, check_interval: float = 1.0):
+        self.redis = redis_client
+        self.check_interval = check_interval
+        self._catalog: Optional[EventCatalog] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.reloads = 0
+
+    async def get(self, loader: Callable[[], Awaitable[Sequence[Event]]]) -> EventCatalog:
+        """Вернуть актуальный снимок, при необходимости загрузив его через loader."""
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return catalog
+
+        async with self._lock:
+            version = await self._read_version()
+            catalog = self._catalog
+            if catalog is not None and (version is None or version == catalog.version):
+                self._checked_at = time.monotonic()
+                self.hits += 1
+                return catalog
+
+            events = await loader()
+            catalog = EventCatalog.from_events(events, version or "0")
+            self._catalog = catalog
+            self._checked_at = time.monotonic()
+            self.reloads += 1
+            logger.info("Каталог мероприятий загружен: %s шт., версия %s", len(catalog), catalog.version)
+            return catalog
+
+    def invalidate(self) -> None:
+        """Забыть снимок в этом процессе (следующий get перечитает БД)."""
+        self._catalog = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "events": len(self._catalog) if self._catalog is not None else 0,
+            "hits": self.hits,
+            "reloads": self.reloads,
+        }
+
+    async def _read_version(self) -> Optional[str]:
+        """Версия из Redis; None - Redis недоступен (доверяем текущему снимку)."""
+        if self.redis is None:
+            return self._catalog.version if self._catalog is not None else "0"
+        try:
+            return await self.redis.get(CATALOG_VERSION_KEY) or "0"
+        except Exception as e:
+            logger.warning("Не удалось прочитать версию каталога мероприятий: %s", e)
+            return None
+
+
+async def bump_catalog_version(redis_client: redis.Redis) -> int:
+    """Сообщить всем процессам бота, что таблица events изменилась."""
+    return await redis_client.incr(CATALOG_VERSION_KEY)
@@ -0,0 +1,188 @@
+"""Счетчики занятых мест на мероприятиях в Redis."""
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional
+
+import redis.asyncio as redis
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Изменения счетчиков в session.info: применяются только после успешного коммита
+SEAT_DELTAS_KEY = "event_seat_deltas"
+
+# Дельта применяется только к существующему счетчику (иначе он бы начался не с того числа)
+# и не опускает его ниже нуля
+_APPLY_DELTAS = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        local value = redis.call('INCRBY', key, tonumber(ARGV[i]))
+        if value < 0 then
+            redis.call('SET', key, 0)
+        end
+    end
+end
+return #KEYS
+"""
+
+# Сверка: число из БД записывается, только если счетчик не менялся с момента
+# снимка перед чтением БД (ARGV: снимок, число; пустой снимок - ключа не было)
+_RECONCILE = """
+local updated = 0
+for i, key in ipairs(KEYS) do
+    local expected = ARGV[2 * i - 1]
+    local current = redis.call('GET', key)
+    if (current == false and expected == '') or current == expected then
+        redis.call('SET', key, ARGV[2 * i])
+        updated = updated + 1
+    end
+end
+return updated
+"""
+
+
+def record_seat_delta(session_info: Dict, event_id: int, delta: int) -> None:
+    """Запомнить изменение числа мест до коммита (см. ServiceContainer.close)."""
+    deltas = session_info.setdefault(SEAT_DELTAS_KEY, {})
+    deltas[event_id] = deltas.get(event_id, 0) + delta
+
+
+class SeatCounters:
+    """
+    Число регистраций на каждое мероприятие - одно значение в Redis.
+
+    Счетчики меняются атомарно (Lua) после коммита регистраций и раз в
+    reconcile_interval секунд переписываются числами из Postgres через loader,
+    который исправляет расхождения после сбоев. Сверка не трогает счетчики,
+    изменившиеся между снимком и записью: дельта, примененная после чтения БД,
+    иначе бы потерялась. Такой счетчик сверяется в следующий раз. Отсутствующий
+    счетчик или недоступный Redis - не ошибка: читатели тогда считают места в БД.
+
+    Счетчики - только подсказка для отображения (доска регистрации). Коммит
+    между снимком и чтением БД, дельта которого придет после записи, дает
+    расхождение на единицу, а счетчик, меняющийся каждый интервал, сверкой
+    не исправляется. Поэтому решение о свободных местах принимает только
+    база: events.seats_taken и условный UPDATE при регистрации.
+    """
+
+    KEY_PREFIX = "cache:event_seats:"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        loader: Optional[Callable[[], Awaitable[Mapping[int, int]]]] = None,
+        reconcile_interval: float = 0.0,
+    ):
+        self.redis = redis_client
+        self.loader = loader
+        self.reconcile_interval = reconcile_interval
+        self._apply_script = redis_client.register_script(_APPLY_DELTAS)
+        self._reconcile_script = redis_client.register_script(_RECONCILE)
+        # Мероприятия прошлой сверки: их счетчики снимаются перед чтением БД
+        self._event_ids: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.reconciles = 0
+        self.reconcile_skipped = 0
+
+    async def start(self) -> None:
+        """Заполнить счетчики из БД и запустить периодическую сверку."""
+        if self.loader is None:
+            return
+        if self.reconcile_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="seat-counters-reconcile")
+        await self.reconcile()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get_many(self, event_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+        """Счетчики одним MGET; None - счетчика нет или Redis недоступен."""
+        event_ids = list(event_ids)
+        if not event_ids:
+            return {}
+        try:
+            values = await self.redis.mget([self._key(event_id) for event_id in event_ids])
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Не удалось прочитать счетчики мест: %s", e)
+            return dict.fromkeys(event_ids)
+        result = {
+            event_id: int(value) if value is not None else None
+            for event_id, value in zip(event_ids, values)
+        }
+        missing = sum(1 for value in result.values() if value is None)
+        self.misses += missing
+        self.hits += len(result) - missing
+        return result
+
+    async def get(self, event_id: int) -> Optional[int]:
+        return (await self.get_many([event_id]))[event_id]
+
+    async def apply(self, deltas: Mapping[int, int]) -> None:
+        """Применить изменения после коммита; ошибка Redis только логируется."""
+        deltas = {event_id: delta for event_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            await self._apply_script(
+                keys=[self._key(event_id) for event_id in deltas],
+                args=list(deltas.values()),
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Не удалось обновить счетчики мест %s: %s", deltas, e)
+
+    async def reconcile(self) -> None:
+        """Переписать счетчики числами из БД, пропуская изменившиеся во время сверки."""
+        if self.loader is None:
+            return
+        if not self._event_ids:
+            # Первая сверка: список мероприятий нужен до снимка
+            self._event_ids = list(await self.loader())
+        snapshot = {}
+        if self._event_ids:
+            values = await self.redis.mget([self._key(event_id) for event_id in self._event_ids])
+            snapshot = dict(zip(self._event_ids, values))
+
+        counts = await self.loader()
+        self._event_ids = list(counts)
+        if counts:
+            args = []
+            for event_id, count in counts.items():
+                # Нового мероприятия нет в снимке: его счетчик пишется, только если его еще нет
+                args += [snapshot.get(event_id) or "", count]
+            updated = await self._reconcile_script(keys=[self._key(event_id) for event_id in counts], args=args)
+            self.reconcile_skipped += len(counts) - int(updated)
+        self.reconciles += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "reconciles": self.reconciles,
+            "reconcile_skipped": self.reconcile_skipped,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error("Ошибка сверки счетчиков мест с БД: %s", e)
+
+    def _key(self, event_id: int) -> str:
+        return f"{self.KEY_PREFIX}{event_id}"
@@ -0,0 +1,146 @@
+"""Межзапросный кэш профилей пользователей."""
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+import redis.asyncio as redis
+
+from app.database.models.user import User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """Компактный снимок пользователя для экранов, которые только читают данные."""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: str
+    last_name: str
+    email: str
+    workplace: str
+    referral_code: Optional[str]
+    referrer_id: Optional[int]
+    referral_notified: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserProfile":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            email=user.email,
+            workplace=user.workplace,
+            referral_code=user.referral_code,
+            referrer_id=user.referrer_id,
+            referral_notified=bool(user.referral_notified),
+        )
+
+
+class UserProfileCache:
+    """
+    TTL-кэш профилей по telegram_id.
+
+    Без redis_client хранит данные в памяти процесса, с ним — в Redis,
+    чтобы инвалидация была видна всем процессам бота.
+    """
+
+    KEY_PREFIX = "cache:user_profile:"
+
+    def __init__(
+        self,
+        ttl_seconds: int = 300,
+        redis_client: Optional[redis.Redis] = None,
+        max_size: int = 10000,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.redis = redis_client
+        self.max_size = max_size
+        self._memory: "OrderedDict[int, Tuple[float, UserProfile]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, telegram_id: int) -> Optional[UserProfile]:
+        """Вернуть профиль из кэша или None при промахе."""
+        profile = await self._read(telegram_id)
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return profile
+
+    async def set(self, profile: UserProfile) -> None:
+        """Положить профиль в кэш."""
+        if self.redis is not None:
+            try:
+                await self.redis.set(
+                    self._key(profile.telegram_id),
+                    json.dumps(asdict(profile), ensure_ascii=False),
+                    ex=self.ttl_seconds,
+                )
+            except Exception as e:
+                logger.warning("Не удалось записать профиль %s в кэш: %s", profile.telegram_id, e)
+            return
+
+        self._memory[profile.telegram_id] = (time.monotonic() + self.ttl_seconds, profile)
+        self._memory.move_to_end(profile.telegram_id)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    async def invalidate(self, telegram_id: int) -> None:
+        """Удалить профиль из кэша."""
+        await self.invalidate_many([telegram_id])
+
+    async def invalidate_many(self, telegram_ids: Iterable[int]) -> None:
+        """Удалить несколько профилей из кэша."""
+        telegram_ids = list(telegram_ids)
+        if not telegram_ids:
+            return
+        self.invalidations += len(telegram_ids)
+
+        if self.redis is not None:
+            try:
+                await self.redis.delete(*(self._key(telegram_id) for telegram_id in telegram_ids))
+            except Exception as e:
+                logger.warning("Не удалось инвалидировать профили %s: %s", telegram_ids, e)
+            return
+
+        for telegram_id in telegram_ids:
+            self._memory.pop(telegram_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий и промахов."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "size": len(self._memory),
+        }
+
+    async def _read(self, telegram_id: int) -> Optional[UserProfile]:
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._key(telegram_id))
+            except Exception as e:
+                logger.warning("Не удалось прочитать профиль %s из кэша: %s", telegram_id, e)
+                return None
+            return UserProfile(**json.loads(raw)) if raw else None
+
+        entry = self._memory.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, profile = entry
+        if expires_at < time.monotonic():
+            self._memory.pop(telegram_id, None)
+            return None
+        return profile
+
+    def _key(self, telegram_id: int) -> str:
+        return f"{self.KEY_PREFIX}{telegram_id}"
@@ -0,0 +1,34 @@
+"""Асинхронный фасад над GoogleSheetsManager: вызовы gspread уходят из event loop."""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
+
+
+class AsyncSheetsManager:
+    """
+    Выполняет методы GoogleSheetsManager в выделенном потоке.
+
+    Один поток сохраняет порядок операций и не требует потокобезопасности
+    от клиента gspread, а event loop не блокируется сетевыми вызовами.
+    Операции из обработчиков сюда не попадают напрямую: они пишутся в outbox
+    и доставляются фоновым диспетчером (см. outbox.py).
+    """
+
+    def __init__(self, manager: GoogleSheetsManager):
+        self.manager = manager
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets")
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Выполнить метод GoogleSheetsManager в потоке Sheets и дождаться результата."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(getattr(self.manager, method), *args, **kwargs),
+        )
+
+    async def stop(self) -> None:
+        """Дождаться текущего вызова и остановить поток."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
@@ -0,0 +1 @@
+# Бэкенды таблиц
\ No newline at end of file
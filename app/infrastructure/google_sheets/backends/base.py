@@ -0,0 +1,22 @@
+"""Интерфейс бэкенда таблиц для GoogleSheetsManager."""
+from abc import ABC, abstractmethod
+from typing import Any
+
+
+class SheetsBackend(ABC):
+    """
+    Откуда GoogleSheetsManager берет таблицу.
+
+    Таблица и ее листы повторяют подмножество интерфейса gspread.Spreadsheet
+    и gspread.Worksheet, которым пользуется менеджер: worksheet, worksheets,
+    add_worksheet, values_batch_get, batch_update (deleteDimension); id, title,
+    row_values, col_values, cell, get_all_values, append_row(s), update,
+    update_cell, batch_update, insert_row, clear.
+    Отсутствующий лист - gspread.WorksheetNotFound, ошибки API - gspread.exceptions.APIError.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def open_spreadsheet(self) -> Any:
+        """Открыть таблицу (вызывается один раз, результат кэширует менеджер)."""
@@ -0,0 +1,41 @@
+"""Бэкенд Google Sheets через gspread."""
+import functools
+import logging
+
+import gspread
+from google.auth.exceptions import GoogleAuthError
+
+from app.infrastructure.google_sheets.backends.base import SheetsBackend
+from app.infrastructure.google_sheets.quota import QuotaHTTPClient, SheetsQuotaScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class GspreadBackend(SheetsBackend):
+    """Настоящая таблица Google: каждый HTTP-запрос проходит через планировщик квот."""
+
+    name = "gspread"
+
+    def __init__(self, credentials_path: str, spreadsheet_url: str, scheduler: SheetsQuotaScheduler):
+        self.credentials_path = credentials_path
+        self.spreadsheet_url = spreadsheet_url
+        self.scheduler = scheduler
+
+    def open_spreadsheet(self) -> gspread.Spreadsheet:
+        try:
+            client = gspread.service_account(
+                filename=self.credentials_path,
+                http_client=functools.partial(QuotaHTTPClient, scheduler=self.scheduler),
+            )
+        except GoogleAuthError as e:
+            logger.error(f"Ошибка аутентификации Google Sheets: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка создания клиента Google Sheets: {e}")
+            raise
+
+        try:
+            return client.open_by_url(self.spreadsheet_url)
+        except Exception as e:
+            logger.error(f"Ошибка открытия таблицы: {e}")
+            raise
@@ -0,0 +1,331 @@
+"""Локальный бэкенд таблиц: в памяти или в CSV-файлах, с имитацией задержек и сбоев."""
+import csv
+import fcntl
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import gspread
+from gspread.cell import Cell
+from gspread.exceptions import APIError
+
+from app.infrastructure.google_sheets.backends.base import SheetsBackend
+from app.infrastructure.google_sheets.quota import READ, WRITE, SheetsQuotaScheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LocalSheetsBackend(SheetsBackend):
+    """
+    Таблица без сети - для нагрузочных тестов и стенда.
+
+    directory=None - листы живут только в памяти процесса, иначе каждый лист
+    хранится в {directory}/{имя}.csv и переписывается после каждой записи.
+    Каталог CSV можно делить между процессами (воркеры, reconcile_sheets.py):
+    каждый запрос выполняется под файловой блокировкой {directory}/.lock и
+    сначала перечитывает листы, измененные другими процессами.
+    Каждый вызов проходит через тот же планировщик квот, что и gspread, затем
+    ждет latency секунд и с вероятностью failure_rate завершается ошибкой API
+    (429 или 503), чтобы проверять повторы и outbox.
+    """
+
+    def __init__(
+        self,
+        scheduler: SheetsQuotaScheduler,
+        directory: Optional[str] = None,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+    ):
+        self.scheduler = scheduler
+        self.directory = Path(directory) if directory else None
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.name = "csv" if self.directory else "memory"
+        self._spreadsheet: Optional[LocalSpreadsheet] = None
+        # Версии файлов листов, которые видел этот процесс: (mtime_ns, size)
+        self._versions: Dict[str, Tuple[int, int]] = {}
+
+    def open_spreadsheet(self) -> "LocalSpreadsheet":
+        spreadsheet = LocalSpreadsheet(self)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._spreadsheet = spreadsheet
+            with self._file_lock():
+                self._reload()
+        logger.info("Локальная таблица (%s): листов %s", self.name, len(spreadsheet._sheets))
+        return spreadsheet
+
+    def request(self, kind: str, operation: Callable[[], T]) -> T:
+        """Выполнить операцию как запрос к API: квота, задержка, случайный сбой."""
+        return self.scheduler.execute(kind, lambda: self._simulate(operation))
+
+    def _simulate(self, operation: Callable[[], T]) -> T:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.failure_rate > 0 and random.random() < self.failure_rate:
+            raise APIError(_FakeResponse(random.choice((429, 503))))
+        if self.directory is None:
+            return operation()
+        with self._file_lock():
+            self._reload()
+            return operation()
+
+    def save(self, worksheet: "LocalWorksheet") -> None:
+        if self.directory is None:
+            return
+        path = self.directory / f"{worksheet.title}.csv"
+        tmp_path = path.with_suffix(".csv.tmp")
+        with tmp_path.open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(worksheet._rows)
+        tmp_path.replace(path)
+        self._versions[worksheet.title] = _file_version(path)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Блокировка каталога CSV между процессами (снимается при закрытии файла)."""
+        with (self.directory / ".lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _reload(self) -> None:
+        """Перечитать листы, файлы которых изменились после последнего чтения или записи."""
+        spreadsheet = self._spreadsheet
+        with spreadsheet._lock:
+            for path in sorted(self.directory.glob("*.csv")):
+                version = _file_version(path)
+                if self._versions.get(path.stem) == version:
+                    continue
+                with path.open(newline="", encoding="utf-8") as f:
+                    rows = [list(row) for row in csv.reader(f)]
+                if path.stem in spreadsheet._sheets:
+                    spreadsheet._sheets[path.stem]._rows[:] = rows
+                else:
+                    spreadsheet._add(path.stem, rows)
+                self._versions[path.stem] = version
+
+
+class LocalSpreadsheet:
+    """Подмножество gspread.Spreadsheet поверх словаря листов."""
+
+    def __init__(self, backend: LocalSheetsBackend):
+        self._backend = backend
+        self.title = f"local:{backend.name}"
+        self._sheets: Dict[str, LocalWorksheet] = {}
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+
+    def _add(self, title: str, rows: List[List[str]]) -> "LocalWorksheet":
+        worksheet = LocalWorksheet(self, next(self._ids), title, rows)
+        self._sheets[title] = worksheet
+        return worksheet
+
+    def worksheet(self, title: str) -> "LocalWorksheet":
+        def operation():
+            if title not in self._sheets:
+                raise gspread.WorksheetNotFound(title)
+            return self._sheets[title]
+        return self._backend.request(READ, operation)
+
+    def worksheets(self) -> List["LocalWorksheet"]:
+        return self._backend.request(READ, lambda: list(self._sheets.values()))
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> "LocalWorksheet":
+        def operation():
+            with self._lock:
+                if title in self._sheets:
+                    raise APIError(_FakeResponse(400, f'A sheet with the name "{title}" already exists.'))
+                worksheet = self._add(title, [])
+                self._backend.save(worksheet)
+                return worksheet
+        return self._backend.request(WRITE, operation)
+
+    def batch_update(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """spreadsheets.batchUpdate; поддерживается только deleteDimension по строкам."""
+        def operation():
+            with self._lock:
+                by_id = {worksheet.id: worksheet for worksheet in self._sheets.values()}
+                changed = []
+                for request in body.get("requests", []):
+                    grid = request.get("deleteDimension", {}).get("range", {})
+                    worksheet = by_id.get(grid.get("sheetId"))
+                    if worksheet is None or grid.get("dimension") != "ROWS":
+                        raise APIError(_FakeResponse(400, f"Unsupported request: {request}"))
+                    del worksheet._rows[grid["startIndex"]:grid["endIndex"]]
+                    changed.append(worksheet)
+                for worksheet in dict.fromkeys(changed):
+                    self._backend.save(worksheet)
+                return {"replies": [{} for _ in body.get("requests", [])]}
+        return self._backend.request(WRITE, operation)
+
+    def values_batch_get(self, ranges: Sequence[str]) -> Dict[str, Any]:
+        def operation():
+            value_ranges = []
+            for name in ranges:
+                title, _, cells = name.partition("!")
+                worksheet = self._sheets.get(title.strip("'"))
+                if worksheet is None:
+                    raise APIError(_FakeResponse(400, f"Unable to parse range: {name}"))
+                value_ranges.append({"range": name, "values": worksheet._get_range(cells)})
+            return {"valueRanges": value_ranges}
+        return self._backend.request(READ, operation)
+
+
+class LocalWorksheet:
+    """Подмножество gspread.Worksheet: строки хранятся списком списков строк."""
+
+    def __init__(self, spreadsheet: LocalSpreadsheet, sheet_id: int, title: str, rows: List[List[str]]):
+        self._spreadsheet = spreadsheet
+        self._backend = spreadsheet._backend
+        self.id = sheet_id
+        self.title = title
+        self._rows = rows
+
+    # Чтение
+
+    def get_all_values(self) -> List[List[str]]:
+        return self._backend.request(READ, lambda: [list(row) for row in self._trimmed()])
+
+    def row_values(self, row: int) -> List[str]:
+        def operation():
+            values = self._rows[row - 1] if row <= len(self._rows) else []
+            return _trim(list(values))
+        return self._backend.request(READ, operation)
+
+    def col_values(self, col: int) -> List[str]:
+        def operation():
+            values = [row[col - 1] if len(row) >= col else "" for row in self._rows]
+            return _trim(values)
+        return self._backend.request(READ, operation)
+
+    def batch_get(self, ranges: Sequence[str], **kwargs: Any) -> List[List[List[str]]]:
+        return self._backend.request(READ, lambda: [self._get_range(name) for name in ranges])
+
+    def cell(self, row: int, col: int) -> Cell:
+        def operation():
+            values = self._rows[row - 1] if row <= len(self._rows) else []
+            return Cell(row, col, values[col - 1] if len(values) >= col else "")
+        return self._backend.request(READ, operation)
+
+    # Запись
+
+    def append_row(self, values: Sequence[Any], **kwargs: Any) -> Dict[str, Any]:
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values: Sequence[Sequence[Any]], **kwargs: Any) -> Dict[str, Any]:
+        def operation():
+            with self._spreadsheet._lock:
+                # Как values.append: строки пишутся сразу после последней непустой
+                first_row = len(self._trimmed()) + 1
+                self._write(first_row, 1, values)
+                self._save()
+                width = max((len(row) for row in values), default=1)
+                last_cell = gspread.utils.rowcol_to_a1(first_row + len(values) - 1, width)
+                return {"updates": {"updatedRange": f"'{self.title}'!A{first_row}:{last_cell}"}}
+        return self._backend.request(WRITE, operation)
+
+    def update(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        # Поддерживаются оба порядка аргументов, как в gspread: (range, values) и (values, range)
+        if args and isinstance(args[0], str):
+            range_name, values = args[0], args[1]
+        else:
+            values = args[0] if args else kwargs["values"]
+            range_name = args[1] if len(args) > 1 else kwargs.get("range_name", "A1")
+        return self.batch_update([{"range": range_name, "values": values}])
+
+    def update_cell(self, row: int, col: int, value: Any) -> Dict[str, Any]:
+        return self.update(gspread.utils.rowcol_to_a1(row, col), [[value]])
+
+    def batch_update(self, data: Sequence[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        def operation():
+            with self._spreadsheet._lock:
+                for item in data:
+                    grid = gspread.utils.a1_range_to_grid_range(item["range"])
+                    self._write(grid.get("startRowIndex", 0) + 1, grid.get("startColumnIndex", 0) + 1, item["values"])
+                self._save()
+                return {"totalUpdatedRanges": len(data)}
+        return self._backend.request(WRITE, operation)
+
+    def insert_row(self, values: Sequence[Any], index: int = 1, **kwargs: Any) -> Dict[str, Any]:
+        def operation():
+            with self._spreadsheet._lock:
+                self._rows.insert(index - 1, [_cell_value(value) for value in values])
+                self._save()
+                return {}
+        return self._backend.request(WRITE, operation)
+
+    def clear(self) -> Dict[str, Any]:
+        def operation():
+            with self._spreadsheet._lock:
+                self._rows = []
+                self._save()
+                return {}
+        return self._backend.request(WRITE, operation)
+
+    # Внутреннее
+
+    def _trimmed(self) -> List[List[str]]:
+        """Строки без пустого хвоста (как их возвращает API)."""
+        rows = [_trim(list(row)) for row in self._rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _get_range(self, cells: str) -> List[List[str]]:
+        grid = gspread.utils.a1_range_to_grid_range(cells)
+        start_row = grid.get("startRowIndex", 0)
+        end_row = grid.get("endRowIndex", len(self._rows))
+        start_col = grid.get("startColumnIndex", 0)
+        end_col = grid.get("endColumnIndex")
+        rows = [_trim(list(row[start_col:end_col])) for row in self._rows[start_row:end_row]]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _write(self, first_row: int, first_col: int, values: Sequence[Sequence[Any]]) -> None:
+        for offset, row_values in enumerate(values):
+            row_number = first_row + offset
+            while len(self._rows) < row_number:
+                self._rows.append([])
+            row = self._rows[row_number - 1]
+            needed = first_col - 1 + len(row_values)
+            if len(row) < needed:
+                row.extend([""] * (needed - len(row)))
+            row[first_col - 1:needed] = [_cell_value(value) for value in row_values]
+
+    def _save(self) -> None:
+        self._backend.save(self)
+
+
+def _file_version(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _FakeResponse:
+    """Ответ в форме requests.Response - ровно столько, сколько нужно gspread.APIError."""
+
+    def __init__(self, status_code: int, message: str = "Injected failure"):
+        self.status_code = status_code
+        self.headers: Dict[str, str] = {}
+        self.text = message
+        self._message = message
+
+    def json(self) -> Dict[str, Any]:
+        return {"error": {"code": self.status_code, "message": self._message, "status": "LOCAL"}}
+
+
+def _trim(values: List[str]) -> List[str]:
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+def _cell_value(value: Any) -> str:
+    return "" if value is None else str(value)
@@ -0,0 +1,430 @@
+"""Фоновый диспетчер outbox: доставляет операции из sheets_outbox в Google Sheets."""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.database.database import Database
+from app.database.models.outbox import SheetsOutbox
+from app.database.repositories.outbox_repository import SheetsOutboxRepository, SheetsRowHashRepository
+from app.infrastructure.cache.user_profile_cache import UserProfile
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager, content_hash
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Операции, которые добавляют строку в конец листа и могут идти одним values.append
+APPEND_OPERATIONS = {"add_user_to_general_sheet", "add_user_to_event_sheet"}
+# Удаление строки: копится вместе с добавлениями и уходит одним batchUpdate
+REMOVE_OPERATION = "remove_user_from_event_sheet"
+PASSPORT_OPERATION = "upsert_passport_entry"
+BATCHED_OPERATIONS = APPEND_OPERATIONS | {REMOVE_OPERATION}
+
+
+@asynccontextmanager
+async def dispatcher_lock(database: Database) -> AsyncIterator[bool]:
+    """
+    Блокировка диспетчера outbox на время блока async with: True - захвачена,
+    False - ее держит другой процесс (не ждем). Блокировка сессии Postgres
+    живет на отдельном соединении в режиме autocommit и не держит транзакцию,
+    пока идут запросы к API.
+    """
+    async with database.session_factory() as lock_session:
+        await lock_session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        lock = SheetsOutboxRepository(lock_session)
+        if not await lock.try_lock_dispatcher():
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                await lock.unlock_dispatcher()
+            except Exception:
+                # Соединение с неснятой блокировкой нельзя возвращать в пул
+                await lock_session.invalidate()
+                raise
+
+
+class _RowHashes:
+    """
+    Хэши строк на время прохода диспетчера: читаются вместе с операциями,
+    а изменения пишутся в sheets_row_hashes вместе с результатами доставки.
+    """
+
+    def __init__(self, fresh: Dict[str, Dict[int, str]]):
+        self._fresh = fresh
+        self._changes: List[Tuple[str, Dict[int, str], List[int]]] = []
+
+    @classmethod
+    async def load(
+        cls,
+        repository: SheetsRowHashRepository,
+        by_sheet: Dict[str, List[Tuple[SheetsOutbox, bool, float]]],
+        max_age_seconds: int,
+    ) -> "_RowHashes":
+        fresh = {}
+        for sheet_name, pending in by_sheet.items():
+            telegram_ids = list({entry.payload["user"]["telegram_id"] for entry, _, _ in pending})
+            fresh[sheet_name] = await repository.get_fresh(sheet_name, telegram_ids, max_age_seconds)
+        return cls(fresh)
+
+    def get(self, sheet_name: str, telegram_id: int) -> Optional[str]:
+        return self._fresh.get(sheet_name, {}).get(telegram_id)
+
+    def save(self, sheet_name: str, hashes: Dict[int, str]) -> None:
+        self._fresh.setdefault(sheet_name, {}).update(hashes)
+        self._changes.append((sheet_name, hashes, []))
+
+    def delete(self, sheet_name: str, telegram_ids: List[int]) -> None:
+        for telegram_id in telegram_ids:
+            self._fresh.get(sheet_name, {}).pop(telegram_id, None)
+        self._changes.append((sheet_name, {}, telegram_ids))
+
+    async def write(self, repository: SheetsRowHashRepository) -> None:
+        """Повторить изменения в БД в том же порядке."""
+        for sheet_name, hashes, deleted in self._changes:
+            if deleted:
+                await repository.delete(sheet_name, deleted)
+            if hashes:
+                await repository.save(sheet_name, hashes)
+
+
+class SheetsOutboxDispatcher:
+    """
+    Разбирает sheets_outbox и выполняет операции через AsyncSheetsManager.
+
+    Гарантии:
+    - доставка хотя бы один раз: операции выбираются короткой транзакцией,
+      запросы к API идут вне транзакций, а результат записывается второй
+      короткой транзакцией. Если она не прошла (сбой процесса или БД после
+      ответа API), операция повторится. Ключ идемпотентности отсекает только
+      повторную постановку в очередь, поэтому повтор добавления оставляет на
+      листе дубликат строки до следующей сверки (SheetsReconciler);
+    - порядок в рамках листа: если операция листа не прошла или ждет повтора,
+      следующие операции этого листа в текущем проходе не выполняются;
+    - один диспетчер на все процессы: advisory-блокировка сессии Postgres на
+      отдельном соединении в режиме autocommit, которая держится весь проход
+      и не оставляет открытой транзакции;
+    - добавления и удаления строк одного листа уходят пачкой: удаления - одним
+      batchUpdate, добавления - одним values.append; добавление и следующее за
+      ним удаление того же пользователя в пачке взаимно сокращаются. Пока пачка
+      копится, операции лежат в sheets_outbox, поэтому рестарт их не теряет;
+    - запись строки, содержимое которой (без даты) совпадает с уже записанным
+      за последние row_hash_ttl секунд, не отправляется в API (sheets_row_hashes);
+      для добавлений строк совпадение хэша дополнительно сверяется с листом по
+      индексу строк, чтобы вернуть строку, удаленную из таблицы вручную.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        sheets: AsyncSheetsManager,
+        poll_interval: float = 1.0,
+        batch_size: int = 200,
+        append_batch_size: int = 50,
+        append_flush_interval: float = 2.0,
+        max_attempts: int = 20,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        row_hash_ttl: int = 86400,
+    ):
+        self.database = database
+        self.sheets = sheets
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.append_batch_size = append_batch_size
+        self.append_flush_interval = append_flush_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.row_hash_ttl = row_hash_ttl
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.append_batches = 0
+        self.remove_batches = 0
+        self.cancelled = 0
+        self.skipped_writes = 0
+        self.backlog = 0
+        self.oldest_age = 0.0
+
+    async def start(self) -> None:
+        """Запустить фоновый разбор очереди."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sheets-outbox")
+
+    async def stop(self) -> None:
+        """Остановить разбор (недоставленное останется в таблице до следующего запуска)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """Разбудить диспетчер сразу после commit с новыми записями."""
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики для мониторинга; backlog и oldest_age_seconds - для алертов."""
+        return {
+            "backlog": self.backlog,
+            "oldest_age_seconds": round(self.oldest_age, 3),
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "append_batches": self.append_batches,
+            "remove_batches": self.remove_batches,
+            "cancelled": self.cancelled,
+            "skipped_writes": self.skipped_writes,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.drain() >= self.batch_size:
+                    # Доставлена полная пачка - вероятно, в очереди есть еще
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка разбора очереди Google Sheets: %s", e)
+
+    async def drain(self) -> int:
+        """Один проход по очереди. Возвращает количество доставленных операций."""
+        async with dispatcher_lock(self.database) as locked:
+            if not locked:
+                return 0
+            return await self._drain_locked()
+
+    async def _drain_locked(self) -> int:
+        """Проход под блокировкой диспетчера: выборка, запросы к API, запись результатов."""
+        by_sheet: Dict[str, List[Tuple[SheetsOutbox, bool, float]]] = {}
+        async with self.database.get_session() as session:
+            repository = SheetsOutboxRepository(session)
+            for pending in await repository.get_pending(self.batch_size):
+                by_sheet.setdefault(pending[0].sheet_name, []).append(pending)
+            if not by_sheet:
+                self.backlog, self.oldest_age = await repository.get_backlog()
+                return 0
+            hashes = await _RowHashes.load(SheetsRowHashRepository(session), by_sheet, self.row_hash_ttl)
+
+        delivered = 0
+        try:
+            for sheet_name, pending in by_sheet.items():
+                delivered += await self._drain_sheet(sheet_name, pending, hashes)
+        finally:
+            # Операции выбраны с expire_on_commit=False: их изменения уходят UPDATE-ами здесь
+            async with self.database.get_session() as session:
+                session.add_all(entry for pending in by_sheet.values() for entry, _, _ in pending)
+                await hashes.write(SheetsRowHashRepository(session))
+                await session.flush()
+                self.backlog, self.oldest_age = await SheetsOutboxRepository(session).get_backlog()
+        self.delivered += delivered
+        return delivered
+
+    async def _drain_sheet(
+        self,
+        sheet_name: str,
+        pending: List[Tuple[SheetsOutbox, bool, float]],
+        hashes: _RowHashes,
+    ) -> int:
+        """
+        Выполнить операции одного листа по порядку. Подряд идущие добавления и
+        удаления строк копятся в пачку; хвостовая пачка ждет, пока наберется
+        append_batch_size операций или самой старой исполнится append_flush_interval.
+        """
+        delivered = 0
+        run: List[SheetsOutbox] = []
+        run_age = 0.0
+        for entry, due, age in pending:
+            if not due:
+                # Операция ждет повтора - следующие операции листа тоже ждут
+                break
+            if entry.operation in BATCHED_OPERATIONS:
+                if not run:
+                    run_age = age
+                run.append(entry)
+                if len(run) >= self.append_batch_size:
+                    done = await self._deliver_batch(sheet_name, run, hashes)
+                    delivered += done
+                    if done < len(run):
+                        return delivered
+                    run = []
+                continue
+
+            # Перед обновлением сбрасываем накопленную пачку, чтобы сохранить порядок
+            if run:
+                done = await self._deliver_batch(sheet_name, run, hashes)
+                delivered += done
+                if done < len(run):
+                    return delivered
+                run = []
+            if not await self._deliver_one(entry, hashes):
+                return delivered
+            delivered += 1
+
+        if run and (len(run) >= self.append_batch_size or run_age >= self.append_flush_interval):
+            delivered += await self._deliver_batch(sheet_name, run, hashes)
+        return delivered
+
+    async def _deliver_batch(self, sheet_name: str, entries: List[SheetsOutbox], hashes: _RowHashes) -> int:
+        """
+        Доставить пачку добавлений и удалений. Сначала удаления, потом добавления:
+        после сокращения пар "добавил - удалил" такой порядок дает тот же лист,
+        что и исходный. Возвращает количество обработанных операций.
+        """
+        appends: List[SheetsOutbox] = []
+        removes: List[SheetsOutbox] = []
+        cancelled: List[SheetsOutbox] = []
+        for entry in entries:
+            telegram_id = entry.payload["user"]["telegram_id"]
+            if entry.operation != REMOVE_OPERATION:
+                appends.append(entry)
+                continue
+            added = next(
+                (append for append in reversed(appends) if append.payload["user"]["telegram_id"] == telegram_id),
+                None,
+            )
+            if added is None:
+                removes.append(entry)
+            else:
+                # Строка еще не попала на лист - ни добавлять, ни удалять ее не нужно
+                appends.remove(added)
+                cancelled += [added, entry]
+
+        done = 0
+        if removes:
+            if not await self._deliver_removes(sheet_name, removes, hashes):
+                # Остальные операции пачки не тронуты и повторятся в следующем проходе
+                return done
+            done += len(removes)
+        for entry in cancelled:
+            self._mark_delivered(entry)
+        done += len(cancelled)
+        self.cancelled += len(cancelled)
+        if appends:
+            if not await self._deliver_appends(sheet_name, appends, hashes):
+                return done
+            done += len(appends)
+        return done
+
+    async def _deliver_removes(self, sheet_name: str, entries: List[SheetsOutbox], hashes: _RowHashes) -> bool:
+        users = [UserProfile(**entry.payload["user"]) for entry in entries]
+        try:
+            await self.sheets.call("remove_users", sheet_name, users)
+        except Exception as e:
+            for entry in entries:
+                self._mark_failed(entry, e)
+            return False
+        for entry in entries:
+            self._mark_delivered(entry)
+        hashes.delete(sheet_name, [user.telegram_id for user in users])
+        self.remove_batches += 1
+        return True
+
+    async def _deliver_one(self, entry: SheetsOutbox, hashes: _RowHashes) -> bool:
+        kwargs: Dict[str, Any] = dict(entry.payload)
+        user = kwargs["user"] = UserProfile(**kwargs["user"])
+
+        row_hash = None
+        if entry.operation == PASSPORT_OPERATION:
+            row_hash = content_hash(GoogleSheetsManager.passport_row(
+                user, kwargs["full_name"], kwargs["passport_number"], kwargs.get("car_number")
+            ))
+            if hashes.get(entry.sheet_name, user.telegram_id) == row_hash:
+                self._mark_delivered(entry)
+                self.skipped_writes += 1
+                return True
+
+        try:
+            await self.sheets.call(entry.operation, **kwargs)
+        except Exception as e:
+            self._mark_failed(entry, e)
+            return False
+        self._mark_delivered(entry)
+        if row_hash is not None:
+            hashes.save(entry.sheet_name, {user.telegram_id: row_hash})
+        return True
+
+    async def _deliver_appends(self, sheet_name: str, entries: List[SheetsOutbox], hashes: _RowHashes) -> bool:
+        users = [(UserProfile(**entry.payload["user"]), entry.payload.get("timestamp")) for entry in entries]
+        row_hashes = [content_hash(GoogleSheetsManager.user_row(user)) for user, _ in users]
+
+        # Такая строка уже есть на листе - повторно ее не добавляем. Совпавший хэш
+        # сверяется с листом: строку могли удалить вручную, и тогда ее нужно вернуть
+        candidates = [
+            user.telegram_id
+            for (user, _), row_hash in zip(users, row_hashes)
+            if hashes.get(sheet_name, user.telegram_id) == row_hash
+        ]
+        on_sheet = set()
+        if candidates:
+            try:
+                on_sheet = await self.sheets.call("find_users", sheet_name, candidates)
+            except Exception as e:
+                for entry in entries:
+                    self._mark_failed(entry, e)
+                return False
+
+        to_send = []
+        for entry, (user, timestamp), row_hash in zip(entries, users, row_hashes):
+            if user.telegram_id in on_sheet:
+                self._mark_delivered(entry)
+                self.skipped_writes += 1
+            else:
+                to_send.append((entry, (user, timestamp), row_hash))
+        if not to_send:
+            return True
+
+        try:
+            await self.sheets.call("append_users", sheet_name, [user for _, user, _ in to_send])
+        except Exception as e:
+            for entry, _, _ in to_send:
+                self._mark_failed(entry, e)
+            return False
+        for entry, _, _ in to_send:
+            self._mark_delivered(entry)
+        hashes.save(sheet_name, {user.telegram_id: row_hash for _, (user, _), row_hash in to_send})
+        self.append_batches += 1
+        return True
+
+    def _mark_delivered(self, entry: SheetsOutbox) -> None:
+        entry.attempts += 1
+        entry.processed_at = func.now()
+        entry.last_error = None
+
+    def _mark_failed(self, entry: SheetsOutbox, error: Exception) -> None:
+        entry.attempts += 1
+        entry.last_error = str(error)[:1000]
+        self.failed_attempts += 1
+        if entry.attempts >= self.max_attempts:
+            # Операция больше не блокирует лист, last_error остается для разбора
+            self.dead += 1
+            entry.processed_at = func.now()
+            logger.error(
+                "Операция outbox %s (%s, лист %s) отброшена после %s попыток: %s",
+                entry.id, entry.operation, entry.sheet_name, entry.attempts, error,
+            )
+        else:
+            entry.next_attempt_at = func.now() + timedelta(seconds=self._backoff(entry.attempts))
+            logger.warning(
+                "Операция outbox %s (%s, лист %s) не выполнена, попытка %s: %s",
+                entry.id, entry.operation, entry.sheet_name, entry.attempts, error,
+            )
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
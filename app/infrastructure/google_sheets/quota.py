@@ -0,0 +1,161 @@
+"""Планировщик запросов к Google Sheets API с учетом поминутных квот."""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+READ = "read"
+WRITE = "write"
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Ведро токенов: capacity запросов, пополняется равномерно за минуту."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Сколько ждать до следующего токена (0 - можно брать сейчас)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+    def pause(self, until: float) -> None:
+        """Не выдавать токены до until (после 429 с Retry-After); запас токенов сгорает."""
+        self.paused_until = max(self.paused_until, until)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class SheetsQuotaScheduler:
+    """
+    Общий для всех потоков процесса пропускной пункт запросов к Sheets API.
+
+    Чтения и записи расходуют разные ведра (у Google это разные квоты), поэтому
+    исчерпанная квота чтений не задерживает записи. Очередности между ними
+    планировщик не задает: все вызовы идут по одному из потока AsyncSheetsManager.
+    На 408/429/5xx запрос повторяется: пауза берется из Retry-After, а если его
+    нет - экспоненциальная с полным джиттером; на время паузы останавливается
+    все ведро, а не только один запрос.
+    """
+
+    def __init__(
+        self,
+        read_per_minute: int = 60,
+        write_per_minute: int = 60,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = {READ: TokenBucket(read_per_minute), WRITE: TokenBucket(write_per_minute)}
+        self._condition = threading.Condition()
+        self._waiting = {READ: 0, WRITE: 0}
+        self.requests = {READ: 0, WRITE: 0}
+        self.throttled_seconds = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def execute(self, kind: str, request: Callable[[], T]) -> T:
+        """Выполнить запрос, дождавшись токена, и повторить его при перегрузке API."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.acquire(kind)
+            try:
+                return request()
+            except APIError as e:
+                if e.code not in RETRYABLE_STATUS_CODES or attempt >= self.max_attempts:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if e.code == 429:
+                    self.rate_limited += 1
+                self.retries += 1
+                logger.warning(
+                    "Sheets API ответил %s (%s), повтор %s через %.1fс", e.code, kind, attempt, delay
+                )
+                with self._condition:
+                    self._buckets[kind].pause(time.monotonic() + delay)
+
+    def acquire(self, kind: str) -> None:
+        """Дождаться токена нужного типа."""
+        bucket = self._buckets[kind]
+        with self._condition:
+            self._waiting[kind] += 1
+            try:
+                while True:
+                    wait = bucket.wait_time(time.monotonic())
+                    if wait <= 0:
+                        bucket.take()
+                        self.requests[kind] += 1
+                        break
+                    # В throttled_seconds идет только ожидание токена
+                    started = time.monotonic()
+                    self._condition.wait(wait)
+                    self.throttled_seconds += time.monotonic() - started
+            finally:
+                self._waiting[kind] -= 1
+                self._condition.notify_all()
+
+    def _retry_delay(self, error: APIError, attempt: int) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        retry_after = _retry_after(error)
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+    def stats(self) -> Dict[str, float]:
+        """Глубина очереди по типам, время ожидания квоты и повторы."""
+        return {
+            "queue_read": self._waiting[READ],
+            "queue_write": self._waiting[WRITE],
+            "requests_read": self.requests[READ],
+            "requests_write": self.requests[WRITE],
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class QuotaHTTPClient(HTTPClient):
+    """HTTP-клиент gspread, пропускающий каждый запрос через SheetsQuotaScheduler."""
+
+    def __init__(self, auth: Any, session: Any = None, scheduler: Optional[SheetsQuotaScheduler] = None):
+        super().__init__(auth, session)
+        self.scheduler = scheduler or SheetsQuotaScheduler()
+
+    def request(self, method: str, endpoint: str, *args: Any, **kwargs: Any) -> Any:
+        # Все чтения Sheets API, которые использует gspread, - GET; остальное расходует квоту записи
+        kind = READ if method.upper() == "GET" else WRITE
+        return self.scheduler.execute(kind, lambda: super(QuotaHTTPClient, self).request(method, endpoint, *args, **kwargs))
+
+
+def _retry_after(error: APIError) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,170 @@
+"""Полная сверка Google Sheets с базой данных: БД - источник истины."""
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.database.database import Database
+from app.database.repositories.event_repository import EventRepository, RegistrationRepository
+from app.database.repositories.outbox_repository import SheetsOutboxRepository, SheetsRowHashRepository
+from app.database.repositories.passport_repository import PassportRepository
+from app.database.repositories.user_repository import UserRepository
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.outbox import dispatcher_lock
+from app.infrastructure.google_sheets.sheets_manager import (
+    GENERAL_SHEET,
+    PASSPORT_SHEET,
+    GoogleSheetsManager,
+    content_hash,
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SheetsReconciler:
+    """
+    Переписывает листы general, 'Пропуски' и листы мероприятий по данным БД.
+
+    Каждый лист сверяется отдельно: строки читаются из Postgres порциями,
+    а на лист уходит одно чтение и один batch_update только по отличающимся
+    строкам (см. GoogleSheetsManager.reconcile_sheet).
+
+    На время сверки листа берется блокировка диспетчера outbox (как в
+    SheetsOutboxDispatcher; если она занята, лист пропускается до следующей
+    сверки). Строки и операции outbox листа читаются короткой транзакцией
+    REPEATABLE READ, запрос к API идет вне транзакций, а результат пишется
+    второй короткой транзакцией: операции outbox листа, видимые в снимке,
+    уже учтены и помечаются обработанными, более поздние доставит диспетчер;
+    хэши строк листа заменяются хэшами сверенных строк.
+    """
+
+    def __init__(self, database: Database, sheets: AsyncSheetsManager, interval: float = 0.0):
+        self.database = database
+        self.sheets = sheets
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failed_sheets = 0
+        self.skipped_sheets = 0
+        self.changed_rows = 0
+        self.last_duration = 0.0
+
+    async def start(self) -> None:
+        """Запустить периодическую сверку (если задан интервал)."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sheets-reconcile")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "failed_sheets": self.failed_sheets,
+            "skipped_sheets": self.skipped_sheets,
+            "changed_rows": self.changed_rows,
+            "last_duration_seconds": round(self.last_duration, 3),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка плановой сверки Google Sheets: %s", e)
+
+    async def reconcile(self, sheet_names: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Сверить листы (по умолчанию все). Ошибка одного листа не останавливает
+        остальные; в результат попадают только сверенные листы (пропущенные из-за
+        занятой блокировки диспетчера считаются в skipped_sheets).
+        """
+        started = asyncio.get_running_loop().time()
+        async with self.database.get_session() as session:
+            events = await EventRepository(session).get_all_events()
+
+        targets: List[Tuple[str, Optional[int]]] = [(GENERAL_SHEET, None), (PASSPORT_SHEET, None)]
+        targets += [(event.sheet_name, event.id) for event in events]
+        if sheet_names is not None:
+            wanted = set(sheet_names)
+            targets = [target for target in targets if target[0] in wanted]
+
+        results: Dict[str, Dict[str, int]] = {}
+        for sheet_name, event_id in targets:
+            try:
+                result = await self.reconcile_sheet(sheet_name, event_id)
+            except Exception as e:
+                self.failed_sheets += 1
+                logger.error("Не удалось сверить лист %s: %s", sheet_name, e)
+                continue
+            if result is None:
+                self.skipped_sheets += 1
+            else:
+                results[sheet_name] = result
+
+        self.runs += 1
+        self.changed_rows += sum(result["changed"] + result["cleared"] for result in results.values())
+        self.last_duration = asyncio.get_running_loop().time() - started
+        return results
+
+    async def reconcile_sheet(self, sheet_name: str, event_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """
+        Сверить один лист; event_id - мероприятие, если это лист мероприятия.
+        None - блокировку диспетчера держит другой процесс, лист не сверялся.
+        """
+        async with dispatcher_lock(self.database) as locked:
+            if not locked:
+                logger.info("Лист %s пропущен: блокировка диспетчера outbox занята", sheet_name)
+                return None
+
+            # Снимок начинается уже под блокировкой: диспетчер ничего не доставит до конца сверки
+            async with self.database.get_session() as session:
+                await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                pending_ids = await SheetsOutboxRepository(session).get_pending_ids(sheet_name)
+                rows = await self._load_rows(session, sheet_name, event_id)
+
+            result = await self.sheets.call("reconcile_sheet", sheet_name, [row for _, row in rows])
+
+            async with self.database.get_session() as session:
+                await SheetsOutboxRepository(session).mark_processed(pending_ids)
+                await SheetsRowHashRepository(session).replace_sheet(
+                    sheet_name, {telegram_id: content_hash(row) for telegram_id, row in rows}
+                )
+            result["outbox_skipped"] = len(pending_ids)
+            return result
+
+    async def _load_rows(self, session, sheet_name: str, event_id: Optional[int]) -> List[Tuple[int, List[str]]]:
+        """Строки листа по данным БД: (telegram_id, строка)."""
+        if sheet_name == PASSPORT_SHEET:
+            return [
+                (user.telegram_id, GoogleSheetsManager.passport_row(
+                    user,
+                    passport_data.full_name,
+                    passport_data.passport_number,
+                    passport_data.car_number,
+                    _format(passport_data.updated_at),
+                ))
+                async for passport_data, user in PassportRepository(session).stream_all_with_users()
+            ]
+        if sheet_name == GENERAL_SHEET:
+            return [
+                (user.telegram_id, GoogleSheetsManager.user_row(user, _format(user.created_at)))
+                async for user in UserRepository(session).stream_all()
+            ]
+        return [
+            (user.telegram_id, GoogleSheetsManager.user_row(user, _format(registered_at)))
+            async for user, registered_at in RegistrationRepository(session).stream_event_participants(event_id)
+        ]
+
+
+def _format(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
@@ -0,0 +1,55 @@
+"""Индекс Telegram ID → номер строки листа Google Sheets."""
+from typing import Dict, Iterable, List, Optional
+
+
+class SheetRowIndex:
+    """
+    Где на листе находится строка пользователя.
+
+    Строится из одной колонки Telegram ID и поддерживается при добавлении
+    и удалении строк (после удаления нижние строки сдвигаются вверх).
+    При расхождении с листом индекс просто строится заново.
+    """
+
+    def __init__(self, rows: Dict[str, int], next_row: int):
+        self._rows = rows
+        self.next_row = next_row
+
+    @classmethod
+    def build(cls, column_values: List[str]) -> "SheetRowIndex":
+        """Построить индекс по значениям колонки Telegram ID (первая строка - заголовок)."""
+        rows: Dict[str, int] = {}
+        for row_number, value in enumerate(column_values[1:], start=2):
+            if value and value not in rows:
+                rows[value] = row_number
+        return cls(rows, next_row=max(len(column_values), 1) + 1)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, telegram_id: str) -> Optional[int]:
+        return self._rows.get(telegram_id)
+
+    def on_append(self, telegram_ids: Iterable[str], first_row: Optional[int] = None) -> None:
+        """Учесть строки, добавленные в конец листа (first_row - из ответа API, если известен)."""
+        row_number = first_row or self.next_row
+        for telegram_id in telegram_ids:
+            self._rows.setdefault(telegram_id, row_number)
+            row_number += 1
+        self.next_row = max(self.next_row, row_number)
+
+    def on_tail(self, column_values: List[str]) -> None:
+        """Учесть строки, найденные на листе начиная с next_row (их добавил другой процесс)."""
+        for offset, telegram_id in enumerate(column_values):
+            if telegram_id:
+                self._rows.setdefault(telegram_id, self.next_row + offset)
+        self.next_row += len(column_values)
+
+    def on_delete(self, row_number: int) -> None:
+        """Учесть удаление строки: ее ключ пропадает, строки ниже сдвигаются на одну вверх."""
+        self._rows = {
+            telegram_id: (row - 1 if row > row_number else row)
+            for telegram_id, row in self._rows.items()
+            if row != row_number
+        }
+        self.next_row = max(2, self.next_row - 1)
@@ -1,185 +1,252 @@
 """Менеджер для работы с Google Sheets."""
+import hashlib
 import logging
-from typing import Optional
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
 from datetime import datetime
 
 import gspread
-from google.auth.exceptions import GoogleAuthError
 
 from app.config.config import GoogleSheetsConfig
 from app.database.models.user import User
+from app.infrastructure.cache.user_profile_cache import UserProfile
+from app.infrastructure.google_sheets.backends.base import SheetsBackend
+from app.infrastructure.google_sheets.backends.gspread_backend import GspreadBackend
+from app.infrastructure.google_sheets.backends.local_backend import LocalSheetsBackend
+from app.infrastructure.google_sheets.quota import SheetsQuotaScheduler
+from app.infrastructure.google_sheets.row_index import SheetRowIndex
+from app.infrastructure.metrics.instruments import observe_sheets_call
 
 logger = logging.getLogger(__name__)
 
+GENERAL_SHEET = "general"
+PASSPORT_SHEET = "Пропуски"
+
+# Заголовки листа general и листов мероприятий
+USER_HEADERS = [
+    "Дата регистрации",
+    "Имя",
+    "Фамилия",
+    "Email",
+    "Место работы/учебы",
+    "Telegram ID",
+    "Username",
+]
+
+PASSPORT_HEADERS = [
+    "Дата обновления",
+    "ФИО",
+    "Паспорт",
+    "Номер автомобиля",
+    "Telegram ID",
+    "Username",
+]
+
+
+def _headers_for(sheet_name: str) -> List[str]:
+    return PASSPORT_HEADERS if sheet_name == PASSPORT_SHEET else USER_HEADERS
+
+
+def _telegram_id_column(sheet_name: str) -> int:
+    """Номер колонки Telegram ID (с 1) - заголовки листов проверены при открытии."""
+    return _headers_for(sheet_name).index("Telegram ID") + 1
+
 
 class GoogleSheetsManager:
     """Менеджер для работы с Google Sheets."""
     
-    def __init__(self, config: GoogleSheetsConfig):
+    def __init__(self, config: GoogleSheetsConfig, backend: Optional[SheetsBackend] = None):
         self.config = config
-        self._client: Optional[gspread.Client] = None
-        self._spreadsheet: Optional[gspread.Spreadsheet] = None
-    
-    def _get_client(self) -> gspread.Client:
-        """Получить клиент Google Sheets."""
-        if self._client is None:
-            try:
-                self._client = gspread.service_account(filename=self.config.credentials_path)
-            except GoogleAuthError as e:
-                logger.error(f"Ошибка аутентификации Google Sheets: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Ошибка создания клиента Google Sheets: {e}")
-                raise
-        return self._client
+        self._spreadsheet = None
+        # Открытые листы с проверенными заголовками: имя -> (лист, срок годности по monotonic)
+        self._worksheets: Dict[str, Tuple[gspread.Worksheet, float]] = {}
+        # Индексы Telegram ID -> номер строки по листам (строятся при первом поиске)
+        self._row_indexes: Dict[str, SheetRowIndex] = {}
+        # Через планировщик идет каждый запрос к таблице, какой бы ни был бэкенд
+        self.scheduler = SheetsQuotaScheduler(
+            read_per_minute=config.read_quota_per_minute,
+            write_per_minute=config.write_quota_per_minute,
+            max_attempts=config.retry_max_attempts,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+        )
+        self.backend = backend or create_backend(config, self.scheduler)
     
-    def _get_spreadsheet(self) -> gspread.Spreadsheet:
-        """Получить таблицу Google Sheets."""
+    def _get_spreadsheet(self):
+        """Получить таблицу (gspread.Spreadsheet или ее локальный аналог)."""
         if self._spreadsheet is None:
-            try:
-                client = self._get_client()
-                self._spreadsheet = client.open_by_url(self.config.spreadsheet_url)
-            except Exception as e:
-                logger.error(f"Ошибка открытия таблицы: {e}")
-                raise
+            self._spreadsheet = self.backend.open_spreadsheet()
         return self._spreadsheet
     
     def _get_or_create_worksheet(self, sheet_name: str) -> gspread.Worksheet:
-        """Получить или создать лист в таблице."""
+        """
+        Получить лист из кэша или открыть (создать) его и проверить заголовки.
+        Пока запись в кэше жива, операция с листом не тратит лишних запросов к API.
+        """
+        cached = self._worksheets.get(sheet_name)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
         try:
             spreadsheet = self._get_spreadsheet()
-            
-            # Попробуем найти существующий лист
             try:
                 worksheet = spreadsheet.worksheet(sheet_name)
-                logger.info(f"Найден существующий лист: {sheet_name}")
-                
-                # Проверим, есть ли заголовки (первая строка)
-                try:
-                    first_row = worksheet.row_values(1)
-                    headers = [
-                        "Дата регистрации",
-                        "Имя", 
-                        "Фамилия", 
-                        "Email", 
-                        "Место работы/учебы",
-                        "Telegram ID",
-                        "Username"
-                    ]
-                    if not first_row or len(first_row) < len(headers):
-                        worksheet.clear()  # Очищаем лист
-                        worksheet.insert_row(headers, 1)
-                        logger.info(f"Обновлены заголовки в листе {sheet_name}")
-                    elif len(first_row) == len(headers) - 1:
-                        worksheet.update_cell(1, len(headers), headers[-1])
-                        logger.info(f"Добавлена колонка Username в лист {sheet_name}")
-                except Exception as header_error:
-                    logger.warning(f"Не удалось проверить заголовки для {sheet_name}: {header_error}")
-                
-                return worksheet
-                
+                self._verify_headers(worksheet, worksheet.row_values(1))
             except gspread.WorksheetNotFound:
-                # Создаем новый лист
-                logger.info(f"Создаем новый лист: {sheet_name}")
-                worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=10)
-                
-                # Добавляем заголовки
-                headers = [
-                    "Дата регистрации",
-                    "Имя", 
-                    "Фамилия", 
-                    "Email", 
-                    "Место работы/учебы",
-                    "Telegram ID",
-                    "Username"
-                ]
-                worksheet.append_row(headers)
-                logger.info(f"Лист {sheet_name} создан с заголовками")
-                
-                return worksheet
-                
+                worksheet = self._create_worksheet(sheet_name)
         except Exception as e:
-            logger.error(f"Ошибка при работе с листом {sheet_name}: {e}")
+            logger.error("Ошибка при работе с листом %s: %s", sheet_name, e)
             raise
 
+        self._cache_worksheet(worksheet)
+        return worksheet
+
     def _get_or_create_passport_sheet(self) -> gspread.Worksheet:
         """Получить лист с пропусками или создать его с нужными заголовками."""
-        headers = [
-            "Дата обновления",
-            "ФИО",
-            "Паспорт",
-            "Номер автомобиля",
-            "Telegram ID",
-            "Username",
-        ]
+        return self._get_or_create_worksheet(PASSPORT_SHEET)
 
-        try:
-            spreadsheet = self._get_spreadsheet()
-            try:
-                worksheet = spreadsheet.worksheet("Пропуски")
+    def warm_up(self, sheet_names: Sequence[str]) -> None:
+        """
+        Открыть листы и проверить заголовки при старте: один запрос на список листов
+        и один на первые строки всех листов сразу. Отсутствующие листы создаются.
+        """
+        spreadsheet = self._get_spreadsheet()
+        existing = {worksheet.title: worksheet for worksheet in spreadsheet.worksheets()}
+        names = list(dict.fromkeys(sheet_names))
+        found = [name for name in names if name in existing]
+
+        if found:
+            response = spreadsheet.values_batch_get(
+                [gspread.utils.absolute_range_name(name, "1:1") for name in found]
+            )
+            for name, value_range in zip(found, response.get("valueRanges", [])):
+                values = value_range.get("values") or [[]]
                 try:
-                    first_row = worksheet.row_values(1)
-                    if first_row[: len(headers)] != headers:
-                        worksheet.update("A1", [headers])
-                        logger.info("Обновлены заголовки в листе 'Пропуски'")
+                    self._verify_headers(existing[name], values[0])
                 except Exception as header_error:
-                    logger.warning(
-                        "Не удалось обновить заголовки для листа 'Пропуски': %s",
-                        header_error,
-                    )
-                return worksheet
-            except gspread.WorksheetNotFound:
-                worksheet = spreadsheet.add_worksheet(title="Пропуски", rows=1000, cols=10)
-                worksheet.append_row(headers)
-                logger.info("Создан новый лист 'Пропуски' с заголовками")
-                return worksheet
-        except Exception as e:
-            logger.error("Ошибка при работе с листом 'Пропуски': %s", e)
-            raise
+                    logger.warning("Не удалось проверить заголовки для %s: %s", name, header_error)
+                self._cache_worksheet(existing[name])
+
+        for name in names:
+            if name not in existing:
+                self._cache_worksheet(self._create_worksheet(name))
+
+        logger.info("Google Sheets прогреты: %s листов", len(names))
+
+    def invalidate_worksheet(self, sheet_name: str) -> None:
+        """Забыть лист (например, его удалили или переименовали в таблице)."""
+        self._worksheets.pop(sheet_name, None)
+        self._row_indexes.pop(sheet_name, None)
+
+    def _build_row_index(self, worksheet: gspread.Worksheet) -> SheetRowIndex:
+        """Построить индекс строк листа одним чтением колонки Telegram ID."""
+        column = worksheet.col_values(_telegram_id_column(worksheet.title))
+        index = SheetRowIndex.build(column)
+        self._row_indexes[worksheet.title] = index
+        return index
+
+    def _find_rows(self, worksheet: gspread.Worksheet, telegram_ids: Sequence[str]) -> Dict[str, int]:
+        """
+        Номера строк пользователей на листе по индексу. Одним batch_get проверяются
+        ячейки Telegram ID найденных строк, а если кого-то в индексе нет - еще и хвост
+        листа после известных строк (строки, добавленные другой копией бота).
+        Вся колонка читается заново, только если индекса нет или проверка не сошлась.
+        """
+        index = self._row_indexes.get(worksheet.title)
+        if index is None:
+            index = self._build_row_index(worksheet)
+            return _rows_of(index, telegram_ids)
+
+        letter = _column_letter(_telegram_id_column(worksheet.title))
+        found = _rows_of(index, telegram_ids)
+        ranges = [f"{letter}{row_number}" for row_number in found.values()]
+        read_tail = len(found) < len(set(telegram_ids))
+        if read_tail:
+            ranges.append(f"{letter}{index.next_row}:{letter}")
+        if not ranges:
+            return found
+
+        values = worksheet.batch_get(ranges)
+        cells = [_first_value(value_range) for value_range in values[: len(found)]]
+        if cells != list(found):
+            logger.warning("Индекс строк листа %s разошелся с таблицей, перестраиваем", worksheet.title)
+            return _rows_of(self._build_row_index(worksheet), telegram_ids)
+        if read_tail:
+            index.on_tail([row[0] if row else "" for row in values[len(found)]])
+        return _rows_of(index, telegram_ids)
 
+    def _record_append(self, worksheet: gspread.Worksheet, telegram_ids: List[str], response: dict) -> None:
+        """Учесть добавленные строки в индексе листа (если он уже построен)."""
+        index = self._row_indexes.get(worksheet.title)
+        if index is None:
+            return
+        first_row = None
+        updated_range = (response or {}).get("updates", {}).get("updatedRange", "")
+        if "!" in updated_range:
+            first_cell = updated_range.split("!", 1)[1].split(":", 1)[0]
+            first_row, _ = gspread.utils.a1_to_rowcol(first_cell)
+        index.on_append(telegram_ids, first_row)
+
+    def _cache_worksheet(self, worksheet: gspread.Worksheet) -> None:
+        self._worksheets[worksheet.title] = (worksheet, time.monotonic() + self.config.worksheet_cache_ttl)
+
+    def _handle_error(self, sheet_name: str, error: Exception) -> None:
+        # Лист удалили или переименовали: следующая попытка откроет его заново
+        if isinstance(error, gspread.WorksheetNotFound) or (
+            isinstance(error, gspread.exceptions.APIError) and "Unable to parse range" in str(error)
+        ):
+            self.invalidate_worksheet(sheet_name)
+
+    def _create_worksheet(self, sheet_name: str) -> gspread.Worksheet:
+        logger.info("Создаем новый лист: %s", sheet_name)
+        self._row_indexes.pop(sheet_name, None)
+        worksheet = self._get_spreadsheet().add_worksheet(title=sheet_name, rows=1000, cols=10)
+        worksheet.append_row(_headers_for(sheet_name))
+        logger.info("Лист %s создан с заголовками", sheet_name)
+        return worksheet
+
+    def _verify_headers(self, worksheet: gspread.Worksheet, first_row: List[str]) -> None:
+        """Проверить первую строку листа и при необходимости исправить заголовки."""
+        sheet_name = worksheet.title
+        headers = _headers_for(sheet_name)
+        try:
+            if sheet_name == PASSPORT_SHEET:
+                if first_row[: len(headers)] != headers:
+                    worksheet.update("A1", [headers])
+                    logger.info("Обновлены заголовки в листе 'Пропуски'")
+            elif not first_row or len(first_row) < len(headers) - 1:
+                worksheet.clear()  # Очищаем лист
+                worksheet.insert_row(headers, 1)
+                self._row_indexes.pop(sheet_name, None)
+                logger.info("Обновлены заголовки в листе %s", sheet_name)
+            elif len(first_row) == len(headers) - 1:
+                worksheet.update_cell(1, len(headers), headers[-1])
+                logger.info("Добавлена колонка Username в лист %s", sheet_name)
+        except Exception as header_error:
+            logger.warning("Не удалось проверить заголовки для %s: %s", sheet_name, header_error)
+
+    @observe_sheets_call("upsert_passport_entry")
     def upsert_passport_entry(
         self,
-        user: User,
+        user: Union[User, UserProfile],
         full_name: str,
         passport_number: str,
         car_number: Optional[str] = None,
+        timestamp: Optional[str] = None,
     ) -> bool:
-        """Добавить или обновить запись о паспорте на листе 'Пропуски'."""
+        """
+        Добавить или обновить запись о паспорте на листе 'Пропуски'.
+        Ошибки API пробрасываются, чтобы диспетчер outbox повторил операцию.
+        """
         try:
             worksheet = self._get_or_create_passport_sheet()
 
-            row_data = [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                full_name,
-                passport_number,
-                car_number or "",
-                str(user.telegram_id),
-                user.username or "",
-            ]
-
-            all_values = worksheet.get_all_values()
-            if not all_values:
-                worksheet.append_row(row_data)
-                return True
+            row_data = self.passport_row(user, full_name, passport_number, car_number, timestamp)
 
-            headers = all_values[0]
-            telegram_id_col = None
-            for idx, header in enumerate(headers):
-                if "Telegram ID" in header:
-                    telegram_id_col = idx
-                    break
-
-            if telegram_id_col is None:
-                logger.error("Колонка 'Telegram ID' не найдена на листе 'Пропуски'")
-                return False
-
-            target_row = None
             telegram_id_str = str(user.telegram_id)
-            for row_idx in range(1, len(all_values)):
-                row = all_values[row_idx]
-                if len(row) > telegram_id_col and row[telegram_id_col] == telegram_id_str:
-                    target_row = row_idx + 1
-                    break
+            # Промах по индексу перепроверяется чтением хвоста листа: строку могла
+            # добавить другая копия бота, а лишнее добавление уже не отменить
+            target_row = self._find_rows(worksheet, [telegram_id_str]).get(telegram_id_str)
 
             if target_row:
                 range_start = "A"  # первые 6 колонок
@@ -188,108 +255,301 @@ class GoogleSheetsManager:
                 worksheet.update(range_notation, [row_data])
                 logger.info("Обновлена запись пользователя %s в листе 'Пропуски'", telegram_id_str)
             else:
-                worksheet.append_row(row_data)
+                response = worksheet.append_row(row_data)
+                self._record_append(worksheet, [telegram_id_str], response)
                 logger.info("Добавлена запись пользователя %s в лист 'Пропуски'", telegram_id_str)
 
             return True
 
         except Exception as e:
             logger.error("Ошибка при синхронизации данных паспорта в листе 'Пропуски': %s", e)
-            return False
+            self._handle_error(PASSPORT_SHEET, e)
+            raise
     
-    def add_user_to_general_sheet(self, user: User) -> bool:
+    @staticmethod
+    def passport_row(
+        user: Union[User, UserProfile],
+        full_name: str,
+        passport_number: str,
+        car_number: Optional[str] = None,
+        timestamp: Optional[str] = None,
+    ) -> List[str]:
+        """Строка листа 'Пропуски'."""
+        return [
+            timestamp or _now(),
+            full_name,
+            passport_number,
+            car_number or "",
+            str(user.telegram_id),
+            user.username or "",
+        ]
+
+    @staticmethod
+    def user_row(user: Union[User, UserProfile], timestamp: Optional[str] = None) -> List[str]:
+        """Строка пользователя для листов general и мероприятий."""
+        return [
+            timestamp or _now(),
+            user.first_name,
+            user.last_name,
+            user.email,
+            user.workplace,
+            str(user.telegram_id),
+            user.username or ""  # Username может быть None
+        ]
+
+    @observe_sheets_call("append_users")
+    def append_users(
+        self,
+        sheet_name: str,
+        users: Sequence[Tuple[Union[User, UserProfile], Optional[str]]],
+    ) -> bool:
+        """Добавить несколько пользователей на лист одним запросом values.append."""
+        try:
+            worksheet = self._get_or_create_worksheet(sheet_name)
+            rows = [self.user_row(user, timestamp) for user, timestamp in users]
+            response = worksheet.append_rows(rows)
+            self._record_append(worksheet, [str(user.telegram_id) for user, _ in users], response)
+            logger.info("На лист %s добавлено строк: %s", sheet_name, len(rows))
+            return True
+
+        except Exception as e:
+            logger.error("Ошибка пакетного добавления на лист %s: %s", sheet_name, e)
+            self._handle_error(sheet_name, e)
+            raise
+
+    @observe_sheets_call("add_user_to_general_sheet")
+    def add_user_to_general_sheet(self, user: Union[User, UserProfile], timestamp: Optional[str] = None) -> bool:
         """Добавить пользователя на общий лист (general)."""
         try:
-            worksheet = self._get_or_create_worksheet("general")
+            worksheet = self._get_or_create_worksheet(GENERAL_SHEET)
             
-            # Формируем строку данных
-            row_data = [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                user.first_name,
-                user.last_name,
-                user.email,
-                user.workplace,
-                str(user.telegram_id),
-                user.username or ""  # Username может быть None
-            ]
+            row_data = self.user_row(user, timestamp)
             
-            worksheet.append_row(row_data)
-            logger.info(f"Пользователь {user.first_name} {user.last_name} добавлен в общий лист")
+            response = worksheet.append_row(row_data)
+            self._record_append(worksheet, [str(user.telegram_id)], response)
+            logger.info("Пользователь %s %s добавлен в общий лист", user.first_name, user.last_name)
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка добавления пользователя в общий лист: {e}")
-            return False
+            logger.error("Ошибка добавления пользователя в общий лист: %s", e)
+            self._handle_error(GENERAL_SHEET, e)
+            raise
     
-    def add_user_to_event_sheet(self, user: User, event_name: str, sheet_name: str) -> bool:
+    @observe_sheets_call("add_user_to_event_sheet")
+    def add_user_to_event_sheet(
+        self,
+        user: Union[User, UserProfile],
+        event_name: str,
+        sheet_name: str,
+        timestamp: Optional[str] = None,
+    ) -> bool:
         """Добавить пользователя на лист мероприятия."""
         try:
             worksheet = self._get_or_create_worksheet(sheet_name)
             
-            # Формируем строку данных
-            row_data = [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                user.first_name,
-                user.last_name,
-                user.email,
-                user.workplace,
-                str(user.telegram_id),
-                user.username or ""  # Username может быть None
-            ]
+            row_data = self.user_row(user, timestamp)
             
-            worksheet.append_row(row_data)
-            logger.info(f"Пользователь {user.first_name} {user.last_name} добавлен на лист мероприятия {event_name}")
+            response = worksheet.append_row(row_data)
+            self._record_append(worksheet, [str(user.telegram_id)], response)
+            logger.info("Пользователь %s %s добавлен на лист мероприятия %s", user.first_name, user.last_name, event_name)
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка добавления пользователя на лист мероприятия {event_name}: {e}")
-            return False
+            logger.error("Ошибка добавления пользователя на лист мероприятия %s: %s", event_name, e)
+            self._handle_error(sheet_name, e)
+            raise
     
-    def remove_user_from_event_sheet(self, user: User, sheet_name: str) -> bool:
-        """Удалить пользователя с листа мероприятия."""
+    @observe_sheets_call("remove_user_from_event_sheet")
+    def remove_user_from_event_sheet(self, user: Union[User, UserProfile], sheet_name: str) -> bool:
+        """Удалить пользователя с листа мероприятия. False - пользователя на листе нет."""
+        return self._remove_users(sheet_name, [user]) > 0
+
+    @observe_sheets_call("find_users")
+    def find_users(self, sheet_name: str, telegram_ids: Sequence[int]) -> Set[int]:
+        """Кто из пользователей есть на листе: проверка по индексу строк (см. _find_rows)."""
         try:
             worksheet = self._get_or_create_worksheet(sheet_name)
-            
-            # Получаем все значения таблицы
-            all_values = worksheet.get_all_values()
-            
-            if len(all_values) <= 1:  # Только заголовки или пустая таблица
-                logger.warning(f"Лист {sheet_name} пуст или содержит только заголовки")
-                return False
-            
-            # Ищем строку с пользователем по Telegram ID
-            telegram_id_str = str(user.telegram_id)
-            user_row_index = None
-            
-            # Определяем индекс колонки Telegram ID
-            headers = all_values[0] if all_values else []
-            telegram_id_col = None
-            
-            for col_idx, header in enumerate(headers):
-                if "Telegram ID" in str(header):
-                    telegram_id_col = col_idx
-                    break
-            
-            if telegram_id_col is None:
-                logger.error(f"Колонка 'Telegram ID' не найдена в листе {sheet_name}")
-                return False
-            
-            # Ищем пользователя по строкам (начиная с 1, пропускаем заголовки)
-            for row_idx in range(1, len(all_values)):
-                row = all_values[row_idx]
-                if len(row) > telegram_id_col and str(row[telegram_id_col]) == telegram_id_str:
-                    user_row_index = row_idx + 1  # +1 для корректного индекса в Google Sheets
-                    break
-            
-            if user_row_index is None:
-                logger.warning(f"Пользователь с Telegram ID {telegram_id_str} не найден на листе {sheet_name}")
-                return False
-            
-            # Удаляем строку
-            worksheet.delete_rows(user_row_index)
-            logger.info(f"Пользователь {user.first_name} {user.last_name} (ID: {telegram_id_str}) удален с листа {sheet_name} (строка {user_row_index})")
-            return True
-            
+            found = self._find_rows(worksheet, [str(telegram_id) for telegram_id in telegram_ids])
+            return {int(telegram_id) for telegram_id in found}
+
+        except Exception as e:
+            logger.error("Ошибка поиска пользователей на листе %s: %s", sheet_name, e)
+            self._handle_error(sheet_name, e)
+            raise
+
+    @observe_sheets_call("remove_users")
+    def remove_users(self, sheet_name: str, users: Sequence[Union[User, UserProfile]]) -> int:
+        """
+        Удалить строки пользователей с листа: одно чтение колонки Telegram ID
+        и один batchUpdate из deleteDimension снизу вверх, чтобы номера еще
+        не удаленных строк не сдвигались. Возвращает количество удаленных строк.
+        """
+        return self._remove_users(sheet_name, users)
+
+    def _remove_users(self, sheet_name: str, users: Sequence[Union[User, UserProfile]]) -> int:
+        # Без observe_sheets_call: вызов учитывает тот публичный метод, через который он пришел
+        try:
+            worksheet = self._get_or_create_worksheet(sheet_name)
+            # Номера удаляемых строк сверяются с листом: удалить чужую строку нельзя
+            found = self._find_rows(worksheet, [str(user.telegram_id) for user in users])
+            index = self._row_indexes[worksheet.title]
+
+            rows = set()
+            for user in users:
+                row_number = found.get(str(user.telegram_id))
+                if row_number is None:
+                    logger.warning("Пользователь с Telegram ID %s не найден на листе %s", user.telegram_id, sheet_name)
+                else:
+                    rows.add(row_number)
+            if not rows:
+                return 0
+
+            ranges = list(reversed(_runs(sorted(rows))))
+            self._get_spreadsheet().batch_update({
+                "requests": [
+                    {
+                        "deleteDimension": {
+                            "range": {
+                                "sheetId": worksheet.id,
+                                "dimension": "ROWS",
+                                "startIndex": start - 1,
+                                "endIndex": end,
+                            }
+                        }
+                    }
+                    for start, end in ranges
+                ]
+            })
+            for row_number in sorted(rows, reverse=True):
+                index.on_delete(row_number)
+            logger.info("С листа %s удалено строк: %s", sheet_name, len(rows))
+            return len(rows)
+
+        except Exception as e:
+            logger.error("Ошибка удаления строк с листа %s: %s", sheet_name, e)
+            self._handle_error(sheet_name, e)
+            raise
+
+    @observe_sheets_call("reconcile_sheet")
+    def reconcile_sheet(self, sheet_name: str, rows: Sequence[Sequence[str]]) -> Dict[str, int]:
+        """
+        Привести лист к эталонным строкам (без заголовка): одно чтение листа
+        и один values.batchUpdate только по диапазонам, где хэши строк разошлись.
+        Лишние строки внизу очищаются. Если строка отличается только датой в
+        первой колонке, дата на листе сохраняется - ее пишет outbox в момент операции.
+        """
+        try:
+            worksheet = self._get_or_create_worksheet(sheet_name)
+            headers = _headers_for(sheet_name)
+            width = len(headers)
+            telegram_id_column = _telegram_id_column(sheet_name) - 1
+
+            current = [_fit(row, width) for row in worksheet.get_all_values()]
+            desired = [headers] + [_fit(row, width) for row in rows]
+
+            for position in range(1, min(len(current), len(desired))):
+                existing, wanted = current[position], desired[position]
+                if (
+                    existing[0]
+                    and existing[telegram_id_column] == wanted[telegram_id_column]
+                    and _row_hash(existing[1:]) == _row_hash(wanted[1:])
+                ):
+                    wanted[0] = existing[0]
+
+            blank = [""] * width
+            target = desired + [blank] * max(0, len(current) - len(desired))
+            changed = [
+                position for position, row in enumerate(target)
+                if position >= len(current) or _row_hash(current[position]) != _row_hash(row)
+            ]
+
+            # Подряд идущие измененные строки пишутся одним диапазоном
+            data = []
+            for start, end in _runs(changed):
+                data.append({
+                    "range": f"A{start + 1}:{gspread.utils.rowcol_to_a1(end + 1, width)}",
+                    "values": target[start:end + 1],
+                })
+            if data:
+                worksheet.batch_update(data)
+
+            self._row_indexes[sheet_name] = SheetRowIndex.build([row[telegram_id_column] for row in desired])
+            result = {
+                "rows": len(desired) - 1,
+                "changed": sum(1 for position in changed if position < len(desired)),
+                "cleared": max(0, len(current) - len(desired)),
+                "ranges": len(data),
+            }
+            logger.info("Лист %s сверен с БД: %s", sheet_name, result)
+            return result
+
         except Exception as e:
-            logger.error(f"Ошибка удаления пользователя с листа мероприятия: {e}")
-            return False
\ No newline at end of file
+            logger.error("Ошибка сверки листа %s: %s", sheet_name, e)
+            self._handle_error(sheet_name, e)
+            raise
+
+
+def create_backend(config: GoogleSheetsConfig, scheduler: SheetsQuotaScheduler) -> SheetsBackend:
+    """Бэкенд по GOOGLE_SHEETS_BACKEND: gspread (по умолчанию), memory или csv."""
+    if config.backend == "gspread":
+        return GspreadBackend(config.credentials_path, config.spreadsheet_url, scheduler)
+    if config.backend in ("memory", "csv"):
+        return LocalSheetsBackend(
+            scheduler,
+            directory=config.local_dir if config.backend == "csv" else None,
+            latency=config.local_latency_ms / 1000,
+            failure_rate=config.local_failure_rate,
+        )
+    raise ValueError(f"Неизвестный бэкенд Google Sheets: {config.backend}")
+
+
+def content_hash(row: Sequence[str]) -> str:
+    """Хэш содержимого строки без первой колонки (даты): по нему отсеиваются записи без изменений."""
+    return _row_hash([_cell(value) for value in row[1:]]).hex()
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _fit(row: Sequence[str], width: int) -> List[str]:
+    """Строка ровно из width ячеек-строк."""
+    values = [_cell(value) for value in row[:width]]
+    return values + [""] * (width - len(values))
+
+
+def _row_hash(row: Sequence[str]) -> bytes:
+    return hashlib.blake2b("\x1f".join(row).encode("utf-8"), digest_size=16).digest()
+
+
+def _runs(positions: List[int]) -> List[Tuple[int, int]]:
+    """Разбить отсортированные номера на отрезки подряд идущих: [(начало, конец)]."""
+    runs: List[Tuple[int, int]] = []
+    for position in positions:
+        if runs and runs[-1][1] == position - 1:
+            runs[-1] = (runs[-1][0], position)
+        else:
+            runs.append((position, position))
+    return runs
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _rows_of(index: SheetRowIndex, telegram_ids: Sequence[str]) -> Dict[str, int]:
+    rows = {}
+    for telegram_id in telegram_ids:
+        row_number = index.get(telegram_id)
+        if row_number is not None:
+            rows[telegram_id] = row_number
+    return rows
+
+
+def _column_letter(column: int) -> str:
+    return gspread.utils.rowcol_to_a1(1, column)[:-1]
+
+
+def _first_value(value_range: Sequence[Sequence[str]]) -> str:
+    """Значение первой ячейки ответа batch_get (пустой ячейке соответствует пустой ответ)."""
+    return value_range[0][0] if value_range and value_range[0] else ""
@@ -0,0 +1 @@
+# Метрики
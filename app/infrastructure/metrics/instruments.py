@@ -0,0 +1,192 @@
+"""Метрики бота и точки их сбора: апдейты, БД, Google Sheets, Redis и Bot API."""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from redis.asyncio import Redis
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.infrastructure.metrics.registry import REGISTRY, Gauge
+
+# Апдейты
+UPDATE_LATENCY = REGISTRY.histogram(
+    "bot_update_duration_seconds",
+    "Время обработки апдейта по типу события и состоянию диалога",
+    ("update_type", "state"),
+)
+UPDATE_ERRORS = REGISTRY.counter(
+    "bot_update_errors_total",
+    "Апдейты, обработка которых завершилась исключением",
+    ("update_type", "state"),
+)
+
+# База данных
+DB_STATEMENTS = REGISTRY.counter("bot_db_statements_total", "Выполненные SQL-запросы")
+DB_STATEMENT_LATENCY = REGISTRY.histogram("bot_db_statement_duration_seconds", "Время выполнения SQL-запроса")
+DB_STATEMENTS_PER_UPDATE = REGISTRY.histogram(
+    "bot_db_statements_per_update",
+    "Количество SQL-запросов на один апдейт",
+    ("update_type",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_TIME_PER_UPDATE = REGISTRY.histogram(
+    "bot_db_time_per_update_seconds",
+    "Суммарное время SQL-запросов на один апдейт",
+    ("update_type",),
+)
+
+# Google Sheets
+SHEETS_LATENCY = REGISTRY.histogram(
+    "bot_sheets_call_duration_seconds",
+    "Время операции с Google Sheets",
+    ("operation",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+SHEETS_ERRORS = REGISTRY.counter(
+    "bot_sheets_call_errors_total",
+    "Неуспешные операции с Google Sheets",
+    ("operation",),
+)
+
+# Redis
+REDIS_COMMANDS = REGISTRY.counter("bot_redis_commands_total", "Команды Redis (round trip)", ("command",))
+REDIS_LATENCY = REGISTRY.histogram("bot_redis_command_duration_seconds", "Время выполнения команды Redis")
+
+# Telegram Bot API
+BOT_API_LATENCY = REGISTRY.histogram(
+    "bot_api_request_duration_seconds",
+    "Время запроса к Telegram Bot API",
+    ("method",),
+)
+BOT_API_ERRORS = REGISTRY.counter("bot_api_request_errors_total", "Ошибки запросов к Bot API", ("method",))
+
+
+@dataclass
+class UpdateStats:
+    """Статистика одного апдейта (накапливается хуками через contextvar)."""
+    db_statements: int = 0
+    db_time: float = 0.0
+
+
+_current_update: ContextVar[Optional[UpdateStats]] = ContextVar("metrics_current_update", default=None)
+
+
+@contextmanager
+def track_update(update_type: str, state: str) -> Iterator[UpdateStats]:
+    """Замерить обработку апдейта и собрать число SQL-запросов внутри нее."""
+    stats = UpdateStats()
+    token = _current_update.set(stats)
+    started = time.perf_counter()
+    try:
+        yield stats
+    except Exception:
+        UPDATE_ERRORS.inc(update_type=update_type, state=state)
+        raise
+    finally:
+        UPDATE_LATENCY.observe(time.perf_counter() - started, update_type=update_type, state=state)
+        DB_STATEMENTS_PER_UPDATE.observe(stats.db_statements, update_type=update_type)
+        DB_TIME_PER_UPDATE.observe(stats.db_time, update_type=update_type)
+        _current_update.reset(token)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подписаться на события движка SQLAlchemy и считать запросы."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        elapsed = time.perf_counter() - started
+        DB_STATEMENTS.inc()
+        DB_STATEMENT_LATENCY.observe(elapsed)
+        stats = _current_update.get()
+        if stats is not None:
+            stats.db_statements += 1
+            stats.db_time += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Сбрасываем отметку времени запроса, который не дошел до after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None:
+            starts = connection.info.get("metrics_query_start")
+            if starts:
+                starts.pop()
+
+
+def observe_sheets_call(operation: str) -> Callable:
+    """Декоратор для методов GoogleSheetsManager: время и ошибки (исключения)."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                SHEETS_ERRORS.inc(operation=operation)
+                raise
+            finally:
+                SHEETS_LATENCY.observe(time.perf_counter() - started, operation=operation)
+            return result
+        return wrapper
+    return decorator
+
+
+class InstrumentedRedis(Redis):
+    """Redis-клиент, который считает команды и время их выполнения."""
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMANDS.inc(command=command)
+            REDIS_LATENCY.observe(time.perf_counter() - started)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки исходящих запросов к Bot API."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        method_name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            BOT_API_ERRORS.inc(method=method_name)
+            raise
+        finally:
+            BOT_API_LATENCY.observe(time.perf_counter() - started, method=method_name)
+
+
+def register_stats_gauge(name: str, documentation: str, stats: Callable[[], Dict[str, Any]]) -> Gauge:
+    """Экспортировать словарь stats() компонента как gauge с меткой stat."""
+    gauge = REGISTRY.get(name)
+    if not isinstance(gauge, Gauge):
+        gauge = REGISTRY.gauge(name, documentation, ("stat",))
+    gauge.set_function(
+        lambda: {
+            (key,): float(value)
+            for key, value in stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+    )
+    return gauge
@@ -0,0 +1,27 @@
+"""HTTP-эндпоинт с метриками в текстовом формате Prometheus."""
+from aiohttp import web
+
+from app.config.config import MetricsConfig
+from app.infrastructure.metrics.registry import REGISTRY, MetricsRegistry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def start_metrics_server(config: MetricsConfig, registry: MetricsRegistry = REGISTRY) -> web.AppRunner:
+    """Запустить aiohttp-сервер метрик; остановка - через runner.cleanup()."""
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(config.path, handle_metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.host, port=config.port)
+    await site.start()
+    logger.info("Метрики доступны на %s:%s%s", config.host, config.port, config.path)
+    return runner
@@ -0,0 +1 @@
+# Шардирование апдейтов по воркерам
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Маршрутизация апдейтов по шардам через Redis Streams."""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+import redis.asyncio as redis
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Типы апдейтов, которые фронт запрашивает у Telegram и раздает воркерам
+ROUTED_UPDATE_TYPES = ["message", "callback_query"]
+
+
+def shard_for_key(key: int, shards: int) -> int:
+    """
+    Jump consistent hash (Lamping, Veach): при изменении числа шардов
+    переезжает только минимально необходимая доля пользователей.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < shards:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def extract_user_id(update: Update) -> Optional[int]:
+    """Найти пользователя, от которого пришел апдейт."""
+    try:
+        event = update.event
+    except Exception:
+        return None
+    from_user = getattr(event, "from_user", None)
+    if from_user is not None:
+        return from_user.id
+    chat = getattr(event, "chat", None)
+    return chat.id if chat is not None else None
+
+
+def stream_name(prefix: str, shard: int) -> str:
+    """Имя потока Redis для шарда."""
+    return f"{prefix}:{shard}"
+
+
+class UpdateRouterMiddleware(BaseMiddleware):
+    """
+    Внешний middleware фронт-процесса: не обрабатывает апдейт,
+    а кладет его в поток шарда, который выбирается по user_id.
+    """
+
+    def __init__(self, redis_client: redis.Redis, shards: int, stream_prefix: str, stream_maxlen: int):
+        self.redis = redis_client
+        self.shards = shards
+        self.stream_prefix = stream_prefix
+        self.stream_maxlen = stream_maxlen
+        self.routed = [0] * shards
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        user_id = extract_user_id(event)
+        # Апдейты без пользователя раскладываем по update_id
+        shard = shard_for_key(user_id if user_id is not None else event.update_id, self.shards)
+
+        await self.redis.xadd(
+            stream_name(self.stream_prefix, shard),
+            # by_alias: поля в формате Bot API ("from", а не "from_user") - их ждут воркер и feed_raw_update
+            {"update": event.model_dump_json(by_alias=True, exclude_unset=True)},
+            maxlen=self.stream_maxlen,
+            approximate=True,
+        )
+        self.routed[shard] += 1
+        logger.debug("Апдейт %s пользователя %s направлен в шард %s", event.update_id, user_id, shard)
+        return None
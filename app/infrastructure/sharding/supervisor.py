@@ -0,0 +1,63 @@
+"""Супервизор процессов-воркеров шардов."""
+import asyncio
+import multiprocessing
+from multiprocessing.process import BaseProcess
+from typing import List, Optional
+
+from app.infrastructure.sharding.worker import run_worker_process
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WorkerSupervisor:
+    """Запускает N процессов-воркеров (по одному на шард) и перезапускает упавшие."""
+
+    def __init__(self, workers: int, check_interval: float = 1.0):
+        self.workers = workers
+        self.check_interval = check_interval
+        # spawn: дочерний процесс не наследует event loop и открытые соединения родителя
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[BaseProcess]] = [None] * workers
+        self.restarts = 0
+
+    def start(self) -> None:
+        """Запустить все воркеры."""
+        for shard in range(self.workers):
+            self._spawn(shard)
+
+    async def monitor(self) -> None:
+        """Следить за воркерами и перезапускать завершившиеся."""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for shard, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    logger.error(
+                        "Воркер шарда %s (pid %s) завершился с кодом %s, перезапускаем",
+                        shard, process.pid, process.exitcode,
+                    )
+                    self.restarts += 1
+                    self._spawn(shard)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Остановить воркеры: SIGTERM, затем ожидание завершения."""
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+        logger.info("Воркеры шардов остановлены")
+
+    def _spawn(self, shard: int) -> None:
+        process = self._context.Process(
+            target=run_worker_process,
+            args=(shard,),
+            name=f"bot-worker-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[shard] = process
+        logger.info("Запущен воркер шарда %s (pid %s)", shard, process.pid)
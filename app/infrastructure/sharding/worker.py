@@ -0,0 +1,151 @@
+"""Воркер шарда: читает апдейты своего потока Redis и обрабатывает их."""
+import asyncio
+import dataclasses
+import json
+import os
+import signal
+from typing import Dict, List, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.bootstrap import BotApplication, create_application
+from app.config.config import ShardingConfig, load_config
+from app.infrastructure.sharding.router import stream_name
+from app.utils.logger import get_logger, setup_logging, set_log_levels
+
+logger = get_logger(__name__)
+
+
+class ShardWorker:
+    """
+    Потребитель потока одного шарда.
+
+    Апдейты обрабатываются параллельно, не больше max_in_flight. Очередность
+    апдейтов одного пользователя и лимит их числа обеспечивает AdmissionMiddleware
+    внутри диспетчера: задачи создаются в порядке потока и встают в его очередь
+    пользователя в том же порядке.
+    Сообщение подтверждается (XACK) только после обработки, поэтому после
+    рестарта воркер сначала дочитывает свои неподтвержденные апдейты.
+    """
+
+    def __init__(self, application: BotApplication, shard: int, config: ShardingConfig):
+        self.application = application
+        self.redis = application.redis_client
+        self.shard = shard
+        self.config = config
+        self.stream = stream_name(config.stream_prefix, shard)
+        self.group = f"{config.stream_prefix}:workers"
+        self.consumer = f"worker-{shard}"
+        self._semaphore = asyncio.Semaphore(config.worker_max_in_flight)
+        self._tasks: set[asyncio.Task] = set()
+        self.processed = 0
+        self.failed = 0
+
+    async def run(self) -> None:
+        """Читать поток до отмены."""
+        await self._ensure_group()
+        dp, bot = self.application.dp, self.application.bot
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+        logger.info("Воркер шарда %s запущен (pid %s), поток %s", self.shard, os.getpid(), self.stream)
+
+        # "0" - свои неподтвержденные сообщения, ">" - новые
+        last_id = "0"
+        try:
+            while True:
+                messages = await self._read(last_id)
+                if last_id != ">":
+                    if not messages:
+                        last_id = ">"
+                        continue
+                    # Продвигаемся по списку неподтвержденных, чтобы не взять их повторно
+                    last_id = messages[-1][0]
+                for message_id, fields in messages:
+                    await self._semaphore.acquire()
+                    task = asyncio.create_task(self._handle(message_id, fields))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+
+    async def _ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, last_id: str) -> List[Tuple[str, Dict[str, str]]]:
+        try:
+            response = await self.redis.xreadgroup(
+                self.group,
+                self.consumer,
+                {self.stream: last_id},
+                count=self.config.worker_max_in_flight,
+                block=5000,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Ошибка чтения потока %s: %s", self.stream, e)
+            await asyncio.sleep(1)
+            return []
+        if not response:
+            return []
+        return response[0][1]
+
+    async def _handle(self, message_id: str, fields: Dict[str, str]) -> None:
+        try:
+            raw_update = json.loads(fields["update"])
+            await self.application.dp.feed_raw_update(self.application.bot, raw_update)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error("Ошибка обработки апдейта %s в шарде %s: %s", message_id, self.shard, e)
+        finally:
+            # Ошибочный апдейт тоже подтверждаем, иначе он будет бесконечно переигрываться
+            try:
+                await self.redis.xack(self.stream, self.group, message_id)
+            except Exception as e:
+                logger.error("Не удалось подтвердить апдейт %s: %s", message_id, e)
+            self._semaphore.release()
+
+
+async def _run_worker(shard: int) -> None:
+    # Супервизор останавливает воркер через SIGTERM - превращаем его в отмену, чтобы закрыть соединения
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    setup_logging()
+    config = load_config()
+    set_log_levels(config.bot.log_level, config.bot.log_levels)
+
+    # У каждого воркера свои пулы; их суммарный размер должен укладываться в лимиты Postgres/Redis
+    database_config = dataclasses.replace(
+        config.database,
+        pool_size=config.sharding.worker_db_pool_size,
+        max_overflow=config.sharding.worker_db_max_overflow,
+    )
+    # Свой порт метрик у каждого воркера: фронт слушает port, воркеры - port + shard + 1
+    config = dataclasses.replace(
+        config,
+        metrics=dataclasses.replace(config.metrics, port=config.metrics.port + shard + 1),
+    )
+    application = await create_application(
+        config,
+        database_config=database_config,
+        redis_max_connections=config.sharding.worker_redis_max_connections,
+        # Прогрев и сверку листов, диспетчер outbox и сверку счетчиков мест держит один воркер
+        background_tasks=shard == 0,
+    )
+    try:
+        await ShardWorker(application, shard, config.sharding).run()
+    finally:
+        await application.close()
+
+
+def run_worker_process(shard: int) -> None:
+    """Точка входа дочернего процесса воркера."""
+    try:
+        asyncio.run(_run_worker(shard))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
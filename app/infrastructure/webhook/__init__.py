@@ -0,0 +1 @@
+# Webhook инфраструктура
\ No newline at end of file
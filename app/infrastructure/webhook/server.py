@@ -0,0 +1,96 @@
+"""Прием апдейтов Telegram через webhook на aiohttp."""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config.config import WebhookConfig
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook, который сразу отвечает Telegram 200,
+    а сами апдейты обрабатывает в фоне не более max_in_flight одновременно.
+    Если принятых, но не обработанных апдейтов уже max_pending, новый
+    запрос получает 503 и фоновая задача не создается: Telegram повторит
+    доставку позже.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_in_flight: int,
+        max_pending: int = 1000,
+        **kwargs: Any,
+    ):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_pending = max(max_pending, max_in_flight)
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        """Количество принятых, но еще не обработанных апдейтов."""
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Webhook перегружен (%s апдейтов в очереди), отвечаем 503", self.pending)
+            return web.Response(status=503)
+        return await super()._handle_request_background(bot=bot, request=request)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot=bot, update=update)
+            except Exception as e:
+                logger.error("Ошибка фоновой обработки апдейта: %s", e)
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    config: WebhookConfig,
+    allowed_updates: Optional[List[str]] = None,
+) -> None:
+    """Зарегистрировать webhook в Telegram и обслуживать входящие запросы до отмены."""
+    if not config.base_url:
+        raise ValueError("WEBHOOK_BASE_URL не задан для режима webhook")
+    if not config.secret_token:
+        raise ValueError("WEBHOOK_SECRET не задан для режима webhook")
+
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_in_flight=config.max_in_flight,
+        max_pending=config.max_pending,
+        secret_token=config.secret_token,
+    )
+    handler.register(app, path=config.path)
+    setup_application(app, dp, bot=bot)
+
+    await bot.set_webhook(
+        url=config.url,
+        secret_token=config.secret_token,
+        allowed_updates=allowed_updates if allowed_updates is not None else dp.resolve_used_update_types(),
+    )
+    logger.info("Webhook установлен: %s", config.url)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.host, port=config.port)
+    await site.start()
+    logger.info("Webhook-сервер слушает %s:%s%s", config.host, config.port, config.path)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,17 +1,23 @@
-"""Middleware для внедрения зависимостей и проверки блокировки."""
-from typing import Any, Awaitable, Callable, Dict
+"""Middleware для внедрения зависимостей, проверки блокировки и контроля нагрузки."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Update, Message, CallbackQuery, InlineQuery
 import redis.asyncio as redis
 
 from app.database.database import Database
-from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
-from app.services.user_service import UserService
-from app.services.event_service import EventService
-from app.services.lock_service import LockService
-from app.utils.logger import get_logger
-from app.services.passport_service import PassportService
+from app.infrastructure.cache.event_catalog import EventCatalogCache
+from app.infrastructure.cache.seat_counters import SeatCounters
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.outbox import SheetsOutboxDispatcher
+from app.infrastructure.metrics.instruments import track_update
+from app.infrastructure.sharding.router import extract_user_id
+from app.services.container import ServiceContainer
+from app.services.lock_service import LockService, LockStateWatcher
+from app.utils.keyed_lock import KeyedLock
+from app.utils.logger import get_logger, ContextLogger
 
 logger = get_logger(__name__)
 
@@ -19,10 +25,16 @@ logger = get_logger(__name__)
 class LockMiddleware(BaseMiddleware):
     """Middleware для проверки блокировки бота."""
     
-    def __init__(self, redis_client: redis.Redis, admin_ids: list[int]):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        admin_ids: list[int],
+        lock_watcher: Optional[LockStateWatcher] = None,
+    ):
         self.lock_service = LockService(redis_client)
+        self.lock_watcher = lock_watcher
         self.admin_ids = admin_ids
-        logger.info(f"LockMiddleware инициализирован. Админы: {admin_ids}")
+        logger.info("LockMiddleware инициализирован. Админы: %s", admin_ids)
     
     async def __call__(
         self,
@@ -34,49 +46,53 @@ class LockMiddleware(BaseMiddleware):
         user_id = None
         event_type = type(event).__name__
         
-        logger.info(f"LockMiddleware: получено событие {event_type}")
+        logger.debug("LockMiddleware: получено событие %s", event_type)
         
         # Извлекаем пользователя из разных типов событий внутри Update
         try:
             if hasattr(event, 'message') and event.message and hasattr(event.message, 'from_user') and event.message.from_user:
                 user_id = event.message.from_user.id
-                logger.info(f"LockMiddleware: найден user_id {user_id} в event.message.from_user")
+                logger.debug("LockMiddleware: найден user_id %s в event.message.from_user", user_id)
             elif hasattr(event, 'callback_query') and event.callback_query and hasattr(event.callback_query, 'from_user') and event.callback_query.from_user:
                 user_id = event.callback_query.from_user.id
-                logger.info(f"LockMiddleware: найден user_id {user_id} в event.callback_query.from_user")
+                logger.debug("LockMiddleware: найден user_id %s в event.callback_query.from_user", user_id)
             elif hasattr(event, 'inline_query') and event.inline_query and hasattr(event.inline_query, 'from_user') and event.inline_query.from_user:
                 user_id = event.inline_query.from_user.id
-                logger.info(f"LockMiddleware: найден user_id {user_id} в event.inline_query.from_user")
+                logger.debug("LockMiddleware: найден user_id %s в event.inline_query.from_user", user_id)
             elif hasattr(event, 'chosen_inline_result') and event.chosen_inline_result and hasattr(event.chosen_inline_result, 'from_user') and event.chosen_inline_result.from_user:
                 user_id = event.chosen_inline_result.from_user.id
-                logger.info(f"LockMiddleware: найден user_id {user_id} в event.chosen_inline_result.from_user")
+                logger.debug("LockMiddleware: найден user_id %s в event.chosen_inline_result.from_user", user_id)
             elif hasattr(event, 'from_user') and event.from_user:
                 user_id = event.from_user.id
-                logger.info(f"LockMiddleware: найден user_id {user_id} в event.from_user")
+                logger.debug("LockMiddleware: найден user_id %s в event.from_user", user_id)
             else:
-                logger.info(f"LockMiddleware: не удалось найти user_id в событии {event_type}")
+                logger.debug("LockMiddleware: не удалось найти user_id в событии %s", event_type)
         except Exception as e:
-            logger.error(f"LockMiddleware: ошибка при извлечении user_id: {e}")
+            logger.error("LockMiddleware: ошибка при извлечении user_id: %s", e)
         
-        logger.info(f"LockMiddleware: обработка {event_type}, пользователь: {user_id}")
+        logger.debug("LockMiddleware: обработка %s, пользователь: %s", event_type, user_id)
         
         # Если не удалось получить user_id, пропускаем (возможно системное событие)
         if user_id is None:
-            logger.info(f"LockMiddleware: не удалось получить user_id для события {event_type}, пропускаем")
+            logger.debug("LockMiddleware: не удалось получить user_id для события %s, пропускаем", event_type)
             return await handler(event, data)
         
         # Если пользователь админ, пропускаем проверку блокировки
         if user_id in self.admin_ids:
-            logger.info(f"LockMiddleware: пользователь {user_id} - админ, пропускаем проверку блокировки")
+            logger.debug("LockMiddleware: пользователь %s - админ, пропускаем проверку блокировки", user_id)
             return await handler(event, data)
         
         # Проверяем блокировку
         try:
-            is_locked = await self.lock_service.is_locked()
-            logger.info(f"LockMiddleware: состояние блокировки = {is_locked}")
+            # Состояние из памяти (обновляется через pub/sub), без похода в Redis
+            if self.lock_watcher is not None:
+                is_locked = self.lock_watcher.is_locked
+            else:
+                is_locked = await self.lock_service.is_locked()
+            logger.debug("LockMiddleware: состояние блокировки = %s", is_locked)
             
             if is_locked:
-                logger.warning(f"LockMiddleware: БЛОКИРОВКА АКТИВНА! Блокируем пользователя {user_id}")
+                logger.warning("LockMiddleware: БЛОКИРОВКА АКТИВНА! Блокируем пользователя %s", user_id)
                 
                 # Бот заблокирован, отправляем уведомление о технических работах
                 try:
@@ -88,46 +104,162 @@ class LockMiddleware(BaseMiddleware):
                             "Попробуйте воспользоваться ботом позже.\n\n"
                             "Приносим извинения за неудобства! 🙏"
                         )
-                        logger.warning(f"LockMiddleware: отправлено уведомление о тех. работах пользователю {user_id}")
+                        logger.warning("LockMiddleware: отправлено уведомление о тех. работах пользователю %s", user_id)
                     elif hasattr(event, 'callback_query') and event.callback_query:
                         await event.callback_query.answer(
                             "🔧 Проводятся технические работы. Попробуйте позже.",
                             show_alert=True
                         )
-                        logger.warning(f"LockMiddleware: отправлено callback уведомление о тех. работах пользователю {user_id}")
+                        logger.warning("LockMiddleware: отправлено callback уведомление о тех. работах пользователю %s", user_id)
                     elif hasattr(event, 'inline_query') and event.inline_query:
                         # Для inline запросов просто не отвечаем
-                        logger.warning(f"LockMiddleware: заблокирован inline запрос от пользователя {user_id}")
+                        logger.warning("LockMiddleware: заблокирован inline запрос от пользователя %s", user_id)
                     else:
-                        logger.warning(f"LockMiddleware: неподдерживаемый тип события {event_type} для отправки уведомления")
+                        logger.warning("LockMiddleware: неподдерживаемый тип события %s для отправки уведомления", event_type)
                         
                 except Exception as e:
-                    logger.error(f"LockMiddleware: ошибка при отправке уведомления о блокировке пользователю {user_id}: {e}")
+                    logger.error("LockMiddleware: ошибка при отправке уведомления о блокировке пользователю %s: %s", user_id, e)
                 
                 # Не передаем управление дальше
-                logger.warning(f"LockMiddleware: БЛОКИРУЕМ дальнейшую обработку для пользователя {user_id}")
+                logger.warning("LockMiddleware: БЛОКИРУЕМ дальнейшую обработку для пользователя %s", user_id)
                 return None
             
         except Exception as e:
-            logger.error(f"LockMiddleware: ошибка при проверке блокировки для пользователя {user_id}: {e}")
+            logger.error("LockMiddleware: ошибка при проверке блокировки для пользователя %s: %s", user_id, e)
             # В случае ошибки Redis - пропускаем запрос дальше (fail-safe)
             logger.warning("LockMiddleware: из-за ошибки Redis пропускаем запрос дальше")
         
         # Бот не заблокирован, продолжаем обработку
-        logger.info(f"LockMiddleware: блокировка неактивна, передаем управление дальше для пользователя {user_id}")
+        logger.debug("LockMiddleware: блокировка неактивна, передаем управление дальше для пользователя %s", user_id)
         return await handler(event, data)
 
 
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Контроль нагрузки для всех апдейтов.
+
+    - апдейты одного пользователя обрабатываются строго по очереди
+      (двойное нажатие не запускает два параллельных обработчика), и у одного
+      пользователя в работе и в очереди не больше max_per_user апдейтов;
+    - одновременно обрабатывается не больше max_concurrency апдейтов;
+    - если очередь ожидания переполнена или ожидание дольше queue_timeout,
+      апдейт отбрасывается с коротким ответом "попробуйте позже".
+    """
+    
+    SHED_TEXT = "⏳ Сейчас много запросов, попробуйте еще раз через пару секунд."
+    
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, max_per_user: int = 3):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_user = max_per_user
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._user_locks = KeyedLock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.shed_per_user = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Счетчики для мониторинга."""
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "shed_per_user": self.shed_per_user,
+            "serialized_users": len(self._user_locks),
+        }
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user_id = extract_user_id(event) if isinstance(event, Update) else None
+        if user_id is None:
+            return await self._admit(handler, event, data)
+        
+        # Очередь одного пользователя ограничена: иначе частые нажатия копят
+        # ждущие апдейты, которые держат память и задачи, пока не истечет таймаут
+        if self._user_locks.pending(user_id) >= self.max_per_user:
+            self.shed_per_user += 1
+            return await self._shed(event, f"у пользователя {user_id} уже {self.max_per_user} апдейтов")
+        
+        # Ожидание своей очереди пользователем не занимает общий слот
+        async with self._user_locks.acquire(user_id):
+            return await self._admit(handler, event, data)
+    
+    async def _admit(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                return await self._shed(event, "очередь переполнена")
+            
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                return await self._shed(event, "истекло время ожидания")
+            finally:
+                self.waiting -= 1
+        
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+    
+    async def _shed(self, event: TelegramObject, reason: str) -> None:
+        self.shed += 1
+        logger.warning(
+            "AdmissionMiddleware: апдейт отброшен (%s), в работе %s, в очереди %s",
+            reason, self.in_flight, self.waiting,
+        )
+        try:
+            if getattr(event, "callback_query", None):
+                await event.callback_query.answer(self.SHED_TEXT)
+            elif getattr(event, "message", None):
+                await event.message.answer(self.SHED_TEXT)
+        except Exception as e:
+            logger.error("AdmissionMiddleware: не удалось ответить на отброшенный апдейт: %s", e)
+        return None
+
+
 class DependencyMiddleware(BaseMiddleware):
     """Middleware для внедрения зависимостей в обработчики."""
     
     def __init__(
         self,
         database: Database,
-        sheets_manager: GoogleSheetsManager
+        sheets_manager: Optional[AsyncSheetsManager],
+        redis_client: redis.Redis,
+        profile_cache: Optional[UserProfileCache] = None,
+        outbox_dispatcher: Optional[SheetsOutboxDispatcher] = None,
+        event_catalog: Optional[EventCatalogCache] = None,
+        seat_counters: Optional[SeatCounters] = None,
     ):
         self.database = database
         self.sheets_manager = sheets_manager
+        self.redis_client = redis_client
+        self.profile_cache = profile_cache
+        self.event_catalog = event_catalog
+        self.seat_counters = seat_counters
+        # После commit с записями в outbox диспетчер запускается сразу, не дожидаясь опроса
+        self.on_outbox_commit = outbox_dispatcher.wake if outbox_dispatcher is not None else None
     
     async def __call__(
         self,
@@ -135,17 +267,44 @@ class DependencyMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async with self.database.get_session() as session:
-            # Создаем сервисы
-            user_service = UserService(session, self.sheets_manager)
-            event_service = EventService(session, self.sheets_manager)
-            passport_service = PassportService(session, self.sheets_manager)
-            
-            # Добавляем в данные
-            data["session"] = session
-            data["user_service"] = user_service
-            data["event_service"] = event_service
-            data["sheets_manager"] = self.sheets_manager
-            data["passport_service"] = passport_service
+        # Создаем контекстный логгер для каждого запроса
+        event_type = type(event).__name__
+        from_user = getattr(event, "from_user", None)
+        user_id = from_user.id if from_user else "unknown"
+        
+        context_logger = ContextLogger(
+            get_logger("app.middleware"),
+            {"event": event_type, "user_id": user_id}
+        )
+        context_logger.debug("Обработка события: %s", event_type)
+        
+        # Сессия и сервисы создаются лениво, при первом обращении из обработчика или геттера
+        container = ServiceContainer(
+            self.database, self.profile_cache, self.on_outbox_commit, self.event_catalog, self.seat_counters
+        )
+        data["container"] = container
+        data["session"] = container.lazy("session")
+        data["user_service"] = container.lazy("user_service")
+        data["event_service"] = container.lazy("event_service")
+        data["referral_service"] = container.lazy("referral_service")
+        data["passport_service"] = container.lazy("passport_service")
+        data["database"] = self.database
+        data["sheets_manager"] = self.sheets_manager
+        data["redis_client"] = self.redis_client
+        data["logger"] = context_logger
+        
+        # Состояние диалога, в котором пришло событие (контекст выставляет aiogram-dialog)
+        dialog_context = data.get("aiogd_context")
+        state = dialog_context.state.state if dialog_context is not None else "none"
+        
+        with track_update(event_type, state):
+            try:
+                result = await handler(event, data)
+            except Exception as e:
+                context_logger.error("Ошибка при обработке события %s: %s", event_type, e)
+                await container.close(e)
+                raise
             
-            return await handler(event, data)
\ No newline at end of file
+            await container.close()
+        context_logger.debug("Событие %s обработано успешно", event_type)
+        return result
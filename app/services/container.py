@@ -0,0 +1,152 @@
+"""Ленивый контейнер зависимостей в рамках одного апдейта."""
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import Database
+from app.database.repositories.outbox_repository import OUTBOX_WRITTEN_KEY
+from app.database.repositories.user_repository import PROFILE_INVALIDATIONS_KEY
+from app.infrastructure.cache.event_catalog import EventCatalogCache
+from app.infrastructure.cache.seat_counters import SEAT_DELTAS_KEY, SeatCounters
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+from app.services.event_service import EventService
+from app.services.passport_service import PassportService
+from app.services.referral_service import ReferralService
+from app.services.user_service import UserService
+
+
+class ServiceContainer:
+    """
+    Контейнер сервисов, живущий ровно один апдейт.
+
+    Сессия и сервисы создаются при первом обращении, поэтому апдейты,
+    которым не нужна база (FAQ, /menu), не берут соединение из пула.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        profile_cache: Optional[UserProfileCache] = None,
+        on_outbox_commit: Optional[Callable[[], None]] = None,
+        event_catalog: Optional[EventCatalogCache] = None,
+        seat_counters: Optional[SeatCounters] = None,
+    ):
+        self._database = database
+        self._profile_cache = profile_cache
+        self._on_outbox_commit = on_outbox_commit
+        self._event_catalog = event_catalog
+        self._seat_counters = seat_counters
+        self._session: Optional[AsyncSession] = None
+        self._services: Dict[str, Any] = {}
+
+    @property
+    def has_session(self) -> bool:
+        """Была ли открыта сессия за время апдейта."""
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        """Сессия базы данных (открывается при первом обращении)."""
+        if self._session is None:
+            self._session = self._database.session_factory()
+        return self._session
+
+    @property
+    def user_service(self) -> UserService:
+        return self._get(
+            "user_service",
+            lambda: UserService(self.session, self._profile_cache),
+        )
+
+    @property
+    def event_service(self) -> EventService:
+        return self._get(
+            "event_service",
+            lambda: EventService(self.session, self._event_catalog, self._seat_counters),
+        )
+
+    @property
+    def referral_service(self) -> ReferralService:
+        return self._get(
+            "referral_service",
+            lambda: ReferralService(self.session, self._profile_cache, self._event_catalog),
+        )
+
+    @property
+    def passport_service(self) -> PassportService:
+        return self._get("passport_service", lambda: PassportService(self.session))
+
+    def lazy(self, name: str) -> "LazyDependency":
+        """Вернуть прокси для атрибута контейнера, пригодный для data[...]."""
+        return LazyDependency(self, name)
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        """Зафиксировать или откатить транзакцию, если сессия открывалась."""
+        if self._session is None:
+            return
+
+        session = self._session
+        self._session = None
+        self._services.clear()
+        try:
+            if error is None:
+                await session.commit()
+                await self._invalidate_touched_profiles(session)
+                await self._apply_seat_deltas(session)
+                if session.info.pop(OUTBOX_WRITTEN_KEY, False) and self._on_outbox_commit is not None:
+                    self._on_outbox_commit()
+            else:
+                await session.rollback()
+                await self._invalidate_touched_profiles(session)
+        except Exception:
+            await session.rollback()
+            await self._invalidate_touched_profiles(session)
+            raise
+        finally:
+            await session.close()
+
+    async def _invalidate_touched_profiles(self, session: AsyncSession) -> None:
+        # И после отката: параллельный запрос мог закэшировать незафиксированное состояние
+        telegram_ids = session.info.pop(PROFILE_INVALIDATIONS_KEY, None)
+        if telegram_ids and self._profile_cache is not None:
+            await self._profile_cache.invalidate_many(telegram_ids)
+
+    async def _apply_seat_deltas(self, session: AsyncSession) -> None:
+        deltas = session.info.pop(SEAT_DELTAS_KEY, None)
+        if deltas and self._seat_counters is not None:
+            await self._seat_counters.apply(deltas)
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        service = self._services.get(name)
+        if service is None:
+            service = factory()
+            self._services[name] = service
+        return service
+
+
+class LazyDependency:
+    """Прокси, который разрешает зависимость из контейнера при первом обращении к атрибуту."""
+
+    __slots__ = ("_container", "_name", "_target")
+
+    def __init__(self, container: ServiceContainer, name: str):
+        object.__setattr__(self, "_container", container)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self) -> Any:
+        target = object.__getattribute__(self, "_target")
+        if target is None:
+            container = object.__getattribute__(self, "_container")
+            target = getattr(container, object.__getattribute__(self, "_name"))
+            object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._resolve(), item)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        setattr(self._resolve(), key, value)
+
+    def __repr__(self) -> str:
+        return f"<LazyDependency {object.__getattribute__(self, '_name')}>"
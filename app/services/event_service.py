@@ -1,39 +1,105 @@
 """Сервис для работы с мероприятиями и регистрациями."""
-from typing import List, Optional, Tuple
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.models.registration import Event, EventRegistration
+from app.database.models.registration import EventRegistration
 from app.database.models.user import User
 from app.database.repositories.event_repository import EventRepository, RegistrationRepository
-from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
+from app.database.repositories.outbox_repository import SheetsOutboxRepository
+from app.infrastructure.cache.event_catalog import CatalogEvent, EventCatalog, EventCatalogCache
+from app.infrastructure.cache.seat_counters import SeatCounters
+from app.infrastructure.cache.user_profile_cache import UserProfile
+
+
+@dataclass(frozen=True)
+class EventBoardItem:
+    """Мероприятие на доске регистрации."""
+    event: CatalogEvent
+    registered_count: int
+    is_registered: bool
+
+    @property
+    def available_spots(self) -> Optional[int]:
+        """Свободных мест (None - без ограничения)."""
+        if not self.event.max_participants:
+            return None
+        return self.event.max_participants - self.registered_count
+
+    @property
+    def is_full(self) -> bool:
+        return bool(self.event.max_participants) and self.registered_count >= self.event.max_participants
+
+
+@dataclass(frozen=True)
+class EventBoard:
+    """Все мероприятия с числом участников и регистрациями пользователя."""
+    items: Tuple[EventBoardItem, ...]
+    registered_event_ids: FrozenSet[int]
+
+
+@dataclass(frozen=True)
+class SelectionResult:
+    """Итог применения выбора мероприятий."""
+    added: Tuple[CatalogEvent, ...]
+    removed: Tuple[CatalogEvent, ...]
+    errors: Tuple[str, ...]
+
+    @property
+    def changed(self) -> int:
+        return len(self.added) + len(self.removed)
 
 
 class EventService:
     """Сервис для работы с мероприятиями и регистрациями."""
     
-    def __init__(self, session: AsyncSession, sheets_manager: GoogleSheetsManager):
+    def __init__(
+        self,
+        session: AsyncSession,
+        event_catalog: Optional[EventCatalogCache] = None,
+        seat_counters: Optional[SeatCounters] = None,
+    ):
         self.event_repository = EventRepository(session)
         self.registration_repository = RegistrationRepository(session)
-        self.sheets_manager = sheets_manager
+        self.outbox_repository = SheetsOutboxRepository(session)
+        self.event_catalog = event_catalog
+        self.seat_counters = seat_counters
+    
+    async def get_catalog(self) -> EventCatalog:
+        """Снимок каталога мероприятий (из памяти процесса, если кэш подключен)."""
+        if self.event_catalog is None:
+            return EventCatalog.from_events(await self.event_repository.get_all_events())
+        return await self.event_catalog.get(self.event_repository.get_all_events)
     
-    async def get_all_events(self) -> List[Event]:
+    async def get_all_events(self) -> List[CatalogEvent]:
         """Получить все мероприятия в правильном порядке."""
-        events = await self.event_repository.get_all_events()
-        
-        # Определяем порядок сортировки согласно описанию
-        order_map = {
-            "plenary_session": 1,      # Центральная пленарная сессия
-            "vtb_speech": 2,           # Выступление Андрея Костина  
-            "career_workshop": 3,      # Кадры для будущего
-            "small_cities": 4,         # Возрождение малых городов
-            "smart_cities": 5,         # Нейроны мегаполисов
-        }
-        
-        # Сортируем по кастомному порядку используя sheet_name
-        events.sort(key=lambda event: order_map.get(event.sheet_name, 999))
-        
-        return events
+        return list((await self.get_catalog()).events)
+    
+    async def get_event_board(self, user_id: Optional[int] = None) -> EventBoard:
+        """
+        Доска регистрации: мероприятия из каталога в правильном порядке,
+        число участников каждого и мероприятия, на которые записан пользователь.
+        Число участников берется из счетчиков Redis, а если какого-то нет -
+        одним запросом с GROUP BY.
+        """
+        catalog = await self.get_catalog()
+        seats = await self._get_seat_counters(event.id for event in catalog.events)
+        if None not in seats.values():
+            registered = set()
+            if user_id is not None:
+                registered = set(await self.registration_repository.get_user_event_ids(user_id))
+            counts = {event_id: (count, event_id in registered) for event_id, count in seats.items()}
+        else:
+            counts = await self.registration_repository.get_counts_by_event(user_id)
+        items = tuple(
+            EventBoardItem(event, *counts.get(event.id, (0, False)))
+            for event in catalog.events
+        )
+        return EventBoard(
+            items=items,
+            registered_event_ids=frozenset(item.event.id for item in items if item.is_registered),
+        )
     
     async def get_user_registrations(self, user_id: int) -> List[EventRegistration]:
         """Получить регистрации пользователя."""
@@ -49,7 +115,7 @@ class EventService:
             return False, "Вы уже зарегистрированы на это мероприятие"
         
         # Получаем мероприятие
-        event = await self.event_repository.get_by_id(event_id)
+        event = await self.get_event_by_id(event_id)
         if not event:
             return False, "Мероприятие не найдено"
         
@@ -58,7 +124,7 @@ class EventService:
             if await self.registration_repository.has_exclusive_registration(user_id):
                 return False, "Вы уже зарегистрированы на одно из взаимоисключающих мероприятий этого времени"
         
-        # Проверяем лимит участников
+        # Проверяем лимит участников по базе: счетчики Redis - только подсказка для отображения
         if event.max_participants:
             current_count = await self.registration_repository.get_event_participants_count(event_id)
             if current_count >= event.max_participants:
@@ -75,19 +141,24 @@ class EventService:
         if not can_register:
             return False, reason
         
+        # Мероприятие нужно для Google Sheets: без него регистрацию не создаем
+        event = await self.get_event_by_id(event_id)
+        if event is None:
+            return False, "Мероприятие не найдено"
+        
         try:
-            # Регистрируем в базе данных
-            registration = await self.registration_repository.register_user(user.id, event_id)
+            # Регистрируем в базе данных: место занимается атомарно, проверка выше - только предварительная
+            registration_id = await self.registration_repository.register_user(user.id, event_id)
+            if registration_id is None:
+                return False, "Достигнуто максимальное количество участников"
             
-            # Получаем мероприятие для добавления в Google Sheets
-            event = await self.event_repository.get_by_id(event_id)
-            if event:
-                # Добавляем в Google Sheets
-                self.sheets_manager.add_user_to_event_sheet(
-                    user=user,
-                    event_name=event.name,
-                    sheet_name=event.sheet_name
-                )
+            # Синхронизация с Google Sheets - через outbox в той же транзакции
+            await self.outbox_repository.add_user_to_event_sheet(
+                user=UserProfile.from_user(user),
+                event_name=event.name,
+                sheet_name=event.sheet_name,
+                registration_id=registration_id
+            )
             
             return True, f"Вы успешно зарегистрированы на мероприятие: {event.name}"
             
@@ -99,21 +170,24 @@ class EventService:
         Отменить регистрацию пользователя на мероприятие.
         Возвращает (успешно_ли, сообщение)
         """
-        if not await self.registration_repository.is_user_registered(user.id, event_id):
+        registration = await self.registration_repository.get_registration(user.id, event_id)
+        if registration is None:
             return False, "Вы не зарегистрированы на это мероприятие"
+        registration_id = registration.id
         
         try:
             # Получаем мероприятие
-            event = await self.event_repository.get_by_id(event_id)
+            event = await self.get_event_by_id(event_id)
             
             # Отменяем регистрацию в базе данных
             success = await self.registration_repository.unregister_user(user.id, event_id)
             
             if success and event:
-                # Удаляем из Google Sheets
-                self.sheets_manager.remove_user_from_event_sheet(
-                    user=user,
-                    sheet_name=event.sheet_name
+                # Удаление из Google Sheets - через outbox в той же транзакции
+                await self.outbox_repository.remove_user_from_event_sheet(
+                    user=UserProfile.from_user(user),
+                    sheet_name=event.sheet_name,
+                    registration_id=registration_id
                 )
                 return True, f"Регистрация на мероприятие '{event.name}' отменена"
             else:
@@ -122,10 +196,70 @@ class EventService:
         except Exception as e:
             return False, f"Ошибка при отмене регистрации: {str(e)}"
     
-    async def get_event_by_id(self, event_id: int) -> Optional[Event]:
+    async def apply_selection(self, user: User, desired_ids: Iterable[int]) -> SelectionResult:
+        """
+        Привести регистрации пользователя к выбранному набору мероприятий.
+
+        Весь набор проверяется по одному снимку (каталог, текущие регистрации,
+        занятые места из events.seats_taken); если проверка не прошла, ничего
+        не меняется. Счетчики Redis здесь не используются: они могут
+        расходиться с базой и годятся только для отображения. Изменения
+        применяются одним DELETE и одним INSERT ... ON CONFLICT DO NOTHING,
+        операции для Google Sheets пишутся в outbox одним INSERT. Место,
+        занятое параллельно с проверкой, попадает в errors, остальное
+        сохраняется.
+        """
+        catalog = await self.get_catalog()
+        desired = set(desired_ids)
+        errors = [f"Мероприятие с ID {event_id} не найдено" for event_id in sorted(desired) if catalog.get(event_id) is None]
+        current = set(await self.registration_repository.get_user_event_ids(user.id))
+        to_add = [event for event in catalog.events if event.id in desired and event.id not in current]
+        to_remove = [event for event in catalog.events if event.id in current and event.id not in desired]
+        
+        if sum(1 for event in catalog.exclusive if event.id in desired) > 1:
+            errors.append("Можно выбрать только одно из взаимоисключающих мероприятий этого времени")
+        
+        capped = [event for event in to_add if event.max_participants]
+        seats = await self.registration_repository.get_seat_counts() if capped else {}
+        for event in capped:
+            if seats.get(event.id, 0) >= event.max_participants:
+                errors.append(f"🔒 Мероприятие '{event.name}' заполнено (лимит: {event.max_participants})")
+        
+        if errors:
+            return SelectionResult((), (), tuple(errors))
+        
+        removed = await self.registration_repository.unregister_user_many(user.id, [event.id for event in to_remove])
+        added = await self.registration_repository.register_user_many(user.id, [event.id for event in to_add])
+        
+        for event in to_add:
+            if event.id not in added and event.max_participants:
+                errors.append(f"🔒 Мероприятие '{event.name}' заполнено (лимит: {event.max_participants})")
+        
+        # Синхронизация с Google Sheets - через outbox в той же транзакции
+        await self.outbox_repository.sync_event_registrations(
+            UserProfile.from_user(user),
+            added=[(event.name, event.sheet_name, added[event.id]) for event in to_add if event.id in added],
+            removed=[(event.sheet_name, removed[event.id]) for event in to_remove if event.id in removed],
+        )
+        return SelectionResult(
+            added=tuple(event for event in to_add if event.id in added),
+            removed=tuple(event for event in to_remove if event.id in removed),
+            errors=tuple(errors),
+        )
+    
+    async def get_event_by_id(self, event_id: int) -> Optional[CatalogEvent]:
         """Получить мероприятие по ID."""
-        return await self.event_repository.get_by_id(event_id)
+        return (await self.get_catalog()).get(event_id)
     
     async def get_registered_count(self, event_id: int) -> int:
-        """Получить количество зарегистрированных на мероприятие."""
-        return await self.registration_repository.get_event_participants_count(event_id)
\ No newline at end of file
+        """Количество зарегистрированных для отображения (из счетчика, если он есть; для проверки мест не годится)."""
+        count = (await self._get_seat_counters([event_id])).get(event_id)
+        if count is None:
+            count = await self.registration_repository.get_event_participants_count(event_id)
+        return count
+    
+    async def _get_seat_counters(self, event_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+        """Счетчики мест из Redis; None - счетчика нет (или счетчики не подключены)."""
+        if self.seat_counters is None:
+            return dict.fromkeys(event_ids)
+        return await self.seat_counters.get_many(event_ids)
\ No newline at end of file
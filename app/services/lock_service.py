@@ -1,4 +1,7 @@
 """Сервис для управления блокировкой бота."""
+import asyncio
+import contextlib
+
 import redis.asyncio as redis
 from typing import Optional
 
@@ -11,6 +14,7 @@ class LockService:
     """Сервис для управления режимом блокировки бота."""
     
     LOCK_KEY = "bot:lock_mode"
+    CHANNEL = "bot:lock_mode:changes"
     
     def __init__(self, redis_client: redis.Redis):
         self.redis = redis_client
@@ -20,10 +24,10 @@ class LockService:
         try:
             result = await self.redis.get(self.LOCK_KEY)
             is_locked = result == "true"
-            logger.debug(f"Проверка блокировки: ключ={self.LOCK_KEY}, значение={result}, результат={is_locked}")
+            logger.debug("Проверка блокировки: ключ=%s, значение=%s, результат=%s", self.LOCK_KEY, result, is_locked)
             return is_locked
         except Exception as e:
-            logger.error(f"Ошибка при проверке блокировки: {e}")
+            logger.error("Ошибка при проверке блокировки: %s", e)
             return False
     
     async def set_lock(self, locked: bool) -> bool:
@@ -31,10 +35,15 @@ class LockService:
         try:
             value = "true" if locked else "false"
             await self.redis.set(self.LOCK_KEY, value)
-            logger.info(f"Режим блокировки {'включен' if locked else 'выключен'} (установлено значение: {value})")
+            # Оповещаем все процессы бота, чтобы они обновили состояние в памяти
+            receivers = await self.redis.publish(self.CHANNEL, value)
+            logger.info(
+                "Режим блокировки %s (установлено значение: %s, получателей: %s)",
+                "включен" if locked else "выключен", value, receivers,
+            )
             return True
         except Exception as e:
-            logger.error(f"Ошибка при установке блокировки: {e}")
+            logger.error("Ошибка при установке блокировки: %s", e)
             return False
     
     async def toggle_lock(self) -> tuple[bool, bool]:
@@ -45,5 +54,77 @@ class LockService:
             success = await self.set_lock(new_state)
             return success, new_state
         except Exception as e:
-            logger.error(f"Ошибка при переключении блокировки: {e}")
-            return False, False
\ No newline at end of file
+            logger.error("Ошибка при переключении блокировки: %s", e)
+            return False, False
+
+
+class LockStateWatcher:
+    """
+    Держит состояние блокировки в памяти процесса.
+
+    Изменения приходят через Redis pub/sub (LockService.set_lock публикует их),
+    а периодический опрос страхует от пропущенных сообщений при переподключении.
+    """
+    
+    def __init__(self, redis_client: redis.Redis, poll_interval: float = 30.0):
+        self.redis = redis_client
+        self.lock_service = LockService(redis_client)
+        self.poll_interval = poll_interval
+        self._locked = False
+        self._tasks: list[asyncio.Task] = []
+    
+    @property
+    def is_locked(self) -> bool:
+        """Текущее состояние блокировки без обращения к Redis."""
+        return self._locked
+    
+    async def start(self) -> None:
+        """Загрузить начальное состояние и запустить подписку и опрос."""
+        self._locked = await self.lock_service.is_locked()
+        self._tasks = [
+            asyncio.create_task(self._listen(), name="lock-watcher-listen"),
+            asyncio.create_task(self._poll(), name="lock-watcher-poll"),
+        ]
+        logger.info("LockStateWatcher запущен, блокировка: %s", self._locked)
+    
+    async def stop(self) -> None:
+        """Остановить фоновые задачи."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+    
+    def _apply(self, value: Optional[str]) -> None:
+        locked = value == "true"
+        if locked != self._locked:
+            logger.info("Состояние блокировки изменено: %s -> %s", self._locked, locked)
+        self._locked = locked
+    
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(LockService.CHANNEL)
+                # После (пере)подписки перечитываем ключ, чтобы не пропустить изменение
+                self._apply(await self.redis.get(LockService.LOCK_KEY))
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка подписки на изменения блокировки: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+    
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self._apply(await self.redis.get(LockService.LOCK_KEY))
+            except Exception as e:
+                logger.error("Ошибка периодической проверки блокировки: %s", e)
@@ -6,15 +6,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models.passport import PassportData
 from app.database.models.user import User
 from app.database.repositories.passport_repository import PassportRepository
-from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
+from app.infrastructure.cache.user_profile_cache import UserProfile
+from app.database.repositories.outbox_repository import SheetsOutboxRepository
 
 
 class PassportService:
     """Сервисный слой для сохранения и синхронизации паспортных данных."""
 
-    def __init__(self, session: AsyncSession, sheets_manager: Optional[GoogleSheetsManager]):
+    def __init__(self, session: AsyncSession):
         self._repository = PassportRepository(session)
-        self._sheets_manager = sheets_manager
+        self._outbox_repository = SheetsOutboxRepository(session)
 
     async def get_user_passport_data(self, user_id: int) -> Optional[PassportData]:
         """Вернуть сохранённые паспортные данные пользователя."""
@@ -39,13 +40,12 @@ class PassportService:
             car_number=prepared_car_number,
         )
 
-        # Синхронизация с листом "Пропуски" не является критичной, поэтому не бросаем исключение
-        if self._sheets_manager:
-            self._sheets_manager.upsert_passport_entry(
-                user=user,
-                full_name=passport_data.full_name,
-                passport_number=passport_data.passport_number,
-                car_number=passport_data.car_number,
-            )
+        # Лист "Пропуски" обновится из outbox после commit, ответ пользователю его не ждет
+        await self._outbox_repository.upsert_passport_entry(
+            user=UserProfile.from_user(user),
+            full_name=passport_data.full_name,
+            passport_number=passport_data.passport_number,
+            car_number=passport_data.car_number,
+        )
 
         return passport_data
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from aiogram import Bot
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,6 +11,8 @@ from app.database.models.registration import Event
 from app.database.models.user import User
 from app.database.repositories.event_repository import EventRepository
 from app.database.repositories.user_repository import UserRepository
+from app.infrastructure.cache.event_catalog import CatalogEvent, EventCatalogCache
+from app.infrastructure.cache.user_profile_cache import UserProfile, UserProfileCache
 
 
 REFERRAL_EVENT_KEYWORDS = ("мордашов", "mordashov", "костин", "kostin")
@@ -36,10 +38,16 @@ class ReferralStats:
 class ReferralService:
     """Сервис для управления реферальной программой."""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        profile_cache: Optional[UserProfileCache] = None,
+        event_catalog: Optional[EventCatalogCache] = None,
+    ):
         self.session = session
-        self.user_repository = UserRepository(session)
+        self.user_repository = UserRepository(session, profile_cache)
         self.event_repository = EventRepository(session)
+        self.event_catalog = event_catalog
         self._bot_username_cache: Optional[str] = None
 
     async def ensure_user_has_referral_code(self, user: User) -> str:
@@ -63,13 +71,14 @@ class ReferralService:
         await self.user_repository.set_referrer(user, referrer)
         await self.session.flush()
 
-    async def get_invite_link(self, bot: Bot, user: User) -> str:
+    async def get_invite_link(self, bot: Bot, user: User | UserProfile) -> str:
         """Получить персональную ссылку на бота для приглашений."""
-        code = await self.ensure_user_has_referral_code(user)
+        # Снимок профиля из кэша уже содержит код; дозаполняем только ORM-пользователя без кода
+        code = user.referral_code or await self.ensure_user_has_referral_code(user)
         username = await self._get_bot_username(bot)
         return f"https://t.me/{username}?start={code}"
 
-    async def get_stats(self, user: User, top_limit: int = 5) -> ReferralStats:
+    async def get_stats(self, user: User | UserProfile, top_limit: int = 5) -> ReferralStats:
         """Получить статистику по реферальной программе для пользователя."""
         target_event_ids = await self._get_target_event_ids()
         leaderboard = await self.user_repository.get_referral_leaderboard(target_event_ids)
@@ -102,7 +111,7 @@ class ReferralService:
             leaders=leaders,
         )
 
-    def should_notify_for_event(self, event: Event) -> bool:
+    def should_notify_for_event(self, event: Union[Event, CatalogEvent]) -> bool:
         """Определить, активирует ли мероприятие рассылку о реферальной программе."""
         return self._is_target_event(event)
 
@@ -128,10 +137,13 @@ class ReferralService:
         return self._bot_username_cache
 
     async def _get_target_event_ids(self) -> List[int]:
-        events = await self.event_repository.get_all_events()
+        if self.event_catalog is not None:
+            events = (await self.event_catalog.get(self.event_repository.get_all_events)).events
+        else:
+            events = await self.event_repository.get_all_events()
         return [event.id for event in events if self._is_target_event(event)]
 
-    def _is_target_event(self, event: Event) -> bool:
+    def _is_target_event(self, event: Union[Event, CatalogEvent]) -> bool:
         haystacks = [
             (event.name or "").lower(),
             (event.description or "").lower(),
@@ -4,16 +4,22 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models.user import User
+from app.database.repositories.outbox_repository import SheetsOutboxRepository
 from app.database.repositories.user_repository import UserRepository
-from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
+from app.infrastructure.cache.user_profile_cache import UserProfile, UserProfileCache
 
 
 class UserService:
     """Сервис для работы с пользователями."""
     
-    def __init__(self, session: AsyncSession, sheets_manager: Optional[GoogleSheetsManager] = None):
-        self.repository = UserRepository(session)
-        self.sheets_manager = sheets_manager
+    def __init__(
+        self,
+        session: AsyncSession,
+        profile_cache: Optional[UserProfileCache] = None,
+    ):
+        self.repository = UserRepository(session, profile_cache)
+        self.outbox_repository = SheetsOutboxRepository(session)
+        self.profile_cache = profile_cache
     
     async def get_or_create_user(
         self,
@@ -50,12 +56,30 @@ class UserService:
                 workplace=workplace
             )
             
-            # Добавляем в Google Sheets на общий лист
-            if self.sheets_manager:
-                self.sheets_manager.add_user_to_general_sheet(user)
+            # Добавляем в Google Sheets на общий лист через outbox (в той же транзакции)
+            await self.outbox_repository.add_user_to_general_sheet(UserProfile.from_user(user))
         
         return user
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Получить пользователя по telegram_id."""
-        return await self.repository.get_by_telegram_id(telegram_id)
\ No newline at end of file
+        return await self.repository.get_by_telegram_id(telegram_id)
+    
+    async def get_user_profile(self, telegram_id: int) -> Optional[UserProfile]:
+        """
+        Получить снимок профиля пользователя для экранов только на чтение.
+        Сначала смотрит в межзапросный кэш, при промахе читает из БД.
+        """
+        if self.profile_cache is not None:
+            profile = await self.profile_cache.get(telegram_id)
+            if profile is not None:
+                return profile
+        
+        user = await self.repository.get_by_telegram_id(telegram_id)
+        if user is None:
+            return None
+        
+        profile = UserProfile.from_user(user)
+        if self.profile_cache is not None:
+            await self.profile_cache.set(profile)
+        return profile
@@ -0,0 +1,40 @@
+"""Асинхронные блокировки по ключу (например, по user_id)."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class KeyedLock:
+    """Набор asyncio.Lock по ключам; блокировка удаляется, когда ее больше никто не ждет."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def is_locked(self, key: Hashable) -> bool:
+        """Занят ли ключ прямо сейчас."""
+        lock = self._locks.get(key)
+        return lock is not None and lock.locked()
+
+    def pending(self, key: Hashable) -> int:
+        """Сколько задач держат или ждут блокировку ключа."""
+        return self._waiters.get(key, 0)
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        """Захватить блокировку ключа на время блока async with."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                del self._locks[key]
@@ -1,73 +1,135 @@
 """Конфигурация логирования для бота."""
+import atexit
 import logging
-import os
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from typing import Dict, Optional
 
+# Слушатель очереди логов: запись на диск идет в отдельном потоке, а не в event loop
+_listener: Optional[QueueListener] = None
 
-def setup_logging():
+
+class DailyFileHandler(logging.FileHandler):
+    """Файловый обработчик, который переключается на новый файл при смене даты."""
+
+    def __init__(self, directory: Path, prefix: str, encoding: str = "utf-8"):
+        self.directory = directory
+        self.prefix = prefix
+        self.current_date = datetime.now().strftime("%Y-%m-%d")
+        super().__init__(self._build_path(self.current_date), encoding=encoding, delay=True)
+
+    def _build_path(self, date: str) -> Path:
+        return self.directory / f"{self.prefix}_{date}.log"
+
+    def emit(self, record: logging.LogRecord) -> None:
+        record_date = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d")
+        if record_date != self.current_date:
+            # Новый день - закрываем старый файл, следующий emit откроет новый
+            self.current_date = record_date
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = str(self._build_path(record_date).absolute())
+        super().emit(record)
+
+
+def setup_logging(level: str = "INFO", logger_levels: Optional[Dict[str, str]] = None):
     """Настройка системы логирования с разделением по дням и категориям."""
+    global _listener
+
     # Создаем директории для логов
     logs_dir = Path("logs")
     errors_dir = logs_dir / "errors"
     general_dir = logs_dir / "general"
-    
+
     for directory in [logs_dir, errors_dir, general_dir]:
         directory.mkdir(exist_ok=True)
-    
-    # Получаем текущую дату для имени файла
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    
-    # Файлы логов
-    error_log_file = errors_dir / f"errors_{current_date}.log"
-    general_log_file = general_dir / f"general_{current_date}.log"
-    
-    # Очищаем предыдущие обработчики
+
+    # Останавливаем предыдущий конвейер и очищаем обработчики
+    shutdown_logging()
     logging.getLogger().handlers.clear()
-    
+
     # Создаем форматтер
     formatter = logging.Formatter(
         fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S"
     )
-    
-    # Настраиваем корневой логгер
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    
+
     # Консольный обработчик (только для INFO и выше)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
-    # Общий файловый обработчик (все уровни)
-    general_handler = logging.FileHandler(general_log_file, encoding="utf-8")
+
+    # Общий файловый обработчик (все уровни), файл меняется каждый день
+    general_handler = DailyFileHandler(general_dir, "general")
     general_handler.setLevel(logging.DEBUG)
     general_handler.setFormatter(formatter)
-    root_logger.addHandler(general_handler)
-    
+
     # Файловый обработчик для ошибок (только ERROR и CRITICAL)
-    error_handler = logging.FileHandler(error_log_file, encoding="utf-8")
+    error_handler = DailyFileHandler(errors_dir, "errors")
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    root_logger.addHandler(error_handler)
-    
-    # Настраиваем специальные логгеры для aiogram
-    aiogram_logger = logging.getLogger("aiogram")
-    aiogram_logger.setLevel(logging.INFO)
-    
-    # Логгер для диалогов
-    dialog_logger = logging.getLogger("aiogram_dialog")
-    dialog_logger.setLevel(logging.INFO)
-    
-    # Логгер для нашего приложения
-    app_logger = logging.getLogger("app")
-    app_logger.setLevel(logging.DEBUG)
-    
+
+    # Корневой логгер только кладет записи в очередь, обработчики работают в потоке слушателя
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(
+        log_queue,
+        console_handler,
+        general_handler,
+        error_handler,
+        respect_handler_level=True,
+    )
+    _listener.start()
+
+    set_log_levels(level, logger_levels)
     return root_logger
 
 
+def set_log_levels(level: str = "INFO", logger_levels: Optional[Dict[str, str]] = None) -> None:
+    """
+    Выставить уровни логгеров.
+    Записи ниже уровня логгера отбрасываются до форматирования и постановки в очередь.
+    """
+    levels = {
+        "aiogram": "INFO",
+        "aiogram_dialog": "INFO",
+        "app": level,
+    }
+    levels.update(logger_levels or {})
+
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+
+
+def parse_logger_levels(raw: str) -> Dict[str, str]:
+    """Разобрать строку вида 'aiogram=WARNING,app.middleware=INFO'."""
+    result = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, logger_level = item.split("=", 1)
+        if name.strip() and logger_level.strip():
+            result[name.strip()] = logger_level.strip()
+    return result
+
+
+def shutdown_logging() -> None:
+    """Дописать оставшиеся в очереди записи и остановить поток слушателя."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
 def get_logger(name: str = None) -> logging.Logger:
     """Получить логгер с указанным именем."""
     if name:
@@ -76,35 +138,47 @@ def get_logger(name: str = None) -> logging.Logger:
 
 
 class ContextLogger:
-    """Контекстный логгер для добавления дополнительной информации."""
-    
+    """
+    Контекстный логгер для добавления дополнительной информации.
+    Поддерживает ленивое %-форматирование: logger.debug("user %s", user_id).
+    """
+
     def __init__(self, logger: logging.Logger, context: dict = None):
         self.logger = logger
         self.context = context or {}
-    
-    def _format_message(self, message: str) -> str:
-        """Форматировать сообщение с контекстом."""
         if self.context:
             context_str = " | ".join([f"{k}={v}" for k, v in self.context.items()])
-            return f"[{context_str}] {message}"
-        return message
-    
-    def debug(self, message: str, **kwargs):
+            # Экранируем %, чтобы контекст не ломал %-форматирование аргументов
+            self._prefix = f"[{context_str}] ".replace("%", "%%")
+        else:
+            self._prefix = ""
+
+    def _format_message(self, message: str) -> str:
+        """Форматировать сообщение с контекстом."""
+        return f"{self._prefix}{message}"
+
+    def _log(self, level: int, message: str, args: tuple, kwargs: dict) -> None:
+        if self.logger.isEnabledFor(level):
+            # stacklevel указывает на вызывающий код, а не на обертку
+            kwargs.setdefault("stacklevel", 3)
+            self.logger.log(level, self._format_message(message), *args, **kwargs)
+
+    def debug(self, message: str, *args, **kwargs):
         """Логировать DEBUG сообщение."""
-        self.logger.debug(self._format_message(message), **kwargs)
-    
-    def info(self, message: str, **kwargs):
+        self._log(logging.DEBUG, message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs):
         """Логировать INFO сообщение."""
-        self.logger.info(self._format_message(message), **kwargs)
-    
-    def warning(self, message: str, **kwargs):
+        self._log(logging.INFO, message, args, kwargs)
+
+    def warning(self, message: str, *args, **kwargs):
         """Логировать WARNING сообщение."""
-        self.logger.warning(self._format_message(message), **kwargs)
-    
-    def error(self, message: str, **kwargs):
+        self._log(logging.WARNING, message, args, kwargs)
+
+    def error(self, message: str, *args, **kwargs):
         """Логировать ERROR сообщение."""
-        self.logger.error(self._format_message(message), **kwargs)
-    
-    def critical(self, message: str, **kwargs):
+        self._log(logging.ERROR, message, args, kwargs)
+
+    def critical(self, message: str, *args, **kwargs):
         """Логировать CRITICAL сообщение."""
-        self.logger.critical(self._format_message(message), **kwargs)
\ No newline at end of file
+        self._log(logging.CRITICAL, message, args, kwargs)
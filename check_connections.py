@@ -64,11 +64,9 @@ def check_google_sheets():
         config = load_config()
         sheets_manager = GoogleSheetsManager(config.google_sheets)
         
-        # Пробуем получить клиент
-        client = sheets_manager._get_client()
-        print("✅ Google Sheets: аутентификация успешна")
+        print(f"ℹ️ Google Sheets: бэкенд {sheets_manager.backend.name}")
         
-        # Пробуем открыть таблицу
+        # Пробуем открыть таблицу (для gspread - заодно аутентификация)
         spreadsheet = sheets_manager._get_spreadsheet()
         print(f"✅ Google Sheets: таблица '{spreadsheet.title}' открыта успешно")
         return True
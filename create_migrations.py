@@ -8,6 +8,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from alembic.config import Config
 from alembic import command
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from app.config.config import load_config
@@ -15,6 +16,8 @@ from app.database.models.base import Base
 # Импортируем все модели для создания таблиц
 from app.database.models.user import User
 from app.database.models.registration import Event, EventRegistration
+from app.database.models.passport import PassportData
+from app.database.models.outbox import SheetsOutbox, SheetsRowHash
 
 
 async def create_migration():
@@ -37,6 +40,31 @@ async def create_migration():
         await engine.dispose()
 
 
+async def sync_seats_taken():
+    """Добавить events.seats_taken в существующую базу и пересчитать его по регистрациям."""
+    config = load_config()
+    engine = create_async_engine(config.database.async_url)
+    
+    try:
+        # Одна транзакция: ALTER держит блокировку events до коммита, регистрации ждут пересчета
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "ALTER TABLE events ADD COLUMN IF NOT EXISTS seats_taken INTEGER NOT NULL DEFAULT 0"
+            ))
+            result = await conn.execute(text(
+                "UPDATE events SET seats_taken = ("
+                "SELECT count(*) FROM event_registrations r WHERE r.event_id = events.id"
+                ")"
+            ))
+        
+        print(f"✅ Занятые места пересчитаны для {result.rowcount} мероприятий")
+        
+    except Exception as e:
+        print(f"❌ Ошибка пересчета мест: {e}")
+    finally:
+        await engine.dispose()
+
+
 def init_alembic():
     """Инициализировать Alembic."""
     try:
@@ -64,6 +92,7 @@ if __name__ == "__main__":
     parser.add_argument("--init", action="store_true", help="Инициализировать Alembic")
     parser.add_argument("--create", action="store_true", help="Создать таблицы напрямую")
     parser.add_argument("--migration", type=str, help="Создать миграцию с указанным сообщением")
+    parser.add_argument("--seats", action="store_true", help="Добавить events.seats_taken и пересчитать места")
     
     args = parser.parse_args()
     
@@ -73,5 +102,7 @@ if __name__ == "__main__":
         asyncio.run(create_migration())
     elif args.migration:
         create_alembic_migration(args.migration)
+    elif args.seats:
+        asyncio.run(sync_seats_taken())
     else:
-        print("Используйте --init, --create или --migration 'описание'")
\ No newline at end of file
+        print("Используйте --init, --create, --seats или --migration 'описание'")
\ No newline at end of file
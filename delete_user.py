@@ -9,8 +9,11 @@ sys.path.append(str(Path(__file__).parent))
 from app.config.config import load_config
 from app.database.database import Database
 from app.database.models.user import User
-from app.database.models.registration import EventRegistration
-from sqlalchemy import select, delete
+from app.database.models.registration import Event, EventRegistration
+from app.infrastructure.cache.seat_counters import SeatCounters
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+from app.infrastructure.redis.redis_manager import RedisManager
+from sqlalchemy import select, delete, func, update
 
 
 async def delete_user_data(telegram_id: int):
@@ -31,6 +34,16 @@ async def delete_user_data(telegram_id: int):
             
             print(f"🔍 Найден пользователь: {user.first_name} {user.last_name} ({user.email})")
             
+            # Освобождаем места на мероприятиях пользователя
+            freed = await session.execute(
+                update(Event)
+                .where(Event.id.in_(select(EventRegistration.event_id).where(EventRegistration.user_id == user.id)))
+                .values(seats_taken=func.greatest(Event.seats_taken - 1, 0))
+                .returning(Event.id)
+                .execution_options(synchronize_session=False)
+            )
+            seat_deltas = {event_id: -1 for event_id in freed.scalars()}
+            
             # Удаляем регистрации
             registrations_stmt = delete(EventRegistration).where(EventRegistration.user_id == user.id)
             reg_result = await session.execute(registrations_stmt)
@@ -43,6 +56,8 @@ async def delete_user_data(telegram_id: int):
             
             await session.commit()
             print("✅ Данные пользователя успешно удалены")
+            await invalidate_cached_profile(config, telegram_id)
+            await apply_seat_deltas(config, seat_deltas)
             
     except Exception as e:
         print(f"❌ Ошибка при удалении: {e}")
@@ -50,6 +65,40 @@ async def delete_user_data(telegram_id: int):
         await database.close()
 
 
+async def invalidate_cached_profile(config, telegram_id: int):
+    """Удалить профиль из кэша в Redis, чтобы боты не видели удаленного пользователя."""
+    if config.user_cache.backend != "redis":
+        print(f"ℹ️ Кэш профилей в памяти ботов: профиль исчезнет через {config.user_cache.ttl_seconds}с")
+        return
+    redis_manager = RedisManager(config.redis)
+    try:
+        profile_cache = UserProfileCache(ttl_seconds=config.user_cache.ttl_seconds, redis_client=await redis_manager.get_redis())
+        await profile_cache.invalidate(telegram_id)
+        print("🔄 Профиль удален из кэша")
+    except Exception as e:
+        print(f"⚠️  Не удалось удалить профиль из кэша (он исчезнет через {config.user_cache.ttl_seconds}с): {e}")
+    finally:
+        await redis_manager.close()
+
+
+async def apply_seat_deltas(config, seat_deltas):
+    """Уменьшить счетчики мест в Redis на освобожденные места (как ServiceContainer.close)."""
+    if not seat_deltas:
+        return
+    redis_manager = RedisManager(config.redis)
+    try:
+        seat_counters = SeatCounters(await redis_manager.get_redis())
+        await seat_counters.apply(seat_deltas)
+        if seat_counters.errors:
+            print("⚠️  Не удалось обновить счетчики мест (их исправит сверка с БД)")
+        else:
+            print(f"🔄 Счетчики мест обновлены: {len(seat_deltas)}")
+    except Exception as e:
+        print(f"⚠️  Не удалось обновить счетчики мест (их исправит сверка с БД): {e}")
+    finally:
+        await redis_manager.close()
+
+
 if __name__ == "__main__":
     user_id = 257026813
     print(f"🗑️ Удаление данных пользователя {user_id}...")
@@ -3,25 +3,85 @@ import asyncio
 import logging
 import sys
 from pathlib import Path
+from typing import List, Optional
 
 # Добавляем корневую директорию в путь
 sys.path.append(str(Path(__file__).parent))
 
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
-from aiogram_dialog import setup_dialogs, ShowMode
-from redis.asyncio import Redis
 
-from app.config.config import load_config
-from app.database.database import Database
-from app.infrastructure.redis.redis_manager import RedisManager
-from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
-from app.middleware import DependencyMiddleware, LockMiddleware
-from app.handlers import router as main_router
-from app.dialogs.registry import register_dialogs
-from app.utils.logger import setup_logging, get_logger, ContextLogger
+from app.bootstrap import create_application, create_bot, create_redis_client
+from app.config.config import Config, load_config
+from app.infrastructure.metrics.instruments import register_stats_gauge
+from app.infrastructure.metrics.server import start_metrics_server
+from app.infrastructure.sharding.router import ROUTED_UPDATE_TYPES, UpdateRouterMiddleware
+from app.infrastructure.sharding.supervisor import WorkerSupervisor
+from app.infrastructure.webhook.server import run_webhook
+from app.utils.logger import setup_logging, set_log_levels, get_logger
+
+
+async def run_ingestion(
+    bot: Bot,
+    dp: Dispatcher,
+    config: Config,
+    allowed_updates: Optional[List[str]] = None,
+) -> None:
+    """Получать апдейты в режиме из конфигурации (polling или webhook)."""
+    logger = get_logger(__name__)
+    if config.bot.mode == "webhook":
+        logger.info("📡 Режим получения апдейтов: webhook")
+        await run_webhook(bot, dp, config.webhook, allowed_updates=allowed_updates)
+    else:
+        logger.info("📡 Режим получения апдейтов: polling")
+        # getUpdates не работает, пока установлен webhook
+        await bot.delete_webhook()
+        if allowed_updates is not None:
+            await dp.start_polling(bot, allowed_updates=allowed_updates)
+        else:
+            await dp.start_polling(bot)
+
+
+async def run_sharded(config: Config) -> None:
+    """
+    Многопроцессный режим: этот процесс только принимает апдейты и раскладывает
+    их по потокам Redis, а N воркеров обрабатывают каждый свой шард пользователей.
+    """
+    logger = get_logger(__name__)
+    sharding = config.sharding
+
+    redis_client = create_redis_client(config.redis)
+    await redis_client.ping()
+    bot = create_bot(config)
+    dp = Dispatcher()
+    update_router = UpdateRouterMiddleware(
+        redis_client, sharding.workers, sharding.stream_prefix, sharding.stream_maxlen
+    )
+    dp.update.outer_middleware(update_router)
+
+    supervisor = WorkerSupervisor(sharding.workers)
+    supervisor.start()
+
+    metrics_runner = None
+    if config.metrics.enabled:
+        register_stats_gauge(
+            "bot_routed_updates",
+            "Апдейты, направленные в шарды",
+            lambda: {str(shard): count for shard, count in enumerate(update_router.routed)},
+        )
+        register_stats_gauge("bot_worker_restarts", "Перезапуски воркеров", lambda: {"restarts": supervisor.restarts})
+        metrics_runner = await start_metrics_server(config.metrics)
+    monitor_task = asyncio.create_task(supervisor.monitor())
+    logger.info(f"🧩 Запущено воркеров: {sharding.workers}, апдейты шардируются по user_id")
+
+    try:
+        await run_ingestion(bot, dp, config, allowed_updates=ROUTED_UPDATE_TYPES)
+    finally:
+        monitor_task.cancel()
+        supervisor.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await bot.session.close()
+        await redis_client.aclose()
 
 
 async def main():
@@ -35,130 +95,24 @@ async def main():
     try:
         # Загружаем конфигурацию
         config = load_config()
+        set_log_levels(config.bot.log_level, config.bot.log_levels)
         logger.info("✅ Конфигурация загружена")
         
-        # Создаем Redis клиента для FSM
-        if config.redis.password:
-            redis_url = f"redis://:{config.redis.password}@{config.redis.host}:{config.redis.port}/0"
-        else:
-            redis_url = f"redis://{config.redis.host}:{config.redis.port}/0"
-        
-        redis_client = Redis.from_url(redis_url, decode_responses=True)  # Важно: добавляем decode_responses=True
-        
-        # Проверяем подключение к Redis
-        try:
-            await redis_client.ping()
-            logger.info(f"✅ Подключение к Redis установлено: {config.redis.host}:{config.redis.port}")
-        except Exception as e:
-            logger.error(f"❌ Ошибка подключения к Redis: {e}")
+        if config.sharding.workers > 1:
+            await run_sharded(config)
             return
         
-        # Создаем хранилище для FSM
-        storage = RedisStorage(
-            redis=redis_client,
-            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
-        )
-        
-        # Создаем бота и диспетчер
-        bot = Bot(
-            token=config.bot.token,
-            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-        )
-        dp = Dispatcher(storage=storage)
-        logger.info("✅ Бот и диспетчер созданы")
-        
-        # Инициализируем базу данных
-        database = Database(config.database)
-        logger.info("✅ База данных инициализирована")
-        
-        # Инициализируем Google Sheets
-        sheets_manager = None
-        try:
-            sheets_manager = GoogleSheetsManager(config.google_sheets)
-            logger.info("✅ Google Sheets инициализированы")
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка инициализации Google Sheets: {e}")
-        
-        # Настраиваем middleware для передачи зависимостей
-        async def services_middleware(handler, event, data):
-            # Создаем контекстный логгер для каждого запроса
-            event_type = type(event).__name__
-            user_id = getattr(event.from_user, 'id', 'unknown') if hasattr(event, 'from_user') and event.from_user else 'unknown'
-            
-            context_logger = ContextLogger(
-                get_logger("app.middleware"),
-                {"event": event_type, "user_id": user_id}
-            )
-            
-            context_logger.debug(f"Обработка события: {event_type}")
-            
-            try:
-                async with database.get_session() as session:
-                    # Создаем сервисы
-                    from app.services.user_service import UserService
-                    from app.services.event_service import EventService
-                    from app.services.referral_service import ReferralService
-                    from app.services.passport_service import PassportService
-                    
-                    user_service = UserService(session, sheets_manager) if sheets_manager else UserService(session, None)
-                    event_service = EventService(session, sheets_manager) if sheets_manager else EventService(session, None)
-                    referral_service = ReferralService(session)
-                    passport_service = PassportService(session, sheets_manager)
-                    
-                    # Добавляем в данные
-                    data["session"] = session
-                    data["user_service"] = user_service
-                    data["event_service"] = event_service
-                    data["referral_service"] = referral_service
-                    data["sheets_manager"] = sheets_manager
-                    data["passport_service"] = passport_service
-                    data["redis_client"] = redis_client  # Добавляем Redis клиент
-                    data["logger"] = context_logger
-                    data["bot"] = bot
-                    
-                    result = await handler(event, data)
-                    context_logger.debug(f"Событие {event_type} обработано успешно")
-                    return result
-                    
-            except Exception as e:
-                context_logger.error(f"Ошибка при обработке события {event_type}: {e}")
-                raise
-        
-        # Сначала middleware для сервисов (inner middleware)
-        dp.message.middleware(services_middleware)
-        dp.callback_query.middleware(services_middleware)
-        
-        # Регистрируем обработчики
-        dp.include_router(main_router)
-        logger.info("✅ Основные обработчики зарегистрированы")
-        
-        # Регистрируем диалоги
-        register_dialogs(dp)
-        logger.info("✅ Диалоги зарегистрированы")
-        
-        # Настраиваем aiogram-dialog
-        setup_dialogs(dp)
-        logger.info("✅ aiogram-dialog настроен")
-        
-        # ВАЖНО: Регистрируем middleware блокировки ПОСЛЕ setup_dialogs
-        # чтобы он имел приоритет над middleware aiogram-dialog
-        lock_middleware = LockMiddleware(redis_client, config.bot.admin_ids)
-        dp.update.outer_middleware(lock_middleware)  # Для всех типов событий
-        logger.info("✅ LockMiddleware зарегистрирован после setup_dialogs")
+        application = await create_application(config)
         
         logger.info("🤖 Бот запущен и готов к работе!")
         print("🤖 Бот запущен и готов к работе!")
         
         # Запускаем бота
         try:
-            await dp.start_polling(bot)
+            await run_ingestion(application.bot, application.dp, config)
         finally:
             # Закрываем соединения
-            logger.info("🔄 Закрытие соединений...")
-            await bot.session.close()
-            await database.close()
-            await redis_client.aclose()
-            logger.info("✅ Соединения закрыты")
+            await application.close()
             
     except Exception as e:
         logger.critical(f"💥 Критическая ошибка: {e}")
@@ -175,4 +129,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"❌ Критическая ошибка: {e}")
         get_logger(__name__).critical(f"💥 Критическая ошибка: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Полная сверка Google Sheets с базой данных (листы переписываются по данным БД)."""
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+from app.config.config import load_config
+from app.database.database import Database
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.reconciler import SheetsReconciler
+from app.infrastructure.google_sheets.sheets_manager import GoogleSheetsManager
+
+
+async def reconcile_sheets():
+    """Сверить все листы или только перечисленные в аргументах."""
+    if any(arg in ("-h", "--help") for arg in sys.argv[1:]):
+        print("Использование:")
+        print("  python3 reconcile_sheets.py                  - сверить все листы")
+        print("  python3 reconcile_sheets.py general Пропуски - сверить только указанные листы")
+        sys.exit(1)
+
+    sheet_names = sys.argv[1:] or None
+
+    config = load_config()
+    database = Database(config.database)
+    sheets = AsyncSheetsManager(GoogleSheetsManager(config.google_sheets))
+    reconciler = SheetsReconciler(database, sheets)
+
+    try:
+        results = await reconciler.reconcile(sheet_names)
+        for sheet_name, result in results.items():
+            print(
+                f"✅ {sheet_name}: строк {result['rows']}, изменено {result['changed']}, "
+                f"очищено {result['cleared']}, диапазонов {result['ranges']}, "
+                f"операций outbox учтено {result['outbox_skipped']}"
+            )
+        if reconciler.skipped_sheets:
+            print(f"⏳ Пропущено листов: {reconciler.skipped_sheets} (идет доставка outbox), повторите позже")
+        if reconciler.failed_sheets:
+            print(f"❌ Не удалось сверить листов: {reconciler.failed_sheets} (подробности в логе)")
+        if reconciler.skipped_sheets or reconciler.failed_sheets:
+            sys.exit(1)
+    finally:
+        await sheets.stop()
+        await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(reconcile_sheets())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Нагрузочная проверка атомарного бронирования мест: сотни параллельных регистраций без перебора лимита."""
+import argparse
+import asyncio
+import secrets
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+from sqlalchemy import delete, func, select
+
+from app.config.config import load_config
+from app.database.database import Database
+from app.database.models.registration import Event, EventRegistration
+from app.database.models.user import User
+from app.database.repositories.event_repository import RegistrationRepository
+
+# Тестовые пользователи получают отрицательные telegram_id, чтобы не пересечься с настоящими
+TELEGRAM_ID_BASE = -9_000_000_000
+
+
+async def register(database: Database, user_id: int, event_id: int) -> bool:
+    """Одно подтверждение регистрации в собственной транзакции, как в боте."""
+    async with database.get_session() as session:
+        return await RegistrationRepository(session).register_user(user_id, event_id) is not None
+
+
+async def unregister(database: Database, user_id: int, event_id: int) -> bool:
+    async with database.get_session() as session:
+        return await RegistrationRepository(session).unregister_user(user_id, event_id)
+
+
+async def check(database: Database, event_id: int, limit: int, stage: str) -> bool:
+    """Сравнить реальное число регистраций с лимитом и с events.seats_taken."""
+    async with database.get_session() as session:
+        registered = await session.scalar(
+            select(func.count(EventRegistration.id)).where(EventRegistration.event_id == event_id)
+        )
+        seats_taken = await session.scalar(select(Event.seats_taken).where(Event.id == event_id))
+    ok = registered <= limit and registered == seats_taken
+    print(f"{'✅' if ok else '❌'} {stage}: регистраций {registered}, seats_taken {seats_taken}, лимит {limit}")
+    return ok
+
+
+async def run(users_count: int, limit: int, pool_size: int) -> bool:
+    config = load_config()
+    database = Database(replace(config.database, pool_size=pool_size, max_overflow=0))
+    event_id = None
+    user_ids = []
+
+    try:
+        async with database.get_session() as session:
+            event = Event(
+                name="Нагрузочный тест бронирования мест",
+                day="-",
+                start_time="00:00",
+                end_time="00:00",
+                event_type="workshop",
+                is_exclusive=False,
+                max_participants=limit,
+                sheet_name=f"stress_{secrets.token_hex(4)}",
+            )
+            session.add(event)
+            users = [
+                User(
+                    telegram_id=TELEGRAM_ID_BASE - i,
+                    first_name="Stress",
+                    last_name=str(i),
+                    email=f"stress{i}@example.invalid",
+                    workplace="-",
+                    referral_code=f"stress{secrets.token_hex(6)}",
+                )
+                for i in range(users_count)
+            ]
+            session.add_all(users)
+            await session.flush()
+            event_id = event.id
+            user_ids = [user.id for user in users]
+        print(f"🧪 Мероприятие {event_id}: лимит {limit}, участников {users_count}, соединений {pool_size}")
+
+        # 1. Все подтверждают одновременно
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(register(database, user_id, event_id) for user_id in user_ids), return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started
+        reserved = sum(1 for result in results if result is True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        print(f"1. Параллельные регистрации за {elapsed:.2f}с: мест получено {reserved}, ошибок {len(errors)}")
+        ok = await check(database, event_id, limit, "после регистраций")
+        ok = ok and reserved == min(limit, users_count)
+
+        # 2. Часть участников отменяет регистрацию, пока остальные снова пытаются записаться
+        registered_ids = [user_id for user_id, result in zip(user_ids, results) if result is True]
+        waiting_ids = [user_id for user_id, result in zip(user_ids, results) if result is not True]
+        leaving_ids = registered_ids[: max(1, len(registered_ids) // 5)]
+        results = await asyncio.gather(
+            *(unregister(database, user_id, event_id) for user_id in leaving_ids),
+            *(register(database, user_id, event_id) for user_id in waiting_ids),
+            return_exceptions=True,
+        )
+        errors += [result for result in results if isinstance(result, Exception)]
+        print(f"2. Отмен {len(leaving_ids)} вперемешку с {len(waiting_ids)} повторными попытками")
+        ok = await check(database, event_id, limit, "после отмен") and ok
+
+        # 3. Повторное подтверждение уже записанных не занимает новых мест
+        still_registered = [user_id for user_id in registered_ids if user_id not in leaving_ids]
+        results = await asyncio.gather(
+            *(register(database, user_id, event_id) for user_id in still_registered), return_exceptions=True
+        )
+        duplicates = sum(1 for result in results if result is True)
+        print(f"3. Повторные подтверждения: занято лишних мест {duplicates}")
+        ok = await check(database, event_id, limit, "после повторов") and ok and duplicates == 0
+
+        for error in errors[:5]:
+            print(f"⚠️ {type(error).__name__}: {error}")
+        return ok and not errors
+
+    finally:
+        if event_id is not None:
+            async with database.get_session() as session:
+                await session.execute(delete(EventRegistration).where(EventRegistration.event_id == event_id))
+                await session.execute(delete(Event).where(Event.id == event_id))
+                await session.execute(delete(User).where(User.id.in_(user_ids)))
+            print("🧹 Тестовые данные удалены")
+        await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка отсутствия перебора мест при параллельных регистрациях")
+    parser.add_argument("--users", type=int, default=500, help="Сколько пользователей подтверждают одновременно")
+    parser.add_argument("--limit", type=int, default=50, help="Лимит мест на мероприятии")
+    parser.add_argument("--pool", type=int, default=50, help="Размер пула соединений с БД")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.users, args.limit, args.pool))
+    print("✅ Перебора мест нет" if ok else "❌ Обнаружены расхождения")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
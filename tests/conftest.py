@@ -0,0 +1,16 @@
+"""Общие настройки тестов: часть модулей читает конфигурацию при импорте."""
+import os
+
+# Заглушки обязательных переменных окружения: тесты не ходят ни в Telegram, ни в БД, ни в Redis
+for name, value in {
+    "BOT_TOKEN": "1:test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "GOOGLE_SHEETS_BACKEND": "memory",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,86 @@
+"""Вспомогательные средства тестов: SQLite в памяти вместо Postgres и подсчет запросов."""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database.models.base import Base
+from app.database.models.registration import Event, EventRegistration
+from app.database.models.user import User
+from app.infrastructure.cache.user_profile_cache import UserProfile
+
+
+class StatementLog:
+    """SQL-запросы, выполненные движком."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def reset(self) -> None:
+        self.statements.clear()
+
+
+@asynccontextmanager
+async def sqlite_session() -> AsyncIterator[tuple]:
+    """Сессия над пустой SQLite-базой с таблицами пользователей и мероприятий и журнал ее запросов."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    log = StatementLog()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _log(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append(statement)
+
+    async with engine.begin() as conn:
+        tables = [User.__table__, Event.__table__, EventRegistration.__table__]
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+    try:
+        async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            log.reset()
+            yield session, log
+    finally:
+        await engine.dispose()
+
+
+def make_user(user_id: int) -> User:
+    return User(
+        id=user_id,
+        telegram_id=1000 + user_id,
+        first_name="Test",
+        last_name=str(user_id),
+        email=f"user{user_id}@example.invalid",
+        workplace="-",
+        referral_code=f"code{user_id}",
+    )
+
+
+def make_profile(telegram_id: int) -> UserProfile:
+    return UserProfile(
+        id=telegram_id,
+        telegram_id=telegram_id,
+        username=f"user{telegram_id}",
+        first_name="Test",
+        last_name=str(telegram_id),
+        email=f"user{telegram_id}@example.invalid",
+        workplace="-",
+        referral_code=None,
+        referrer_id=None,
+        referral_notified=False,
+    )
+
+
+def make_event(event_id: int, sheet_name: str, start_time: str = "10:00", **kwargs) -> Event:
+    fields = dict(
+        name=sheet_name,
+        day="23 октября",
+        start_time=start_time,
+        end_time="23:00",
+        event_type="workshop",
+        is_exclusive=False,
+        max_participants=None,
+    )
+    fields.update(kwargs)
+    return Event(id=event_id, sheet_name=sheet_name, **fields)
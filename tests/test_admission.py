@@ -0,0 +1,51 @@
+"""AdmissionMiddleware: ограничение очереди апдейтов одного пользователя."""
+import asyncio
+
+from aiogram.types import CallbackQuery, Update, User
+
+from app.middleware import AdmissionMiddleware
+
+
+def callback_update(update_id: int, user_id: int) -> Update:
+    user = User(id=user_id, is_bot=False, first_name="Test")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=str(update_id), from_user=user, chat_instance="x", data="toggle"),
+    )
+
+
+async def press(middleware: AdmissionMiddleware, updates):
+    """Отправить апдейты почти одновременно; обработчик ждет, пока все не поставлены в очередь."""
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(event, data):
+        await release.wait()
+        handled.append(event.update_id)
+
+    tasks = [asyncio.create_task(middleware(handler, update, {})) for update in updates]
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(*tasks)
+    return handled
+
+
+def test_extra_updates_of_one_user_are_shed():
+    middleware = AdmissionMiddleware(max_concurrency=10, max_queue=10, queue_timeout=1.0, max_per_user=2)
+    updates = [callback_update(update_id, user_id=1) for update_id in range(5)]
+
+    handled = asyncio.run(press(middleware, updates))
+
+    assert handled == [0, 1]
+    assert middleware.shed == middleware.shed_per_user == 3
+    assert middleware.stats()["serialized_users"] == 0
+
+
+def test_other_users_are_not_affected():
+    middleware = AdmissionMiddleware(max_concurrency=10, max_queue=10, queue_timeout=1.0, max_per_user=1)
+    updates = [callback_update(update_id, user_id=update_id) for update_id in range(5)]
+
+    handled = asyncio.run(press(middleware, updates))
+
+    assert sorted(handled) == [0, 1, 2, 3, 4]
+    assert middleware.shed == 0
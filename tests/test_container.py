@@ -0,0 +1,59 @@
+"""Побочные эффекты ServiceContainer.close после коммита и отката."""
+import asyncio
+
+import pytest
+
+from app.database.repositories.user_repository import PROFILE_INVALIDATIONS_KEY
+from app.infrastructure.cache.user_profile_cache import UserProfileCache
+from app.services.container import ServiceContainer
+from tests.helpers import make_profile
+
+
+class FakeSession:
+    def __init__(self, fail_commit: bool = False):
+        self.info = {}
+        self.fail_commit = fail_commit
+        self.calls = []
+
+    async def commit(self):
+        self.calls.append("commit")
+        if self.fail_commit:
+            raise RuntimeError("commit failed")
+
+    async def rollback(self):
+        self.calls.append("rollback")
+
+    async def close(self):
+        self.calls.append("close")
+
+
+async def close_with_touched_profile(session: FakeSession, error=None):
+    cache = UserProfileCache()
+    container = ServiceContainer(database=None, profile_cache=cache)
+    container._session = session
+
+    # Профиль изменен в транзакции, а параллельный запрос успел его закэшировать
+    session.info[PROFILE_INVALIDATIONS_KEY] = {1}
+    await cache.set(make_profile(1))
+    await container.close(error)
+    return await cache.get(1)
+
+
+def test_commit_invalidates_touched_profiles():
+    session = FakeSession()
+    assert asyncio.run(close_with_touched_profile(session)) is None
+    assert session.calls == ["commit", "close"]
+
+
+def test_rollback_invalidates_touched_profiles():
+    session = FakeSession()
+    assert asyncio.run(close_with_touched_profile(session, RuntimeError("handler failed"))) is None
+    assert session.calls == ["rollback", "close"]
+
+
+def test_failed_commit_invalidates_touched_profiles():
+    session = FakeSession(fail_commit=True)
+    with pytest.raises(RuntimeError, match="commit failed"):
+        asyncio.run(close_with_touched_profile(session))
+    assert PROFILE_INVALIDATIONS_KEY not in session.info
+    assert session.calls == ["commit", "rollback", "close"]
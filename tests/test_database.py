@@ -0,0 +1,52 @@
+"""Статистика пула соединений: числовые значения, ожидание в очереди и таймауты."""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.config.config import load_config
+from app.database.database import Database, InstrumentedQueuePool
+from app.infrastructure.metrics.instruments import register_stats_gauge
+
+
+def test_pool_stats_are_numeric_and_exported():
+    database = Database(load_config().database)
+    stats = database.get_pool_stats()
+
+    assert stats and all(isinstance(value, (int, float)) for value in stats.values())
+    gauge = register_stats_gauge("test_db_pool", "Пул соединений в тесте", database.get_pool_stats)
+    assert set(key for key, in gauge._function()) == set(stats)
+
+
+def test_pool_wait_excludes_connect_time_and_counts_only_timeouts():
+    def slow_connect():
+        time.sleep(0.2)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def checkout_twice():
+        pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=0.05)
+        first = pool.connect()
+        try:
+            pool.connect()
+        except exc.TimeoutError:
+            pass
+        first.close()
+        return pool
+
+    pool = asyncio.run(greenlet_spawn(checkout_twice))
+    assert pool.checkouts == 2 and pool.timeouts == 1
+    # Создание соединения (0.2 с) не считается ожиданием, таймаут (0.05 с) - считается
+    assert 0.05 <= pool.wait_time_total < 0.2
+
+
+def test_pool_connect_errors_are_not_timeouts():
+    def failing_connect():
+        raise sqlite3.OperationalError("connection refused")
+
+    pool = InstrumentedQueuePool(failing_connect, pool_size=1, max_overflow=0)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connect()
+    assert pool.timeouts == 0
@@ -0,0 +1,81 @@
+"""Доска регистрации: число SQL-запросов не зависит от числа мероприятий и регистраций."""
+import asyncio
+
+from app.database.models.registration import EventRegistration
+from app.infrastructure.cache.event_catalog import EventCatalog, EventCatalogCache
+from app.services.event_service import EventService
+from tests.helpers import make_event, make_user, sqlite_session
+
+
+async def _seed(session, events_count: int, users_count: int) -> None:
+    session.add_all(make_user(user_id) for user_id in range(1, users_count + 1))
+    session.add_all([
+        make_event(1, "plenary_session", "11:00"),
+        make_event(2, "career_workshop", "13:10", max_participants=100, is_exclusive=True),
+        *(make_event(10 + i, f"extra_{i}", f"{15 + i}:00") for i in range(events_count - 2)),
+    ])
+    await session.flush()
+    session.add_all(
+        EventRegistration(id=user_id, user_id=user_id, event_id=1 if user_id % 2 else 2)
+        for user_id in range(1, users_count + 1)
+    )
+    await session.commit()
+
+
+def _board_statements(events_count: int, users_count: int, catalog: EventCatalogCache = None):
+    async def run():
+        async with sqlite_session() as (session, log):
+            await _seed(session, events_count, users_count)
+            service = EventService(session, catalog)
+            if catalog is not None:
+                await service.get_catalog()  # каталог уже в памяти процесса
+            log.reset()
+            board = await service.get_event_board(user_id=1)
+            return board, len(log)
+    return asyncio.run(run())
+
+
+def test_board_costs_two_queries_without_catalog_cache():
+    board, statements = _board_statements(events_count=3, users_count=4)
+    assert statements == 2  # каталог + один GROUP BY по регистрациям
+    counts = {item.event.id: item.registered_count for item in board.items}
+    assert counts[1] == 2 and counts[2] == 2
+    assert board.registered_event_ids == frozenset({1})
+
+
+def test_board_query_count_does_not_grow_with_data():
+    _, small = _board_statements(events_count=3, users_count=4)
+    _, large = _board_statements(events_count=8, users_count=60)
+    assert small == large
+
+
+def test_board_costs_one_query_with_warm_catalog():
+    _, statements = _board_statements(events_count=5, users_count=10, catalog=EventCatalogCache())
+    assert statements == 1
+
+
+def test_board_order_uses_event_order_then_start_time():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add_all([
+                make_event(1, "unknown_b", "16:00"),
+                make_event(2, "career_workshop", "13:10"),
+                make_event(3, "unknown_a", "15:00"),
+                make_event(4, "plenary_session", "11:00"),
+            ])
+            await session.commit()
+            return await EventService(session).get_event_board()
+    board = asyncio.run(run())
+    assert [item.event.sheet_name for item in board.items] == [
+        "plenary_session", "career_workshop", "unknown_a", "unknown_b",
+    ]
+
+
+def test_catalog_breaks_ties_by_start_time_regardless_of_load_order():
+    events = [
+        make_event(1, "unknown_b", "16:00"),
+        make_event(2, "unknown_a", "15:00"),
+        make_event(3, "vtb_speech", "17:30"),
+    ]
+    catalog = EventCatalog.from_events(events)
+    assert [event.sheet_name for event in catalog] == ["vtb_speech", "unknown_a", "unknown_b"]
@@ -0,0 +1,167 @@
+"""Применение выбора мероприятий и регистрация: проверки перед записью и решение о местах по базе."""
+import asyncio
+
+from sqlalchemy import delete, func, select
+
+from app.database.models.registration import Event, EventRegistration
+from app.services.event_service import EventService
+from tests.helpers import make_event, make_user, sqlite_session
+
+
+class StaleCounters:
+    """Счетчики Redis, разошедшиеся с базой."""
+
+    def __init__(self, values):
+        self.values = values
+
+    async def get_many(self, event_ids):
+        return {event_id: self.values.get(event_id) for event_id in event_ids}
+
+
+class RecordingOutbox:
+    """Outbox без таблицы: только запоминает синхронизации."""
+
+    def __init__(self):
+        self.synced = []
+
+    async def sync_event_registrations(self, user, added, removed):
+        self.synced.append((list(added), list(removed)))
+
+
+def _service(session, seat_counters=None) -> EventService:
+    """
+    EventService над SQLite: массовые регистрации в репозитории - CTE с
+    UPDATE ... RETURNING, которых SQLite не умеет, поэтому они повторены
+    здесь через ORM с той же семантикой мест.
+    """
+    service = EventService(session, seat_counters=seat_counters)
+    service.outbox_repository = RecordingOutbox()
+
+    async def register_user_many(user_id, event_ids):
+        registrations = {}
+        for event in (await session.execute(select(Event).where(Event.id.in_(event_ids)))).scalars():
+            if event.max_participants is not None and event.seats_taken >= event.max_participants:
+                continue
+            if await service.registration_repository.is_user_registered(user_id, event.id):
+                continue
+            event.seats_taken += 1
+            # BIGINT-ключ в SQLite не автоинкрементный
+            last_id = await session.scalar(select(func.max(EventRegistration.id)))
+            registration = EventRegistration(id=(last_id or 0) + 1, user_id=user_id, event_id=event.id)
+            session.add(registration)
+            await session.flush()
+            registrations[event.id] = registration.id
+        return registrations
+
+    async def unregister_user_many(user_id, event_ids):
+        removed = {}
+        for registration in await service.registration_repository.get_user_registrations(user_id):
+            if registration.event_id in event_ids:
+                removed[registration.event_id] = registration.id
+                event = await session.get(Event, registration.event_id)
+                event.seats_taken = max(event.seats_taken - 1, 0)
+        await session.execute(
+            delete(EventRegistration).where(EventRegistration.id.in_(list(removed.values())))
+        )
+        return removed
+
+    service.registration_repository.register_user_many = register_user_many
+    service.registration_repository.unregister_user_many = unregister_user_many
+    return service
+
+
+def test_stale_counters_do_not_reject_free_seats():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add(make_user(1))
+            session.add(make_event(1, "career_workshop", max_participants=10, seats_taken=3))
+            await session.commit()
+            # Счетчик насчитал лишнее: места в базе есть
+            service = _service(session, StaleCounters({1: 10}))
+            return await service.apply_selection(make_user(1), [1])
+    result = asyncio.run(run())
+    assert result.errors == ()
+    assert [event.id for event in result.added] == [1]
+
+
+async def _registrations(session):
+    result = await session.execute(select(EventRegistration.user_id, EventRegistration.event_id))
+    return sorted(result.all())
+
+
+def test_exclusive_conflict_changes_nothing():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add(make_user(1))
+            session.add_all([
+                make_event(1, "career_workshop", is_exclusive=True),
+                make_event(2, "hr_workshop", is_exclusive=True),
+                make_event(3, "plenary_session"),
+            ])
+            await session.commit()
+            service = _service(session)
+            result = await service.apply_selection(make_user(1), [1, 2, 3])
+            return result, await _registrations(session), service.outbox_repository.synced
+    result, registrations, synced = asyncio.run(run())
+    assert result.changed == 0 and len(result.errors) == 1
+    assert "взаимоисключающих" in result.errors[0]
+    assert registrations == [] and synced == []
+
+
+def test_exhausted_seats_reject_the_whole_selection():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add(make_user(1))
+            session.add_all([
+                make_event(1, "career_workshop", max_participants=2, seats_taken=2),
+                make_event(2, "plenary_session"),
+            ])
+            await session.commit()
+            service = _service(session)
+            result = await service.apply_selection(make_user(1), [1, 2])
+            return result, await _registrations(session), service.outbox_repository.synced
+    result, registrations, synced = asyncio.run(run())
+    assert result.changed == 0
+    assert result.errors == ("🔒 Мероприятие 'career_workshop' заполнено (лимит: 2)",)
+    assert registrations == [] and synced == []
+
+
+def test_repeated_confirmation_is_idempotent():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add(make_user(1))
+            session.add_all([
+                make_event(1, "career_workshop", max_participants=1),
+                make_event(2, "plenary_session"),
+            ])
+            await session.commit()
+            service = _service(session)
+            first = await service.apply_selection(make_user(1), [1, 2])
+            second = await service.apply_selection(make_user(1), [2, 1])
+            seats = await service.registration_repository.get_seat_counts()
+            return first, second, await _registrations(session), seats
+    first, second, registrations, seats = asyncio.run(run())
+    assert sorted(event.id for event in first.added) == [1, 2] and first.errors == ()
+    # Место на career_workshop уже занято самим пользователем - это не "заполнено"
+    assert second.changed == 0 and second.errors == ()
+    assert registrations == [(1, 1), (1, 2)]
+    assert seats == {1: 1, 2: 1}
+
+
+def test_register_for_missing_event_fails_without_writes():
+    async def run():
+        async with sqlite_session() as (session, _):
+            session.add(make_user(1))
+            await session.commit()
+            service = _service(session)
+
+            async def allowed(user_id, event_id):
+                return True, ""
+
+            # Предварительная проверка пропустила: мероприятие исчезло из каталога после нее
+            service.can_register_for_event = allowed
+            result = await service.register_user_for_event(make_user(1), 99)
+            return result, await _registrations(session)
+    result, registrations = asyncio.run(run())
+    assert result == (False, "Мероприятие не найдено")
+    assert registrations == []
@@ -0,0 +1,24 @@
+"""Планировщик квот Sheets API."""
+from app.infrastructure.google_sheets.quota import READ, WRITE, SheetsQuotaScheduler
+
+
+def test_throttled_seconds_counts_only_waiting_for_tokens():
+    scheduler = SheetsQuotaScheduler(read_per_minute=600, write_per_minute=600)
+
+    for _ in range(10):
+        scheduler.acquire(WRITE)
+    assert scheduler.throttled_seconds == 0.0
+
+    # Ведро пустое: следующий токен появится через 0.1с
+    scheduler._buckets[READ].tokens = 0.0
+    scheduler.acquire(READ)
+    assert 0.05 <= scheduler.throttled_seconds < 0.5
+    assert scheduler.stats()["requests_read"] == 1
+
+
+def test_empty_read_bucket_does_not_delay_writes():
+    scheduler = SheetsQuotaScheduler(read_per_minute=1, write_per_minute=600)
+    scheduler._buckets[READ].tokens = 0.0
+
+    scheduler.acquire(WRITE)
+    assert scheduler.throttled_seconds == 0.0
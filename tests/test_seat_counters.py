@@ -0,0 +1,81 @@
+"""Сверка счетчиков мест с БД не теряет дельты, примененные во время сверки."""
+import asyncio
+
+from app.infrastructure.cache import seat_counters
+from app.infrastructure.cache.seat_counters import SeatCounters
+
+
+class FakeRedis:
+    """Строковые ключи и Python-версии Lua-скриптов модуля seat_counters."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def register_script(self, script):
+        if script == seat_counters._APPLY_DELTAS:
+            return self._apply
+        if script == seat_counters._RECONCILE:
+            return self._reconcile
+        raise AssertionError("неизвестный скрипт")
+
+    async def _apply(self, keys, args):
+        for key, delta in zip(keys, args):
+            if key in self.values:
+                self.values[key] = str(max(0, int(self.values[key]) + int(delta)))
+        return len(keys)
+
+    async def _reconcile(self, keys, args):
+        updated = 0
+        for i, key in enumerate(keys):
+            expected, count = args[2 * i], args[2 * i + 1]
+            if self.values.get(key, "") == expected:
+                self.values[key] = str(count)
+                updated += 1
+        return updated
+
+
+def test_reconcile_skips_counters_changed_after_db_read():
+    async def run():
+        redis = FakeRedis()
+        db = {1: 5, 2: 7}
+        counters = None
+
+        async def loader():
+            counts = dict(db)
+            if counters is not None and counters.reconciles == 1:
+                # Регистрация закоммичена после чтения БД, ее дельта пришла до записи сверки
+                db[1] += 1
+                await counters.apply({1: 1})
+            return counts
+
+        counters = SeatCounters(redis, loader)
+        await counters.reconcile()
+        assert await counters.get_many([1, 2]) == {1: 5, 2: 7}
+
+        await counters.reconcile()
+        assert await counters.get_many([1, 2]) == {1: 6, 2: 7}
+        assert counters.reconcile_skipped == 1
+
+        await counters.reconcile()
+        assert await counters.get_many([1, 2]) == {1: 6, 2: 7}
+
+    asyncio.run(run())
+
+
+def test_reconcile_repairs_drifted_counters():
+    async def run():
+        redis = FakeRedis()
+        redis.values = {SeatCounters.KEY_PREFIX + "1": "40"}
+
+        async def loader():
+            return {1: 3}
+
+        counters = SeatCounters(redis, loader)
+        await counters.reconcile()
+        assert await counters.get(1) == 3
+        assert counters.reconcile_skipped == 0
+
+    asyncio.run(run())
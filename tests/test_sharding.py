@@ -0,0 +1,47 @@
+"""Маршрутизация апдейтов: пользователь апдейта в воркере после сериализации роутером."""
+import asyncio
+import json
+from datetime import datetime
+
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from app.infrastructure.sharding.router import UpdateRouterMiddleware, extract_user_id
+
+USER = User(id=4242, is_bot=False, first_name="Test")
+CHAT = Chat(id=4242, type="private")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.entries = []
+
+    async def xadd(self, stream, fields, **kwargs):
+        self.entries.append((stream, fields))
+
+
+def route(update: Update) -> dict:
+    """Пропустить апдейт через роутер и вернуть то, что прочитает воркер."""
+    redis = FakeRedis()
+    router = UpdateRouterMiddleware(redis, shards=4, stream_prefix="test", stream_maxlen=100)
+    asyncio.run(router(None, update, {}))
+    (_, fields), = redis.entries
+    return json.loads(fields["update"])
+
+
+def test_message_is_keyed_by_user():
+    message = Message(message_id=1, date=datetime.now(), chat=CHAT, from_user=USER, text="/start")
+    raw_update = route(Update(update_id=100, message=message))
+    assert extract_user_id(Update.model_validate(raw_update)) == USER.id
+
+
+def test_callback_query_is_keyed_by_user():
+    callback = CallbackQuery(id="1", from_user=USER, chat_instance="x", data="toggle")
+    raw_update = route(Update(update_id=101, callback_query=callback))
+    assert extract_user_id(Update.model_validate(raw_update)) == USER.id
+
+
+def test_serialized_update_is_valid_for_dispatcher():
+    message = Message(message_id=1, date=datetime.now(), chat=CHAT, from_user=USER, text="hi")
+    raw_update = route(Update(update_id=102, message=message))
+    assert Update.model_validate(raw_update).message.from_user.id == USER.id
+
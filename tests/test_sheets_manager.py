@@ -0,0 +1,107 @@
+"""GoogleSheetsManager поверх локальных бэкендов (в памяти и CSV)."""
+from dataclasses import replace
+from types import SimpleNamespace
+
+from app.config.config import load_config
+from app.infrastructure.google_sheets.sheets_manager import PASSPORT_SHEET, GoogleSheetsManager
+from app.infrastructure.metrics.instruments import SHEETS_LATENCY
+from tests.helpers import make_profile
+
+
+def make_user(telegram_id: int, username: str = "user") -> SimpleNamespace:
+    return SimpleNamespace(telegram_id=telegram_id, username=username)
+
+
+def make_managers():
+    """Две копии бота, пишущие в одну таблицу."""
+    config = load_config().google_sheets
+    first = GoogleSheetsManager(config)
+    second = GoogleSheetsManager(config, backend=first.backend)
+    second._spreadsheet = first._get_spreadsheet()
+    return first, second
+
+
+def passport_rows(manager: GoogleSheetsManager, telegram_id: int):
+    worksheet = manager._get_spreadsheet().worksheet(PASSPORT_SHEET)
+    return [row for row in worksheet.get_all_values()[1:] if row[4] == str(telegram_id)]
+
+
+def test_upsert_passport_updates_row_added_by_another_manager():
+    first, second = make_managers()
+
+    # Первая копия строит индекс листа, пока строки пользователя еще нет
+    first.upsert_passport_entry(make_user(1), "Иван Иванов", "1111 111111")
+    # Вторая добавляет строку, о которой индекс первой не знает
+    second.upsert_passport_entry(make_user(2), "Петр Петров", "2222 222222")
+
+    first.upsert_passport_entry(make_user(2), "Петр Петров", "3333 333333", car_number="А001АА")
+
+    rows = passport_rows(first, 2)
+    assert len(rows) == 1
+    assert rows[0][2:4] == ["3333 333333", "А001АА"]
+    assert len(passport_rows(first, 1)) == 1
+
+
+
+def observed(operation: str) -> int:
+    return sum(SHEETS_LATENCY._counts.get((operation,), []))
+
+
+def test_removal_is_observed_once():
+    first, _ = make_managers()
+    first.append_users("workshop_test", [(make_profile(1), None), (make_profile(2), None)])
+    before = {operation: observed(operation) for operation in ("remove_user_from_event_sheet", "remove_users")}
+
+    assert first.remove_user_from_event_sheet(make_profile(1), "workshop_test")
+    assert first.remove_users("workshop_test", [make_profile(2)]) == 1
+
+    assert observed("remove_user_from_event_sheet") == before["remove_user_from_event_sheet"] + 1
+    assert observed("remove_users") == before["remove_users"] + 1
+
+
+def reads(manager: GoogleSheetsManager) -> int:
+    return manager.scheduler.requests["read"]
+
+
+def test_removal_uses_the_row_index():
+    first, second = make_managers()
+    first.append_users("workshop_test", [(make_profile(i), None) for i in range(1, 6)])
+    assert first.remove_users("workshop_test", [make_profile(1)]) == 1
+
+    # Индекс уже построен: одна проверка ячеек вместо чтения всей колонки
+    before = reads(first)
+    assert first.remove_users("workshop_test", [make_profile(3), make_profile(5)]) == 2
+    assert reads(first) - before == 1
+
+    # Строки, удаленные другой копией бота, обнаруживаются проверкой и индекс перестраивается
+    assert second.remove_users("workshop_test", [make_profile(2)]) == 1
+    assert first.remove_users("workshop_test", [make_profile(4)]) == 1
+    worksheet = first._get_spreadsheet().worksheet("workshop_test")
+    assert worksheet.get_all_values()[1:] == []
+
+
+def test_passport_miss_reads_only_the_tail():
+    first, second = make_managers()
+    first.upsert_passport_entry(make_user(1), "Иван Иванов", "1111 111111")
+    second.upsert_passport_entry(make_user(2), "Петр Петров", "2222 222222")
+
+    # Новый пользователь: одно чтение хвоста листа, которое находит строку второй копии
+    before = reads(first)
+    first.upsert_passport_entry(make_user(2), "Петр Петров", "3333 333333")
+    assert reads(first) - before == 1
+    assert len(passport_rows(first, 2)) == 1
+
+
+def test_csv_backend_is_shared_between_processes(tmp_path):
+    # Два менеджера со своими бэкендами над одним каталогом - как два процесса
+    config = replace(load_config().google_sheets, backend="csv", local_dir=str(tmp_path))
+    first, second = GoogleSheetsManager(config), GoogleSheetsManager(config)
+
+    first.append_users("workshop_csv", [(make_profile(1), None)])
+    second.append_users("workshop_csv", [(make_profile(2), None)])
+    first.append_users("workshop_csv", [(make_profile(3), None)])
+    second.remove_users("workshop_csv", [make_profile(1)])
+
+    for manager in (first, second):
+        worksheet = manager._get_spreadsheet().worksheet("workshop_csv")
+        assert [row[5] for row in worksheet.get_all_values()[1:]] == ["2", "3"]
@@ -0,0 +1,115 @@
+"""Доставка операций outbox в таблицу на бэкенде в памяти (GOOGLE_SHEETS_BACKEND=memory)."""
+import asyncio
+from dataclasses import asdict
+from itertools import count
+
+from app.config.config import load_config
+from app.database.models.outbox import SheetsOutbox
+from app.infrastructure.google_sheets.async_sheets import AsyncSheetsManager
+from app.infrastructure.google_sheets.outbox import SheetsOutboxDispatcher, _RowHashes
+from app.infrastructure.google_sheets.sheets_manager import PASSPORT_SHEET, GoogleSheetsManager
+from tests.helpers import make_profile
+
+EVENT_SHEET = "workshop_test"
+_ids = count(1)
+
+
+def make_entry(operation: str, sheet_name: str, telegram_id: int, payload: dict) -> SheetsOutbox:
+    entry_id = next(_ids)
+    return SheetsOutbox(
+        id=entry_id,
+        operation=operation,
+        sheet_name=sheet_name,
+        payload={"user": asdict(make_profile(telegram_id)), **payload},
+        idempotency_key=f"test:{entry_id}",
+        attempts=0,
+    )
+
+
+def event_add(telegram_id: int) -> SheetsOutbox:
+    payload = {"event_name": "Тест", "sheet_name": EVENT_SHEET, "timestamp": "2024-01-01 10:00:00"}
+    return make_entry("add_user_to_event_sheet", EVENT_SHEET, telegram_id, payload)
+
+
+def event_remove(telegram_id: int) -> SheetsOutbox:
+    return make_entry("remove_user_from_event_sheet", EVENT_SHEET, telegram_id, {"sheet_name": EVENT_SHEET})
+
+
+def sheet_ids(manager: GoogleSheetsManager, sheet_name: str):
+    worksheet = manager._get_spreadsheet().worksheet(sheet_name)
+    column = 5 if sheet_name == PASSPORT_SHEET else 6
+    return [row[column - 1] for row in worksheet.get_all_values()[1:]]
+
+
+def deliver(dispatcher: SheetsOutboxDispatcher, sheet_name: str, entries, hashes: _RowHashes) -> int:
+    pending = [(entry, True, 0.0) for entry in entries]
+    return asyncio.run(dispatcher._drain_sheet(sheet_name, pending, hashes))
+
+
+def make_dispatcher():
+    assert load_config().google_sheets.backend == "memory"
+    manager = GoogleSheetsManager(load_config().google_sheets)
+    dispatcher = SheetsOutboxDispatcher(
+        database=None, sheets=AsyncSheetsManager(manager), append_flush_interval=0.0
+    )
+    return manager, dispatcher
+
+
+def test_batch_delivery_to_event_sheet():
+    manager, dispatcher = make_dispatcher()
+    hashes = _RowHashes({})
+
+    # Добавление и отмена пользователя 2 в одной пачке сокращаются
+    entries = [event_add(1), event_add(2), event_add(3), event_remove(2)]
+    assert deliver(dispatcher, EVENT_SHEET, entries, hashes) == 4
+    assert sheet_ids(manager, EVENT_SHEET) == ["1", "3"]
+    assert all(entry.processed_at is not None for entry in entries)
+    assert dispatcher.cancelled == 2
+
+    # Удаление уже записанной строки уходит отдельным batchUpdate
+    assert deliver(dispatcher, EVENT_SHEET, [event_remove(1)], hashes) == 1
+    assert sheet_ids(manager, EVENT_SHEET) == ["3"]
+    assert dispatcher.remove_batches == 1
+
+
+def test_repeated_rows_are_not_sent_again():
+    manager, dispatcher = make_dispatcher()
+    hashes = _RowHashes({})
+
+    assert deliver(dispatcher, EVENT_SHEET, [event_add(1)], hashes) == 1
+    assert deliver(dispatcher, EVENT_SHEET, [event_add(1)], hashes) == 1
+    assert sheet_ids(manager, EVENT_SHEET) == ["1"]
+    assert dispatcher.skipped_writes == 1
+
+    passport = dict(full_name="Имя Фамилия", passport_number="1234 567890", car_number=None)
+    entries = [make_entry("upsert_passport_entry", PASSPORT_SHEET, 1, passport) for _ in range(2)]
+    assert deliver(dispatcher, PASSPORT_SHEET, entries, hashes) == 2
+    assert sheet_ids(manager, PASSPORT_SHEET) == ["1"]
+    assert dispatcher.skipped_writes == 2
+
+
+def test_row_removed_from_the_sheet_is_added_again():
+    manager, dispatcher = make_dispatcher()
+    hashes = _RowHashes({})
+
+    assert deliver(dispatcher, EVENT_SHEET, [event_add(1), event_add(2)], hashes) == 2
+    # Строку пользователя 1 удалили в таблице вручную: хэш в БД об этом не знает
+    worksheet = manager._get_spreadsheet().worksheet(EVENT_SHEET)
+    manager._get_spreadsheet().batch_update({"requests": [{"deleteDimension": {"range": {
+        "sheetId": worksheet.id, "dimension": "ROWS", "startIndex": 1, "endIndex": 2,
+    }}}]})
+
+    assert deliver(dispatcher, EVENT_SHEET, [event_add(1), event_add(2)], hashes) == 2
+    assert sheet_ids(manager, EVENT_SHEET) == ["2", "1"]
+    assert dispatcher.skipped_writes == 1
+
+
+def test_failed_write_blocks_the_rest_of_the_sheet():
+    manager, dispatcher = make_dispatcher()
+    manager.backend.failure_rate = 1.0
+    manager.scheduler.max_attempts = 1
+
+    entries = [event_add(1), event_add(2)]
+    assert deliver(dispatcher, EVENT_SHEET, entries, _RowHashes({})) == 0
+    assert all(entry.processed_at is None and entry.attempts == 1 for entry in entries)
+    assert dispatcher.failed_attempts == 2
@@ -0,0 +1,64 @@
+"""Webhook: обязательный секрет и ограничение очереди фоновых задач."""
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher
+from environs import EnvError
+
+from app.config.config import load_config
+from app.infrastructure.webhook.server import BoundedRequestHandler
+
+
+def test_webhook_mode_requires_secret(monkeypatch):
+    monkeypatch.setenv("BOT_MODE", "webhook")
+    monkeypatch.setenv("WEBHOOK_SECRET", "")
+    with pytest.raises(EnvError, match="WEBHOOK_SECRET"):
+        load_config()
+
+
+def test_webhook_secret_is_loaded(monkeypatch):
+    monkeypatch.setenv("BOT_MODE", "webhook")
+    monkeypatch.setenv("WEBHOOK_SECRET", "s3cret")
+    assert load_config().webhook.secret_token == "s3cret"
+
+
+def test_polling_mode_does_not_require_secret(monkeypatch):
+    monkeypatch.setenv("BOT_MODE", "polling")
+    monkeypatch.delenv("WEBHOOK_SECRET", raising=False)
+    assert load_config().webhook.secret_token is None
+
+
+class FakeRequest:
+    def __init__(self, update_id: int):
+        self.update_id = update_id
+
+    async def json(self, loads=None):
+        return {"update_id": self.update_id}
+
+
+def test_background_tasks_are_bounded():
+    async def run():
+        release = asyncio.Event()
+        dispatcher = Dispatcher()
+
+        async def feed_raw_update(bot, update, **kwargs):
+            await release.wait()
+
+        dispatcher.feed_raw_update = feed_raw_update
+        bot = Bot("1:test")
+        handler = BoundedRequestHandler(dispatcher, bot, max_in_flight=1, max_pending=2)
+
+        statuses = [
+            (await handler._handle_request_background(bot, FakeRequest(update_id))).status
+            for update_id in range(4)
+        ]
+        pending = handler.pending
+        release.set()
+        await asyncio.gather(*handler._background_feed_update_tasks)
+        await bot.session.close()
+        return statuses, pending, handler.rejected
+
+    statuses, pending, rejected = asyncio.run(run())
+    assert statuses == [200, 200, 503, 503]
+    assert pending == 2
+    assert rejected == 2